@@ -0,0 +1 @@
+# 離線效能量測 (本機替身伺服器 + 各製作流程)
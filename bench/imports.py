@@ -0,0 +1,106 @@
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# ---------------------------------------------------------
+# 冷啟動 import 成本報告：python -m bench.imports
+# ---------------------------------------------------------
+# 每個項目都在全新的子行程中量測 (模擬部署或擴充後第一個開啟網頁的使用者)：
+#   streamlit      Streamlit 本身 (基準，不計入頁面預算)
+#   page           穩定版頁面最上方的所有 import (每次重跑都會執行，應該只有輕量模組)
+#   其餘項目        第一次「製作 / 匯入 / 匯出 / 表格編輯」時才付出的延後載入成本 (頁面 import 已完成)
+# 用法範例：
+#   python -m bench.imports                      # 表格報告
+#   python -m bench.imports --budget-ms 100      # 頁面 import 超過預算時以非 0 結束 (可放進 CI)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE = os.path.join(ROOT, "pages", "01_穩定版_Podcast.py")
+HEAVY = ("numpy", "pandas", "pyarrow", "openpyxl", "requests", "urllib3", "gtts", "gradio_client", "httpx",
+         "moviepy", "imageio_ffmpeg")
+DEFAULT_BUDGET_MS = 150
+
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+{setup}
+before = set(sys.modules)
+started = time.perf_counter()
+{stmt}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "modules": sorted({{m.split(".")[0] for m in set(sys.modules) - before}})}}))
+"""
+
+
+def page_imports(path=PAGE):
+    # 頁面最上層的 import 敘述 (不含 streamlit，它另外當作基準量測)
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    lines = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            names = [alias.name for alias in node.names] if isinstance(node, ast.Import) else [node.module]
+            if not any(name.split(".")[0] == "streamlit" for name in names):
+                lines.append(ast.unparse(node))
+    return "\n".join(lines)
+
+
+def targets():
+    page = page_imports()
+    setup = "import streamlit\n" + page
+    sample = "[ScriptLine(text='Nga\\'ay ho.', zh='你好。')] * 20"
+    return [
+        ("streamlit", "Streamlit 本身", "", "import streamlit"),
+        ("page", "頁面載入 (每次重跑)", "import streamlit", page),
+        ("render", "第一次製作：合成 / 組裝模組 + 尋找 ffmpeg", setup,
+         "from podcast_core.render import render_indigenous_episode\n"
+         "from podcast_core.assembly import ffmpeg_binary\nffmpeg_binary()"),
+        ("gradio", "第一次族語合成：Gradio client", setup, "from gradio_client import Client"),
+        ("upload", "第一次上傳劇本 (.xlsx)", setup + "\nfrom podcast_core.script_io import ScriptLine, convert_df_to_excel\n"
+         f"data = convert_df_to_excel({sample})",
+         "parse_script_file('script.xlsx', data)"),
+        ("export", "第一次下載劇本 (.xlsx)", setup, f"export_script({sample}, 'xlsx')"),
+        ("grid", "第一次切換到表格編輯", setup, f"dialogue_page_frame({sample}, 0, 20)"),
+    ]
+
+
+def measure(setup, stmt, repeat):
+    code = CHILD.format(root=ROOT, setup=setup, stmt=stmt)
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr[-2000:])
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return statistics.median(r["seconds"] for r in runs), runs[-1]["modules"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.imports", description="量測頁面冷啟動與延後載入的 import 成本")
+    parser.add_argument("--repeat", type=int, default=3, help="每個項目量測幾次 (取中位數)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="頁面 import 的時間預算 (毫秒)")
+    parser.add_argument("--json", help="另外把結果寫成 JSON 檔")
+    args = parser.parse_args(argv)
+
+    report = []
+    print(f"{'項目':<10} {'ms':>8}  {'載入的重量級套件':<40} 說明")
+    for name, label, setup, stmt in targets():
+        seconds, modules = measure(setup, stmt, args.repeat)
+        heavy = [m for m in HEAVY if m in modules]
+        report.append({'target': name, 'label': label, 'ms': seconds * 1000, 'heavy': heavy, 'modules': len(modules)})
+        print(f"{name:<10} {seconds * 1000:>8.1f}  {', '.join(heavy) or '-':<40} {label}")
+    page = next(r for r in report if r['target'] == "page")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if page['heavy'] or page['ms'] > args.budget_ms:
+        print(f"\n頁面 import 超出預算：{page['ms']:.1f} ms (預算 {args.budget_ms:.0f} ms)，重量級套件: {', '.join(page['heavy']) or '無'}")
+        return 1
+    print(f"\n頁面 import {page['ms']:.1f} ms，在預算 {args.budget_ms:.0f} ms 內")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import argparse
+import gc
+import sys
+import tracemalloc
+
+# ---------------------------------------------------------
+# 每個 session 的劇本記憶體用量：python -m bench.memory
+# ---------------------------------------------------------
+# 比較兩種狀態 (以 dict 模擬 st.session_state)：
+#   legacy   每句一個 dict、族群/語者字串各自一份，兩個編輯分頁 (p1/p2) 每句各留 4 個元件 key
+#   compact  ScriptLine (__slots__ + intern)，元件 key 只保留目前頁面上的句子
+# 字串都重新建立一份，模擬從 Excel 解析與從瀏覽器傳回來的值 (不會自動共用)；兩種狀態的元件 key 值來源相同，
+# 差異只來自資料結構 (ScriptLine 自己 intern 族群/語者) 與保留的 key 數量。
+DEFAULT_LINES = (100, 1000, 5000)
+PREFIXES = ("p1", "p2")
+
+
+def fresh(value):
+    return value.encode("utf-8").decode("utf-8")
+
+
+def sample_rows(n):
+    voices = [('阿美', '阿美_秀姑巒_女聲1'), ('排灣', '排灣_南_女聲'), ('泰雅', '泰雅_四季_女聲')]
+    for i in range(n):
+        tribe, speaker = voices[i % len(voices)]
+        yield fresh(tribe), fresh(speaker), f"Nga'ay ho, maolah kako misa'osi {i}.", f"你好，我喜歡讀書 {i}。"
+
+
+def build_legacy(n):
+    state = {'dialogue_list': [{'tribe': t, 'speaker': s, 'text': x, 'zh': z} for t, s, x, z in sample_rows(n)]}
+    for prefix in PREFIXES:
+        for i, line in enumerate(state['dialogue_list']):
+            state[f"{prefix}_tr_{i}"] = fresh(line['tribe'])
+            state[f"{prefix}_sp_{i}"] = fresh(line['speaker'])
+            state[f"{prefix}_tx_{i}"] = fresh(line['text'])
+            state[f"{prefix}_zh_{i}"] = fresh(line['zh'])
+    return state
+
+
+def build_compact(n, page_size):
+    from podcast_core.script_io import ScriptLine
+    state = {'dialogue_list': [ScriptLine(t, s, x, z) for t, s, x, z in sample_rows(n)]}
+    for prefix in PREFIXES:
+        for i, line in enumerate(state['dialogue_list'][:page_size]):
+            state[f"{prefix}_tr_{i}"] = fresh(line.tribe)
+            state[f"{prefix}_sp_{i}"] = fresh(line.speaker)
+            state[f"{prefix}_tx_{i}"] = fresh(line.text)
+            state[f"{prefix}_zh_{i}"] = fresh(line.zh)
+    return state
+
+
+def measure(build, *args):
+    gc.collect()
+    tracemalloc.start()
+    state = build(*args)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, len(state)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.memory", description="比較劇本資料與元件 key 的每個 session 記憶體用量")
+    parser.add_argument("--lines", type=int, nargs="+", default=list(DEFAULT_LINES))
+    parser.add_argument("--page-size", type=int, default=20, help="逐行模式每頁句數")
+    parser.add_argument("--sessions", type=int, default=50, help="推估同時在線的使用者數")
+    args = parser.parse_args(argv)
+    from podcast_core.script_io import ScriptLine
+    build_compact(1, 1)  # 先把模組載入，避免 import 本身算進第一個案例
+    print(f"ScriptLine: {sys.getsizeof(ScriptLine())} bytes / 句 (dict: {sys.getsizeof(dict(tribe='', speaker='', text='', zh=''))} bytes)")
+    print(f"{'句數':>6} {'legacy KB':>11} {'keys':>7} {'compact KB':>11} {'keys':>7} {'節省':>6} {f'{args.sessions} 人 MB (舊→新)':>22}")
+    for n in args.lines:
+        legacy, legacy_keys = measure(build_legacy, n)
+        compact, compact_keys = measure(build_compact, n, args.page_size)
+        saved = 1 - compact / legacy if legacy else 0.0
+        total = f"{legacy * args.sessions / 2 ** 20:.1f} → {compact * args.sessions / 2 ** 20:.1f}"
+        print(f"{n:>6} {legacy / 1024:>11.1f} {legacy_keys:>7} {compact / 1024:>11.1f} {compact_keys:>7} {saved:>6.0%} {total:>22}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# ---------------------------------------------------------
+# 離線效能量測：python -m bench.run
+# ---------------------------------------------------------
+# 用法範例：
+#   python -m bench.run                                  # 所有流程 × 10/100/1000 句
+#   python -m bench.run --lines 100 --flows bilingual --latency 0.2 --json bench.json
+#   python -m bench.run --lines 100 --profile studio-mp3                     # 比較輸出設定檔 (取樣率 / 編碼格式)
+#   python -m bench.run --lines 100 --flows indigenous --error-rate 0.1     # 替身隨機回 500，量測重試 / 斷路器
+#   python -m bench.run --lines 200 --flows indigenous --replicas 3 --replica-capacity 2 --latency 0.3
+#                                                        # 3 個族語 TTS 複本，各自同時只能處理 2 個請求
+# 父行程啟動替身伺服器 (bench/standins.py)，每個 (流程, 句數) 在獨立子行程中執行，
+# 這樣每個案例的 CPU 時間與記憶體高峰互不干擾，也不會算到替身伺服器本身。
+# 每個案例依序量測這些階段：
+#   parse   解析劇本 (--script-format 指定 xlsx/csv/parquet/jsonl；有聲書為切段)
+#   cold    空快取完整製作 (同時寫入片段清單)
+#   warm    片段快取全部命中、不使用片段清單的製作
+#   edit    修改一句後以片段清單增量製作
+FLOWS = ("indigenous", "bilingual", "bilingual-gtts", "audiobook")
+DEFAULT_LINES = (10, 100, 1000)
+RSS_SAMPLE_INTERVAL = 0.005
+
+AMIS_WORDS = ["Nga'ay", "ho", "kiso", "maolah", "kako", "mitiliday", "i", "loma'", "romi'ad", "pacakay",
+              "Pangcah", "sinafel", "riyaray", "lotokay", "maeferay", "makaen", "a", "maemin", "no", "to"]
+ZH_CHARS = "今天我們一起學習族語的日常用語大家好謝謝你很高興認識山上海邊的家人"
+
+
+def make_sentence(i, words, lo, hi, sep=" "):
+    # 依序號產生長度在 lo..hi 之間、內容每句不同的句子 (結果可重現)
+    n = lo + (i * 7) % (hi - lo + 1)
+    return sep.join(words[(i * 3 + k * 5) % len(words)] for k in range(n)) + f" {i}"
+
+
+def make_dialogue(n):
+    # 每 10 句換一次族群/語者，模擬真實劇本中的 /lambda 切換
+    voices = [('阿美', '阿美_秀姑巒_女聲1'), ('排灣', '排灣_南_女聲')]
+    dialogue = []
+    for i in range(n):
+        tribe, speaker = voices[(i // 10) % len(voices)]
+        dialogue.append({'tribe': tribe, 'speaker': speaker, 'text': make_sentence(i, AMIS_WORDS, 4, 14),
+                         'zh': make_sentence(i, ZH_CHARS, 6, 24, sep="")})
+    return dialogue
+
+
+class RssSampler:
+    # 背景執行緒定期讀 /proc/self/statm，記錄每個階段的記憶體高峰 (不含 ffmpeg 子行程)
+    def __init__(self):
+        self.peak = 0
+        self._page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def current(self):
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page
+        except OSError:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, self.current())
+
+    def reset(self):
+        self.peak = self.current()
+
+    def stop(self):
+        self._stop.set()
+
+
+def measure(sampler, results, stage, fn):
+    from bench.standins import request_count
+    requests_before = request_count()
+    sampler.reset()
+    t0, c0 = time.perf_counter(), os.times()
+    value = fn()
+    t1, c1 = time.perf_counter(), os.times()
+    sampler.peak = max(sampler.peak, sampler.current())
+    results.append({
+        'stage': stage,
+        'wall': t1 - t0,
+        'cpu': (c1.user - c0.user) + (c1.system - c0.system),
+        'cpu_children': (c1.children_user - c0.children_user) + (c1.children_system - c0.children_system),
+        'peak_rss_mb': sampler.peak / 2 ** 20,
+        'requests': request_count() - requests_before,
+    })
+    if isinstance(value, dict) and 'stages' in value:
+        # 製作流程自己回報的各階段累計耗時 (podcast_core.metrics)
+        results[-1]['breakdown'] = value['stages']
+        results[-1]['failed'] = len(value['failed'])
+    return value
+
+
+def check_azure_batches(stage, script):
+    # 替身沒有注入錯誤時，中文應該全部走 Azure 批次合成；退回逐句請求代表批次切句失效，量測結果不能代表批次路徑
+    from podcast_core.azure_tts import plan_batches, speech_weight
+    from podcast_core.tts import clean_text
+    counts = {name: count for name, count, _ in stage.get('breakdown', [])}
+    zh_lines = [(i, clean_text(item.get('zh', ''))) for i, item in enumerate(script)]
+    expected = len(plan_batches([(i, zh) for i, zh in zh_lines if speech_weight(zh)]))
+    if counts.get("azure_request", 0) or counts.get("azure_batch_request", 0) != expected:
+        raise RuntimeError(f"Azure 批次合成沒有生效：批次請求 {counts.get('azure_batch_request', 0)} 次 (預期 {expected})，"
+                           f"逐句請求 {counts.get('azure_request', 0)} 次")
+
+
+def run_case(flow, n, args):
+    # 子行程：環境變數已指向替身伺服器，import podcast_core 前先裝好 client hook
+    from bench.standins import install_client_hooks
+    install_client_hooks()
+    from podcast_core.render import render_audiobook, render_bilingual_episode, render_indigenous_episode
+    from podcast_core.script_io import DEFAULT_SPEAKER, DEFAULT_TRIBE, export_script, parse_script_file
+    from podcast_core.profiles import get_output_profile
+    from podcast_core.segmenter import split_long_text
+
+    work_dir = tempfile.mkdtemp(prefix="bench-")
+    tempfile.tempdir = work_dir
+    bgm = None
+    if args.bgm:
+        with open(args.bgm, "rb") as f:
+            bgm = f.read()
+    common = dict(bgm=bgm, duck=args.duck, workers=args.workers, profile=args.profile)
+    output_path = os.path.join(work_dir, "out" + get_output_profile(args.profile).extension)
+    dialogue = make_dialogue(n)
+    if flow == "audiobook":
+        source = "\n".join(make_sentence(i, AMIS_WORDS, 14, 18) + "." for i in range(n))
+        parse = lambda: split_long_text(source, 120)
+    else:
+        data = export_script(dialogue, args.script_format)
+        parse = lambda: parse_script_file("script." + args.script_format, data)
+
+    def render(script, manifest_dir=None):
+        if flow == "audiobook":
+            return render_audiobook(script, DEFAULT_TRIBE, DEFAULT_SPEAKER, output_path, manifest_dir=manifest_dir, **common)
+        if flow.startswith("bilingual"):
+            azure = flow == "bilingual"
+            return render_bilingual_episode(
+                script, output_path, azure_key="bench" if azure else "", azure_region="local" if azure else "",
+                manifest_dir=manifest_dir, **common)
+        return render_indigenous_episode(script, output_path, manifest_dir=manifest_dir, **common)
+
+    sampler = RssSampler()
+    results = []
+    manifest_dir = os.path.join(work_dir, "manifest")
+    script = measure(sampler, results, "parse", parse)
+    measure(sampler, results, "cold", lambda: render(script, manifest_dir))
+    if flow == "bilingual" and not args.error_rate:
+        check_azure_batches(results[-1], script)
+    results[-1]['output_kb'] = os.path.getsize(output_path) / 1024
+    measure(sampler, results, "warm", lambda: render(script))
+    edited = list(script)
+    if flow == "audiobook":
+        edited[len(edited) // 2] += " edited"
+    else:
+        edited[len(edited) // 2] = dict(edited[len(edited) // 2], text=edited[len(edited) // 2]['text'] + " edited")
+    measure(sampler, results, "edit", lambda: render(edited, manifest_dir))
+    sampler.stop()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return {'flow': flow, 'lines': len(script), 'stages': results}
+
+
+def run_in_subprocess(flow, n, args, env):
+    cmd = [sys.executable, "-m", "bench.run", "--case", flow, str(n), "--workers", str(args.workers), "--script-format", args.script_format,
+           "--profile", args.profile, "--error-rate", str(args.error_rate)]
+    if args.bgm: cmd += ["--bgm", os.path.abspath(args.bgm)]
+    if args.duck: cmd.append("--duck")
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"{flow} × {n} 失敗:\n{proc.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def print_table(reports):
+    print(f"{'流程':<16} {'句數':>6} {'階段':<6} {'wall(s)':>9} {'cpu(s)':>8} {'ffmpeg(s)':>10} {'RSS(MB)':>9} {'請求數':>7} {'失敗句':>6} {'檔案(KB)':>9}")
+    for r in reports:
+        for s in r['stages']:
+            print(f"{r['flow']:<16} {r['lines']:>6} {s['stage']:<6} {s['wall']:>9.2f} {s['cpu']:>8.2f} "
+                  f"{s['cpu_children']:>10.2f} {s['peak_rss_mb']:>9.1f} {s['requests']:>7} {s.get('failed', 0):>6} {s.get('output_kb', 0):>9.0f}")
+
+
+def build_parser():
+    from podcast_core.profiles import DEFAULT_OUTPUT_PROFILE, OUTPUT_PROFILES
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description="以本機替身伺服器量測各製作流程的效能")
+    parser.add_argument("--lines", type=int, nargs="+", default=list(DEFAULT_LINES))
+    parser.add_argument("--flows", nargs="+", choices=FLOWS, default=list(FLOWS))
+    parser.add_argument("--latency", type=float, default=0.05, help="替身伺服器每個請求的延遲 (秒)")
+    parser.add_argument("--seconds-per-char", type=float, default=0.06, help="每個字產生的音訊長度 (秒)")
+    parser.add_argument("--replicas", type=int, default=1, help="族語 TTS 替身複本數")
+    parser.add_argument("--replica-capacity", type=int, default=0, help="每個族語 TTS 複本同時處理的請求數 (0 表示不限)")
+    parser.add_argument("--rate-limit", action="store_true", help="套用正式環境的全域限流 (預設關閉，只量測程式本身)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="替身伺服器隨機回應 500 錯誤的比例")
+    parser.add_argument("--switch-delay", type=float, default=0.2, help="切換族群後的固定等待 (正式環境為 1 秒)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--script-format", choices=("xlsx", "csv", "parquet", "jsonl"), default="xlsx", help="parse 階段使用的劇本格式")
+    parser.add_argument("--profile", choices=list(OUTPUT_PROFILES), default=DEFAULT_OUTPUT_PROFILE, help="輸出設定檔")
+    parser.add_argument("--bgm", help="背景音樂檔")
+    parser.add_argument("--duck", action="store_true")
+    parser.add_argument("--json", help="另外把結果寫成 JSON 檔")
+    parser.add_argument("--case", nargs=2, metavar=("FLOW", "LINES"), help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.case:
+        print(json.dumps(run_case(args.case[0], int(args.case[1]), args)))
+        return 0
+
+    from bench.standins import AzureHandler, GradioHandler, GTTSHandler, StandinConfig, StandinServer, standin_env
+    config = StandinConfig(latency=args.latency, seconds_per_char=args.seconds_per_char, error_rate=args.error_rate)
+    gradio = [StandinServer(GradioHandler, config, args.replica_capacity) for _ in range(max(1, args.replicas))]
+    servers = gradio + [StandinServer(handler, config) for handler in (AzureHandler, GTTSHandler)]
+    reports = []
+    try:
+        for flow in args.flows:
+            for n in args.lines:
+                cache_dir = tempfile.mkdtemp(prefix="bench-cache-")
+                env = dict(os.environ, PODCAST_CACHE_DIR=cache_dir, PODCAST_SCRATCH_DIR=os.path.join(cache_dir, "scratch"),
+                           **standin_env(gradio, *servers[-2:], args.switch_delay))
+                if not args.rate_limit:
+                    env.update(PODCAST_GRADIO_RPS="0", PODCAST_AZURE_RPS="0", PODCAST_GRADIO_CONCURRENCY="256",
+                               PODCAST_AZURE_CONCURRENCY="256")
+                started = time.perf_counter()
+                try:
+                    report = run_in_subprocess(flow, n, args, env)
+                finally:
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                reports.append(report)
+                print(f"{flow} × {n}: {time.perf_counter() - started:.1f} 秒", file=sys.stderr, flush=True)
+    finally:
+        for server in servers:
+            server.close()
+    print_table(reports)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
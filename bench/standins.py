@@ -0,0 +1,242 @@
+import base64
+import io
+import json
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from contextlib import nullcontext
+from html import unescape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import numpy as np
+
+from podcast_core.assembly import ffmpeg_binary
+
+# ---------------------------------------------------------
+# 本機替身伺服器：模擬 Gradio 族語 TTS、Azure TTS 與 gTTS
+# ---------------------------------------------------------
+# 每個替身都可以設定回應延遲與「每個字產生幾秒音訊」，讓量測結果只反映本專案自己的開銷。
+# 回傳的音訊是低音量正弦波，長度與文字長度成正比，格式與真實服務相同
+# (Gradio: 24 kHz WAV、Azure: 16 kHz MP3 或 WAV、gTTS: MP3)。
+# 每個替身伺服器可以設定同時處理的請求數 (capacity)，模擬一個模型複本的推論能力；多個 Gradio 替身即為多個複本。
+GRADIO_SAMPLE_RATE = 24000
+AZURE_SAMPLE_RATE = 16000
+GTTS_SAMPLE_RATE = 24000
+MIN_SECONDS = 0.4
+
+_encode_lock = threading.Lock()
+_encoded = {}
+
+
+def tone(seconds, sample_rate):
+    t = np.arange(int(sample_rate * seconds), dtype=np.float32) / sample_rate
+    return (0.2 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def wav_bytes(pcm, sample_rate):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes((np.clip(pcm, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+def encode_mp3(pcm, sample_rate):
+    cmd = [ffmpeg_binary(), "-v", "error", "-f", "wav", "-i", "pipe:0", "-c:a", "libmp3lame", "-b:a", "64k", "-f", "mp3", "pipe:1"]
+    return subprocess.run(cmd, input=wav_bytes(pcm, sample_rate), capture_output=True, check=True).stdout
+
+
+def mp3_bytes(seconds, sample_rate):
+    # 同樣長度的 MP3 只編碼一次 (以 0.1 秒為單位)，避免替身本身吃掉太多 CPU
+    key = (round(seconds, 1), sample_rate)
+    with _encode_lock:
+        if key not in _encoded:
+            _encoded[key] = encode_mp3(tone(key[0], sample_rate), sample_rate)
+        return _encoded[key]
+
+
+class StandinConfig:
+    def __init__(self, latency=0.05, seconds_per_char=0.06, error_rate=0.0):
+        self.latency = latency
+        self.seconds_per_char = seconds_per_char
+        self.error_rate = error_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng(0)
+
+    def seconds_for(self, text):
+        return max(MIN_SECONDS, len(text) * self.seconds_per_char)
+
+    def hit(self):
+        # 計數並模擬網路 + 推論延遲；回傳 False 表示這次要模擬伺服器錯誤
+        with self._lock:
+            self.requests += 1
+            failed = self.error_rate and self._rng.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        return not failed
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+    slots = nullcontext()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        # GET /__stats：回傳目前累計的請求數，量測時用來計算每個階段打了幾次替身
+        if self.path == "/__stats":
+            return self._send(200, json.dumps({"requests": self.config.requests}).encode(), "application/json")
+        if self.path.rstrip("/") == "/config":
+            # 與 Gradio 伺服器相同的設定端點，複本健康檢查用
+            return self._send(200, b"{}", "application/json")
+        self._send(404, b"not found", "text/plain")
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _send(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class GradioHandler(_Handler):
+    # POST /lambda {"ethnicity"} -> {}；POST /default_speaker_tts {"ref", "gen_text_input"} -> WAV
+    def do_POST(self):
+        payload = json.loads(self._body() or b"{}")
+        with self.slots:
+            ok = self.config.hit()
+        if not ok:
+            return self._send(500, b"stand-in error", "text/plain")
+        if self.path.rstrip("/") == "/lambda":
+            return self._send(200, b"{}", "application/json")
+        if self.path.rstrip("/") == "/default_speaker_tts":
+            pcm = tone(self.config.seconds_for(payload.get("gen_text_input", "")), GRADIO_SAMPLE_RATE)
+            return self._send(200, wav_bytes(pcm, GRADIO_SAMPLE_RATE), "audio/wav")
+        self._send(404, b"not found", "text/plain")
+
+
+class AzureHandler(_Handler):
+    # POST /cognitiveservices/v1 (SSML)；含 bookmark 時依句子插入 <break> 長度的靜音，模擬批次合成
+    def do_POST(self):
+        ssml = self._body().decode("utf-8")
+        if not self.config.hit():
+            return self._send(500, b"stand-in error", "text/plain")
+        if not self.headers.get("Ocp-Apim-Subscription-Key"):
+            return self._send(401, b"missing key", "text/plain")
+        voice = re.search(r"<voice[^>]*>(.*)</voice>", ssml, re.S)
+        body = voice.group(1) if voice else ssml
+        parts = []
+        for piece in re.split(r"<bookmark[^>]*/>", body):
+            brk = re.search(r"<break time='(\d+)ms'/>", piece)
+            text = unescape(re.sub(r"<[^>]+>", "", piece)).strip()
+            if not text:
+                continue
+            parts.append(tone(self.config.seconds_for(text), AZURE_SAMPLE_RATE))
+            if brk:
+                parts.append(np.zeros(int(AZURE_SAMPLE_RATE * int(brk.group(1)) / 1000), dtype=np.float32))
+        pcm = np.concatenate(parts) if parts else tone(MIN_SECONDS, AZURE_SAMPLE_RATE)
+        if "mp3" in self.headers.get("X-Microsoft-OutputFormat", ""):
+            # 單句可以共用快取的正弦波；批次要保留句子之間的靜音，才能讓 synthesize_azure_batch 切得開
+            data = mp3_bytes(len(pcm) / AZURE_SAMPLE_RATE, AZURE_SAMPLE_RATE) if len(parts) == 1 else encode_mp3(pcm, AZURE_SAMPLE_RATE)
+            return self._send(200, data, "audio/mpeg")
+        self._send(200, wav_bytes(pcm, AZURE_SAMPLE_RATE), "audio/wav")
+
+
+class GTTSHandler(_Handler):
+    # 模擬 translate.google.com 的 batchexecute 回應格式，讓真正的 gTTS 套件解析
+    def do_POST(self):
+        form = parse_qs(self._body().decode("utf-8"))
+        if not self.config.hit():
+            return self._send(500, b"stand-in error", "text/plain")
+        try:
+            text = json.loads(json.loads(form["f.req"][0])[0][0][1])[0]
+        except (KeyError, IndexError, ValueError):
+            return self._send(400, b"bad request", "text/plain")
+        seconds = self.config.seconds_for(text)
+        audio = base64.b64encode(mp3_bytes(seconds, GTTS_SAMPLE_RATE)).decode("ascii")
+        line = f')]}}\'\n\n[["wrb.fr","jQ1olc","[\\"{audio}\\"]",null,null,null,"generic"]]\n'
+        self._send(200, line.encode("utf-8"), "application/json")
+
+
+class StandinServer:
+    def __init__(self, handler, config, capacity=0):
+        # capacity: 同時處理的請求數 (0 表示不限)，超過的請求在伺服器端排隊
+        slots = threading.BoundedSemaphore(capacity) if capacity else nullcontext()
+        handler_cls = type(handler.__name__, (handler,), {"config": config, "slots": slots})
+        self.config = config
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class StandinGradioClient:
+    # 取代 gradio_client.Client：同樣的 predict(api_name=...) 介面，結果與真正的 client 一樣下載到暫存區的 downloads/
+    def __init__(self, url):
+        import requests
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+        self.endpoints = {}
+
+    def predict(self, api_name, **kwargs):
+        response = self.session.post(self.url + api_name, json=kwargs, timeout=60)
+        response.raise_for_status()
+        if api_name != "/default_speaker_tts":
+            return None
+        from podcast_core.workspace import get_scratch
+        fd, path = tempfile.mkstemp(suffix=".wav", dir=get_scratch().area("downloads"))
+        with os.fdopen(fd, "wb") as f:
+            f.write(response.content)
+        return path
+
+
+def standin_env(gradio, azure, gtts_server, switch_delay):
+    # 子行程用的環境變數：讓 podcast_core 在 import 時就指向替身；gradio 可以是多個複本的列表
+    gradio = gradio if isinstance(gradio, (list, tuple)) else [gradio]
+    return {
+        "PODCAST_INDIGENOUS_TTS_URL": ",".join(server.url + "/" for server in gradio),
+        "PODCAST_AZURE_TTS_URL": azure.url + "/cognitiveservices/v1",
+        "PODCAST_GTTS_STANDIN_URL": gtts_server.url,
+        "PODCAST_GRADIO_SWITCH_DELAY": str(switch_delay),
+    }
+
+
+def request_count():
+    # 在子行程內呼叫：所有替身共用同一個 StandinConfig，查第一個即可
+    from urllib.request import urlopen
+    url = os.environ.get("PODCAST_INDIGENOUS_TTS_URL", "").split(",")[0].rstrip("/")
+    if not url:
+        return 0
+    with urlopen(url + "/__stats", timeout=5) as response:
+        return json.loads(response.read())["requests"]
+
+
+def install_client_hooks():
+    # 在子行程內呼叫：Gradio 改用替身 client，gTTS 改打替身網址
+    import gtts.tts
+    import podcast_core.gradio_pool as gradio_pool
+    gradio_pool._default_client_factory = StandinGradioClient
+    gtts_url = os.environ.get("PODCAST_GTTS_STANDIN_URL")
+    if gtts_url:
+        gtts.tts._translate_url = lambda tld="com", path="": f"{gtts_url}/{path}"
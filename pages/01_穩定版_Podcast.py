@@ -1,221 +1,55 @@
 import streamlit as st
-from moviepy import AudioFileClip, concatenate_audioclips, CompositeAudioClip, AudioArrayClip
 import os
-import re
-import tempfile
 import time
-import numpy as np
-import subprocess
-import sys
-import requests
-from gtts import gTTS
-import pandas as pd
-import io
-import shutil
-from gradio_client import Client as GradioClient
+import uuid
+from podcast_core.admission import INTERACTIVE, client_context
+from podcast_core.cache import get_segment_cache
+from podcast_core.jobs import ensure_local_workers, get_job_queue
+from podcast_core.metrics import format_breakdown, start_metrics_server
+from podcast_core.profiles import OUTPUT_PROFILES, get_output_profile, mime_for_path
+from podcast_core.scheduler import DEFAULT_WORKERS, MAX_WORKERS
+from podcast_core.script_io import (EXPORT_FORMATS, GRID_COLUMNS, IMPORT_TYPES, ScriptLine, apply_grid_changes, compact_dialogue,
+                                    dialogue_page_frame, export_script, find_invalid_speakers, fix_invalid_speakers,
+                                    parse_script_file)
+from podcast_core.segmenter import char_budget, clean_text, iter_segments, iter_text_file
+from podcast_core.speakers import speaker_map
+from podcast_core.workspace import get_scratch
 
 # ---------------------------------------------------------
-# 1. 資料設定與基礎函式 
+# 1. 資料設定與基礎函式 (實作位於 podcast_core，命令列批次製作也共用)
 # ---------------------------------------------------------
-speaker_map = {
-    '阿美': ['阿美_海岸_男聲', '阿美_恆春_女聲', '阿美_馬蘭_女聲', '阿美_南勢_女聲', '阿美_秀姑巒_女聲1', '阿美_秀姑巒_女聲2'],
-    '泰雅': ['泰雅_四季_女聲', '泰雅_賽考利克_男聲', '泰雅_萬大_女聲', '泰雅_汶水_男聲', '泰雅_宜蘭澤敖利_女聲', '泰雅_澤敖利_男聲'],
-    '排灣': ['排灣_中_男聲', '排灣_東_男聲', '排灣_北_女聲', '排灣_南_女聲'],
-    '布農': ['布農_郡群_男聲', '布農_卡群_男聲', '布農_巒群_男聲', '布農_丹群_男聲', '布農_卓群_女聲'],
-    '太魯閣': ['太魯閣_女聲', '太魯閣_男聲1', '太魯閣_男聲2'],
-    '賽德克': ['賽德克_德鹿谷_女聲', '賽德克_都達_女聲', '賽德克_德固達雅_男聲', '賽德克_德固達雅_女聲'],
-    '魯凱': ['魯凱_大武_女聲', '魯凱_多納_男聲', '魯凱_東_女聲', '魯凱_茂林_男聲', '魯凱_萬山_女聲', '魯凱_霧台_女聲'],
-    '卑南': ['卑南_建和_女聲', '卑南_南王_女聲', '卑南_西群_女聲', '卑南_知本_女聲'],
-    '鄒': ['鄒_女聲'],
-    '賽夏': ['賽夏_女聲'],
-    '雅美': ['雅美_女聲'],
-    '邵': ['邵_男聲'],
-    '噶瑪蘭': ['噶瑪蘭_女聲'],
-    '拉阿魯哇': ['拉阿魯哇_女聲'],
-    '撒奇萊雅': ['撒奇萊雅_女聲'],
-    '卡那卡那富': ['卡那卡那富_男聲'],
-}
-
-def clean_text(text):
-    if not text: return ""
-    text = text.replace("，", ",").replace("。", ".").replace("？", "?").replace("！", "!")
-    text = text.replace("：", ":").replace("；", ";").replace("（", "(").replace("）", ")")
-    text = text.replace("―", " ").replace("—", " ").replace("…", " ")
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
-
-def split_long_text(text, max_chars=150):
-    chunks = re.split(r'([。.?!？！\n])', text)
-    final_chunks = []
-    current_chunk = ""
-    for chunk in chunks:
-        if len(current_chunk) + len(chunk) < max_chars:
-            current_chunk += chunk
-        else:
-            if current_chunk.strip():
-                final_chunks.append(current_chunk.strip())
-            current_chunk = chunk
-    if current_chunk.strip():
-        final_chunks.append(current_chunk.strip())
-    return final_chunks
-
-# ---------------------------------------------------------
-# 🔧 核心：Azure TTS API 函式 (官方穩定版)
-# ---------------------------------------------------------
-def generate_audio_azure_api(text, voice_name, api_key, region, output_path):
-    if not api_key or not region:
-        return False, "未設定 Azure Key"
-
-    url = f"https://{region}.tts.speech.microsoft.com/cognitiveservices/v1"
-    
-    headers = {
-        "Ocp-Apim-Subscription-Key": api_key,
-        "Content-Type": "application/ssml+xml",
-        "X-Microsoft-OutputFormat": "audio-16khz-128kbitrate-mono-mp3",
-        "User-Agent": "StreamlitPodcastApp"
-    }
-    
-    ssml = f"""
-    <speak version='1.0' xml:lang='zh-TW'>
-        <voice xml:lang='zh-TW' name='{voice_name}'>
-            {text}
-        </voice>
-    </speak>
-    """
-    
-    try:
-        response = requests.post(url, headers=headers, data=ssml.encode('utf-8'))
-        
-        if response.status_code == 200:
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
-            return True, "Azure API"
-        else:
-            error_msg = f"Azure Error: {response.status_code} - {response.text}"
-            print(error_msg)
-            return False, error_msg
-            
-    except Exception as e:
-        print(f"Connection Error: {e}")
-        return False, str(e)
-
-
-def generate_chinese_audio_smart(text, gender, output_path, azure_key, azure_region):
-    # 1. 決定語者 (Azure 官方代號)
-    if gender == "男聲":
-        voice_name = "zh-TW-YunJheNeural"
-    else:
-        voice_name = "zh-TW-HsiaoChenNeural"
-        
-    # 2. 嘗試 Azure API
-    if azure_key and azure_region:
-        success, msg = generate_audio_azure_api(text, voice_name, azure_key, azure_region, output_path)
-        if success:
-            return True, "Azure"
-        else:
-            print(f"Azure Failed (Turning to gTTS): {msg}")
-            # 如果是 401 (Key 錯誤)，在網站上顯示提示
-            if "401" in msg or "403" in msg:
-                 st.toast("⚠️ Azure 認證失敗或無效，轉為 gTTS", icon="🔒")
-            
-    # 3. 備援 gTTS
-    try:
-        tts = gTTS(text=text, lang='zh-tw')
-        tts.save(output_path)
-        is_downgrade = (gender == "男聲")
-        return True, ("gTTS-Fallback" if is_downgrade else "gTTS")
-    except Exception as e:
-        return False, f"All Failed: {e}"
-
-# 原住民語音 (維持 Gradio Client)
-def synthesize_indigenous_speech(tribe, speaker, text):
-    # 這裡加入重試機制
-    max_retries = 2
-    for attempt in range(max_retries):
-        try:
-            # 確保使用正確的 GradioClient 引用
-            client = GradioClient("https://hnang-kari-ai-asi-sluhay.ithuan.tw/")
-            
-            # 嘗試繞過檢查 (保持原本的邏輯)
-            try:
-                target_endpoints = [client.endpoints.get('/default_speaker_tts'), client.endpoints.get('/custom_speaker_tts')]
-                for endpoint in target_endpoints:
-                    if endpoint and hasattr(endpoint, 'parameters'):
-                        for param in endpoint.parameters:
-                            if 'enum' in param and speaker not in param['enum']:
-                                param['enum'].append(speaker)
-                            if 'choices' in param and speaker not in param['choices']:
-                                param['choices'].append(speaker)
-            except: pass
-
-            client.predict(ethnicity=tribe, api_name="/lambda")
-            time.sleep(1.0)
-            path = client.predict(ref=speaker, gen_text_input=text, api_name="/default_speaker_tts")
-            return path
-        except Exception as e:
-            if attempt == max_retries - 1:
-                print(f"Indigenous TTS Failed: {e}")
-                raise e
-            time.sleep(2)
-
-# ---------------------------------------------------------
-# Excel/Txt 處理 (保持原有的函式)
-# ---------------------------------------------------------
-def convert_df_to_excel(dialogue_list):
-    df = pd.DataFrame(dialogue_list)
-    df = df.rename(columns={'tribe': '族群', 'speaker': '語者', 'text': '族語內容', 'zh': '中文翻譯'})
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Script')
-    return output.getvalue()
-
-def convert_list_to_txt(dialogue_list):
-    txt_content = ""
-    for item in dialogue_list:
-        zh_part = f" | {item.get('zh', '')}" if item.get('zh') else ""
-        txt_content += f"{item['text']}{zh_part}\n"
-    return txt_content
-
+# 合成 / 組裝模組 (numpy、gTTS、requests、Gradio client、ffmpeg) 在按下製作時才 import，
+# 頁面載入與每次重跑只載入輕量模組；冷啟動成本可用 python -m bench.imports 量測。
 def parse_uploaded_file(uploaded_file):
     try:
-        filename = uploaded_file.name
-        new_data = []
-        default_tribe = '阿美'
-        default_speaker = '阿美_秀姑巒_女聲1'
-
-        if filename.endswith('.xlsx'):
-            df = pd.read_excel(uploaded_file)
-            for _, row in df.iterrows():
-                tribe = row.get('族群') or row.get('tribe') or default_tribe
-                speaker = row.get('語者') or row.get('speaker') or default_speaker
-                text = row.get('族語內容') or row.get('text') or ''
-                zh = row.get('中文翻譯') or row.get('zh') or ''
-                if pd.notna(text) and str(text).strip():
-                    new_data.append({
-                        'tribe': str(tribe), 'speaker': str(speaker),
-                        'text': str(text), 'zh': str(zh) if pd.notna(zh) else ""
-                    })
-        elif filename.endswith('.txt'):
-            stringio = io.StringIO(uploaded_file.getvalue().decode("utf-8"))
-            for line in stringio:
-                line = line.strip()
-                if not line: continue
-                parts = line.split('|')
-                raw = parts[0].strip()
-                zh = parts[1].strip() if len(parts) > 1 else ""
-                new_data.append({
-                    'tribe': default_tribe, 'speaker': default_speaker,
-                    'text': raw, 'zh': zh
-                })
-        return new_data
+        data = parse_script_file(uploaded_file.name, uploaded_file)
     except Exception as e:
         st.error(f"檔案解析失敗: {e}")
         return None
+    # 一次檢查所有不重複的 (族群, 語者) 組合，不在清單中的自動改正並提示
+    invalid = find_invalid_speakers(data, speaker_map)
+    if invalid:
+        pairs = "、".join(f"{tribe}/{speaker} ({n} 句)" for (tribe, speaker), n in list(invalid.items())[:5])
+        more = f" 等 {len(invalid)} 組" if len(invalid) > 5 else ""
+        fixed = fix_invalid_speakers(data, speaker_map, invalid)
+        st.warning(f"⚠️ 有 {fixed} 句的族群/語者不在清單中，已自動改正：{pairs}{more}")
+    return data
+
+# 側欄的快取 / 暫存空間統計要掃描暫存目錄並查 SQLite：所有 session 共用同一份結果，每 STATS_TTL 秒才重新計算，
+# 不在每次重跑 (每次按鍵) 時做
+STATS_TTL = 30
+
+@st.cache_data(ttl=STATS_TTL, show_spinner=False)
+def storage_stats():
+    get_job_queue()  # 登記背景工作成品目錄，一併列入暫存空間統計
+    return get_segment_cache().stats(), get_segment_cache("zh").stats(), get_scratch().stats()
 
 # ---------------------------------------------------------
 # 2. 介面初始化 (新增 Azure Key UI)
 # ---------------------------------------------------------
 st.set_page_config(page_title="Podcast-021 Pro", layout="wide", initial_sidebar_state="expanded")
+# 設定 PODCAST_METRICS_PORT 時在背景提供 /metrics (Prometheus 格式)
+start_metrics_server()
 
 with st.sidebar:
     st.title("🎙️ 原語 Podcast")
@@ -239,6 +73,13 @@ with st.sidebar:
     else:
         st.caption("未設定 Azure Key，將使用 Google 備援。")
     # <<< 結束 Azure Key 輸入 UI >>>
+
+    st.markdown("#### ⚡ 合成效能")
+    st.slider("同時合成數", 1, MAX_WORKERS, DEFAULT_WORKERS, key="tts_workers", help="同時送出的語音合成請求數，數值越大長劇本越快完成")
+    st.toggle("🗂️ 背景製作", key="bg_jobs", help="送到背景佇列由獨立行程製作，重新整理或斷線都不會中斷，完成後可在「背景工作」區下載")
+    st.selectbox("🎚️ 輸出格式", list(OUTPUT_PROFILES), index=list(OUTPUT_PROFILES).index(get_output_profile().name),
+                 format_func=lambda name: OUTPUT_PROFILES[name].label, key="output_profile",
+                 help="語音設定檔以來源的 24 kHz 直接編碼，製作較快、檔案較小；有背景音樂且重視音質時可選 44.1 kHz")
     
     st.markdown("---")
     st.markdown("### 🌟 功能簡介")
@@ -250,6 +91,12 @@ with st.sidebar:
     """)
     st.markdown("---")
     st.success("✅ 系統狀態：正常")
+    seg_stats, zh_stats, scratch_stats = storage_stats()
+    st.caption(f"族語快取: {seg_stats['entries']} 段 / {seg_stats['bytes'] / 1024 / 1024:.1f} MB · 命中 {seg_stats['hits']} · 未命中 {seg_stats['misses']}")
+    st.caption(f"中文快取: {zh_stats['entries']} 段 / {zh_stats['bytes'] / 1024 / 1024:.1f} MB · 命中率 {zh_stats['hit_rate']:.0%}")
+    st.caption(f"暫存空間: {scratch_stats['bytes'] / 1024 / 1024:.1f} / {scratch_stats['max_bytes'] / 1024 / 1024:.0f} MB · 製作中 {scratch_stats['active_jobs']}")
+    for name, (size, _, max_bytes) in scratch_stats['tracked'].items():
+        st.caption(f"{'背景工作成品' if name == 'background_jobs' else name}: {size / 1024 / 1024:.1f} / {max_bytes / 1024 / 1024:.0f} MB")
     st.caption("版本: Podcast-Azure | 核心: REST API")
 
 st.title("🎙️ 族語廣播及Podcast內容產製程式")
@@ -258,6 +105,55 @@ st.markdown("打造您的專屬原住民族語廣播節目，支援 **16族42語
 if 'dialogue_list' not in st.session_state:
     st.session_state['dialogue_list'] = []
 
+# ---------------------------------------------------------
+# 背景工作 (owner 放在網址參數中，重新整理後仍能查回自己的工作)
+# ---------------------------------------------------------
+if 'owner' not in st.query_params:
+    st.query_params['owner'] = uuid.uuid4().hex[:12]
+job_owner = st.query_params['owner']
+
+# 是否要顯示「背景工作」區塊同樣短暫快取；送出新工作時清掉，下次重跑就會出現
+@st.cache_data(ttl=5, show_spinner=False)
+def recent_jobs(owner):
+    return get_job_queue().list_jobs(owner, limit=10)
+
+def submit_background_job(kind, params, bgm_file):
+    ensure_local_workers()
+    job_id = get_job_queue().submit(kind, dict(params, workers=st.session_state['tts_workers'],
+                                               profile=st.session_state['output_profile']), owner=job_owner,
+                                    bgm=bgm_file.getvalue() if bgm_file else None)
+    recent_jobs.clear()
+    st.success(f"🗂️ 已送出背景工作 {job_id[:8]}，可在上方「背景工作」查看進度與下載")
+
+def render_job_list(jobs):
+    for job in jobs:
+        with st.container(border=True):
+            created = time.strftime('%m/%d %H:%M', time.localtime(job['created']))
+            st.markdown(f"**{job['kind']}** · `{job['id'][:8]}` · {created} · {job['message'] or ''}")
+            if job['status'] in ('queued', 'running'):
+                st.progress(job['progress'])
+            elif job['status'] == 'failed':
+                st.error(f"失敗: {job['error']}")
+            elif job['output_path'] and os.path.exists(job['output_path']):
+                mime = mime_for_path(job['output_path'])
+                st.audio(job['output_path'], format=mime)
+                with open(job['output_path'], "rb") as f:
+                    st.download_button("📥 下載", f, f"podcast_{job['id'][:8]}{os.path.splitext(job['output_path'])[1]}", mime,
+                                       key=f"job_dl_{job['id']}")
+
+@st.fragment(run_every=3)
+def render_job_list_live():
+    # 有進行中的工作時每 3 秒直接查佇列更新進度
+    render_job_list(get_job_queue().list_jobs(job_owner, limit=10))
+
+owner_jobs = recent_jobs(job_owner)
+if owner_jobs:
+    with st.expander("🗂️ 背景工作", expanded=any(j['status'] in ('queued', 'running') for j in owner_jobs)):
+        if any(j['status'] in ('queued', 'running') for j in owner_jobs):
+            render_job_list_live()
+        else:
+            render_job_list(owner_jobs)
+
 # ---------------------------------------------------------
 # 3. 分頁定義 (保持原有的 tab4)
 # ---------------------------------------------------------
@@ -320,7 +216,10 @@ with tab1:
             else:
                 try:
                     with st.spinner(f"正在合成 ({s_tribe})..."):
-                        path = synthesize_indigenous_speech(s_tribe, s_speaker, clean_text(s_text))
+                        from podcast_core.tts import synthesize_indigenous_speech
+                        # 單句試聽走優先通道：批次製作正在排隊時也能很快拿到額度
+                        with client_context(job_owner, INTERACTIVE):
+                            path = synthesize_indigenous_speech(s_tribe, s_speaker, clean_text(s_text))
                         st.audio(path)
                 except Exception as e: st.error(f"錯誤: {e}")
 
@@ -330,6 +229,157 @@ with tab1:
 # ==========================================
 # 共用函式：Podcast 列表編輯器 (Callback 修正版)
 # ==========================================
+# 逐行模式每頁顯示的句數 (每句 5 個元件)，表格模式每頁顯示的句數
+CARD_PAGE_SIZE = 20
+GRID_PAGE_SIZE = 100
+# 劇本超過這個句數時預設使用表格模式
+GRID_THRESHOLD = 30
+EDITOR_PREFIXES = ("p1", "p2")
+ROW_WIDGET_FIELDS = ("tr", "sp", "tx", "zh")
+
+
+# ---------------------------------------------------------
+# 逐行元件狀態的生命週期：session_state 中只保留目前頁面上的 {prefix}_{tr|sp|tx|zh}_{i}，
+# 劇本被刪改、清空或重新載入時一併清掉，避免每位使用者的 session 無限制地累積 key。
+# ---------------------------------------------------------
+def _row_widget_key(key):
+    # "p1_tx_12" -> ("p1", 12)；不是逐行元件的 key 時回傳 None
+    parts = key.split("_")
+    if len(parts) == 3 and parts[0] in EDITOR_PREFIXES and parts[1] in ROW_WIDGET_FIELDS and parts[2].isdigit():
+        return parts[0], int(parts[2])
+    return None
+
+
+def drop_row_widget_keys(first_index=0):
+    # 劇本在第 first_index 句之後有變動 (表格編輯、刪除、重新載入等)：兩個分頁的元件狀態都要從資料重新初始化
+    for key in list(st.session_state.keys()):
+        row = _row_widget_key(key)
+        if row and row[1] >= first_index:
+            del st.session_state[key]
+
+
+def prune_row_widget_keys(key_prefix, start, end):
+    # 只保留這個分頁目前顯示的 [start, end) 句；換頁回來時會從 dialogue_list 重新初始化
+    for key in list(st.session_state.keys()):
+        row = _row_widget_key(key)
+        if row and row[0] == key_prefix and not start <= row[1] < end:
+            del st.session_state[key]
+
+
+def set_dialogue(items):
+    st.session_state['dialogue_list'] = compact_dialogue(items)
+    drop_row_widget_keys()
+
+
+def warn_failed_lines(result, unit="句"):
+    # 重試後仍失敗的句子已略過；沒有寫進增量清單，再按一次製作只會重新合成這些句子
+    if result['failed']:
+        numbers = ", ".join(f"#{n}" for n in result['failed'][:20]) + (" ..." if len(result['failed']) > 20 else "")
+        st.warning(f"⚠️ {len(result['failed'])} {unit}族語合成失敗已略過：{numbers}。再按一次製作只會重試這些{unit}。")
+
+
+def render_pager(key_prefix, total, page_size):
+    # 回傳目前這一頁的 (起點, 終點) 索引；只有一頁時不顯示頁碼
+    pages = max(1, -(-total // page_size))
+    page_key = f"{key_prefix}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"頁碼 (共 {pages} 頁，每頁 {page_size} 句)", min_value=1, max_value=pages, key=page_key)
+    start = (page - 1) * page_size
+    return start, min(total, start + page_size)
+
+
+def render_script_grid(key_prefix, start, end):
+    # 表格模式：一個 data_editor 顯示一頁，只在有編輯時把變更套回 dialogue_list
+    ver_key = f"{key_prefix}_grid_ver"
+    if ver_key not in st.session_state: st.session_state[ver_key] = 0
+    editor_key = f"{key_prefix}_grid_{st.session_state[ver_key]}"
+
+    def apply_changes():
+        dialogue = st.session_state['dialogue_list']
+        template = dialogue[end - 1] if end > start else None
+        first = apply_grid_changes(dialogue, start, end - start, st.session_state[editor_key], speaker_map, template)
+        if first is not None:
+            drop_row_widget_keys(first)
+        # 換一個新的 key，讓表格以更新後的資料重新建立，不會重複套用同一批編輯
+        st.session_state.pop(editor_key, None)
+        st.session_state[ver_key] += 1
+
+    all_speakers = [name for names in speaker_map.values() for name in names]
+    st.data_editor(
+        dialogue_page_frame(st.session_state['dialogue_list'], start, end), key=editor_key, on_change=apply_changes,
+        num_rows="dynamic", use_container_width=True,
+        column_config={
+            GRID_COLUMNS['tribe']: st.column_config.SelectboxColumn(options=list(speaker_map.keys()), required=True, width="small"),
+            GRID_COLUMNS['speaker']: st.column_config.SelectboxColumn(options=all_speakers, required=True),
+            GRID_COLUMNS['text']: st.column_config.TextColumn(width="large"),
+            GRID_COLUMNS['zh']: st.column_config.TextColumn(width="medium"),
+        })
+
+
+def render_script_cards(key_prefix, start, end):
+    # 逐行模式：每句一組族群/語者/族語/中文/刪除元件
+
+    def sync_row(i, field, key):
+        # 只在使用者真的修改某個元件時寫回那一句，並讓另一個分頁的同一句依新資料重新初始化
+        row = st.session_state['dialogue_list'][i]
+        row[field] = st.session_state[key]
+        if field == 'tribe' and row['speaker'] not in speaker_map[row['tribe']]:
+            row['speaker'] = speaker_map[row['tribe']][0]
+        for prefix in EDITOR_PREFIXES:
+            for f in ROW_WIDGET_FIELDS:
+                if prefix != key_prefix or (field == 'tribe' and f == 'sp'):
+                    st.session_state.pop(f"{prefix}_{f}_{i}", None)
+
+    for i in range(start, end):
+        line = st.session_state['dialogue_list'][i]
+        with st.container(border=True):
+            col_idx, col_set, col_text, col_zh, col_del = st.columns([0.3, 2.7, 3.5, 3, 0.5])
+            col_idx.write(f"**#{i+1}**")
+            
+            with col_set:
+                # 1. 處理族群 Selectbox
+                tr_key = f"{key_prefix}_tr_{i}"
+                # 如果 Session State 裡還沒這個 Key (或是新的一行)，就先初始化它
+                if tr_key not in st.session_state:
+                    st.session_state[tr_key] = line['tribe']
+                
+                # 移除 index，完全交給 key 控制
+                nt = st.selectbox("族", list(speaker_map.keys()), key=tr_key, label_visibility="collapsed",
+                                  on_change=sync_row, args=(i, 'tribe', tr_key))
+                
+                # 2. 處理語者 Selectbox
+                avail = speaker_map[nt]
+                sp_key = f"{key_prefix}_sp_{i}"
+                
+                if sp_key not in st.session_state:
+                    st.session_state[sp_key] = line['speaker']
+                
+                # 防呆：如果切換族群後，語者不在清單內，強制設為第一個
+                if st.session_state[sp_key] not in avail:
+                    st.session_state[sp_key] = avail[0]
+                
+                st.selectbox("語", avail, key=sp_key, label_visibility="collapsed", on_change=sync_row, args=(i, 'speaker', sp_key))
+            
+            # 3. 處理文字輸入框
+            tx_key = f"{key_prefix}_tx_{i}"
+            if tx_key not in st.session_state: st.session_state[tx_key] = line['text']
+            # 移除 value，完全交給 key 控制
+            col_text.text_input("族語", key=tx_key, label_visibility="collapsed", on_change=sync_row, args=(i, 'text', tx_key))
+            
+            zh_key = f"{key_prefix}_zh_{i}"
+            if zh_key not in st.session_state: st.session_state[zh_key] = line.get('zh', '')
+            col_zh.text_input("中文", key=zh_key, label_visibility="collapsed", on_change=sync_row, args=(i, 'zh', zh_key))
+            
+            # 刪除按鈕
+            if col_del.button("🗑️", key=f"{key_prefix}_dl_{i}"):
+                st.session_state['dialogue_list'].pop(i)
+                drop_row_widget_keys(i)
+                st.rerun()
+
+
 def render_script_editor(key_prefix):
     
     # --- 定義 Callback：載入阿美語範例 ---
@@ -338,14 +388,8 @@ def render_script_editor(key_prefix):
             {"tribe": "阿美", "speaker": "阿美_秀姑巒_女聲1", "text": "Nga'ay ho.", "zh": "你好。"},
             {"tribe": "阿美", "speaker": "阿美_秀姑巒_女聲1", "text": "Maolah misa'osi kiso?", "zh": "你喜歡讀書嗎？"}
         ]
-        st.session_state['dialogue_list'] = new_data
-        
-        # ★ 關鍵：強制更新介面上的每一個元件的 Key 值
-        for i, item in enumerate(new_data):
-            st.session_state[f"{key_prefix}_tr_{i}"] = item['tribe']
-            st.session_state[f"{key_prefix}_sp_{i}"] = item['speaker']
-            st.session_state[f"{key_prefix}_tx_{i}"] = item['text']
-            st.session_state[f"{key_prefix}_zh_{i}"] = item['zh']
+        # ★ 關鍵：清掉舊的元件 Key，介面上的每一個元件都會依新資料重新初始化
+        set_dialogue(new_data)
 
     # --- 定義 Callback：載入排灣語範例 ---
     def load_paiwan_script():
@@ -353,14 +397,7 @@ def render_script_editor(key_prefix):
             {"tribe": "排灣", "speaker": "排灣_南_女聲", "text": "Djavadjavai.", "zh": "你好。"},
             {"tribe": "排灣", "speaker": "排灣_南_女聲", "text": "cuacuay ini tje ucevucevung.", "zh": "好久不見。"}
         ]
-        st.session_state['dialogue_list'] = new_data
-        
-        # ★ 關鍵：強制更新介面上的每一個元件的 Key 值
-        for i, item in enumerate(new_data):
-            st.session_state[f"{key_prefix}_tr_{i}"] = item['tribe']
-            st.session_state[f"{key_prefix}_sp_{i}"] = item['speaker']
-            st.session_state[f"{key_prefix}_tx_{i}"] = item['text']
-            st.session_state[f"{key_prefix}_zh_{i}"] = item['zh']
+        set_dialogue(new_data)
 
     # --- 按鈕區 (改用 on_click) ---
     c_btn_a, c_btn_b = st.columns(2)
@@ -374,15 +411,18 @@ def render_script_editor(key_prefix):
         c_save, c_load = st.columns(2)
         with c_save:
             if st.session_state['dialogue_list']:
-                excel_data = convert_df_to_excel(st.session_state['dialogue_list'])
-                st.download_button("📥 下載 Excel", excel_data, "podcast_script.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", key=f"{key_prefix}_dl_excel", use_container_width=True)
+                fmt = st.selectbox("格式", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0], key=f"{key_prefix}_dl_fmt")
+                # 檔案在按下下載時才產生 (依劇本內容雜湊快取)，編輯劇本時不會每次重跑都重建活頁簿
+                dialogue = st.session_state['dialogue_list']
+                st.download_button("📥 下載劇本", lambda: export_script(dialogue, fmt), f"podcast_script.{fmt}", EXPORT_FORMATS[fmt][1], key=f"{key_prefix}_dl_script", use_container_width=True)
             else: st.info("列表為空")
         with c_load:
-            uploaded = st.file_uploader("上傳 .xlsx/.txt", type=["xlsx", "txt"], key=f"{key_prefix}_up")
+            uploaded = st.file_uploader("上傳劇本", type=IMPORT_TYPES, key=f"{key_prefix}_up", help="支援 " + " / ".join(f".{t}" for t in IMPORT_TYPES))
             if uploaded and st.button("載入", key=f"{key_prefix}_load", use_container_width=True):
                 data = parse_uploaded_file(uploaded)
                 if data:
-                    st.session_state['dialogue_list'] = data
+                    set_dialogue(data)
+                    if len(data) > GRID_THRESHOLD: st.session_state[f"{key_prefix}_edit_mode"] = "表格"
                     st.success("載入成功！")
                     time.sleep(1)
                     st.rerun()
@@ -410,7 +450,7 @@ def render_script_editor(key_prefix):
                     parts = line.split('|')
                     raw = parts[0].strip()
                     zh = parts[1].strip() if len(parts)>1 else ""
-                    entry = {"tribe": role_a_t, "speaker": role_a_s, "text": "", "zh": zh}
+                    entry = ScriptLine(role_a_t, role_a_s, "", zh)
                     if raw.upper().startswith("A:"):
                         entry.update({"text": raw[2:].strip(), "tribe": role_a_t, "speaker": role_a_s})
                     elif raw.upper().startswith("B:"):
@@ -424,60 +464,28 @@ def render_script_editor(key_prefix):
     if not st.session_state['dialogue_list']:
         st.info("👋 列表是空的。")
 
-    # --- 列表渲染區 (邏輯優化) ---
-    for i, line in enumerate(st.session_state['dialogue_list']):
-        with st.container(border=True):
-            col_idx, col_set, col_text, col_zh, col_del = st.columns([0.3, 2.7, 3.5, 3, 0.5])
-            col_idx.write(f"**#{i+1}**")
-            
-            with col_set:
-                # 1. 處理族群 Selectbox
-                tr_key = f"{key_prefix}_tr_{i}"
-                # 如果 Session State 裡還沒這個 Key (或是新的一行)，就先初始化它
-                if tr_key not in st.session_state:
-                    st.session_state[tr_key] = line['tribe']
-                
-                # 移除 index，完全交給 key 控制
-                nt = st.selectbox("族", list(speaker_map.keys()), key=tr_key, label_visibility="collapsed")
-                
-                # 2. 處理語者 Selectbox
-                avail = speaker_map[nt]
-                sp_key = f"{key_prefix}_sp_{i}"
-                
-                if sp_key not in st.session_state:
-                    st.session_state[sp_key] = line['speaker']
-                
-                # 防呆：如果切換族群後，語者不在清單內，強制設為第一個
-                if st.session_state[sp_key] not in avail:
-                    st.session_state[sp_key] = avail[0]
-                
-                ns = st.selectbox("語", avail, key=sp_key, label_visibility="collapsed")
-            
-            # 3. 處理文字輸入框
-            tx_key = f"{key_prefix}_tx_{i}"
-            if tx_key not in st.session_state: st.session_state[tx_key] = line['text']
-            # 移除 value，完全交給 key 控制
-            ntx = col_text.text_input("族語", key=tx_key, label_visibility="collapsed")
-            
-            zh_key = f"{key_prefix}_zh_{i}"
-            if zh_key not in st.session_state: st.session_state[zh_key] = line.get('zh', '')
-            nzh = col_zh.text_input("中文", key=zh_key, label_visibility="collapsed")
-            
-            # 刪除按鈕
-            if col_del.button("🗑️", key=f"{key_prefix}_dl_{i}"):
-                st.session_state['dialogue_list'].pop(i)
-                st.rerun()
-            
-            # 4. 將介面上的最新值回寫到資料清單
-            st.session_state['dialogue_list'][i].update({'tribe': nt, 'speaker': ns, 'text': ntx, 'zh': nzh})
+    # --- 列表渲染區：只處理目前這一頁，長劇本每次重跑的成本只和顯示的句數有關 ---
+    dialogue = st.session_state['dialogue_list']
+    mode_key = f"{key_prefix}_edit_mode"
+    # 使用者還沒自己選過模式時，依目前句數決定 (貼上或逐句加長超過 GRID_THRESHOLD 後自動換成表格)
+    if not st.session_state.get(f"{mode_key}_picked"):
+        st.session_state[mode_key] = "表格" if len(dialogue) > GRID_THRESHOLD else "逐行"
+    grid_mode = st.radio("編輯模式", ["逐行", "表格"], key=mode_key, horizontal=True,
+                         on_change=lambda: st.session_state.update({f"{mode_key}_picked": True})) == "表格"
+    start, end = render_pager(key_prefix, len(dialogue), GRID_PAGE_SIZE if grid_mode else CARD_PAGE_SIZE)
+    prune_row_widget_keys(key_prefix, start, start if grid_mode else end)
+    if grid_mode:
+        render_script_grid(key_prefix, start, end)
+    else:
+        render_script_cards(key_prefix, start, end)
 
     c_add, c_clr = st.columns([4, 1])
     if c_add.button("➕ 新增一行", key=f"{key_prefix}_add", use_container_width=True):
-        last = st.session_state['dialogue_list'][-1] if st.session_state['dialogue_list'] else {"tribe": "阿美", "speaker": "阿美_秀姑巒_女聲1", "text": "", "zh": ""}
+        last = st.session_state['dialogue_list'][-1] if st.session_state['dialogue_list'] else ScriptLine()
         st.session_state['dialogue_list'].append(last.copy())
         st.rerun()
     if c_clr.button("🗑️ 清空", key=f"{key_prefix}_clr"):
-        st.session_state['dialogue_list'] = []
+        set_dialogue([])
         st.rerun()
 
 # ==========================================
@@ -489,45 +497,34 @@ with tab2:
     with st.container(border=True):
         bgm_file_1 = st.file_uploader("🎵 BGM", type=["mp3", "wav"], key="bgm_1")
         bgm_vol_1 = st.slider("音量", 0.05, 0.5, 0.15, 0.05, key="vol_1")
+        duck_1 = st.checkbox("人聲出現時自動壓低 BGM", key="duck_1")
     if st.button("🎙️ 開始製作 (全族語)", type="primary", key="run_p1", use_container_width=True):
         dialogue = st.session_state['dialogue_list']
         if not dialogue: st.warning("⚠️ 請先輸入劇本")
+        elif st.session_state['bg_jobs']:
+            submit_background_job('indigenous', {'dialogue': dialogue, 'bgm_volume': bgm_vol_1, 'duck': duck_1}, bgm_file_1)
         else:
             try:
                 progress = st.progress(0)
                 status = st.status("🚀 製作中...", expanded=True)
-                clips = []
-                for idx, item in enumerate(dialogue):
-                    txt = clean_text(item['text'])
-                    if not txt: continue
-                    status.write(f"合成 #{idx+1} {item['tribe']}...")
-                    path = synthesize_indigenous_speech(item['tribe'], item['speaker'], txt)
-                    clip = AudioFileClip(path)
-                    clips.append(clip)
-                    clips.append(AudioArrayClip(np.zeros((int(44100 * 1.0), clip.nchannels)), fps=44100))
-                    progress.progress((idx+1)/len(dialogue))
-                if clips:
-                    status.write("🎵 混音中...")
-                    final = concatenate_audioclips(clips)
-                    if bgm_file_1:
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-                            tmp.write(bgm_file_1.getvalue())
-                            tpath = tmp.name
-                        music = AudioFileClip(tpath)
-                        if music.duration < final.duration:
-                            music = concatenate_audioclips([music] * (int(final.duration/music.duration)+1))
-                        music = music.subclipped(0, final.duration+1).with_volume_scaled(bgm_vol_1)
-                        final = CompositeAudioClip([music, final])
-                        os.remove(tpath)
-                    tf = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-                    final.write_audiofile(tf.name, logger=None, fps=44100)
-                    for c in clips: c.close()
-                    final.close()
-                    status.update(label="✅ 完成！", state="complete", expanded=False)
+                from podcast_core.manifest import manifest_dir_for
+                from podcast_core.render import render_indigenous_episode
+                # 成品要活過這次重跑 (st.audio / 下載按鈕)，放在受容量管理的保留區，每位使用者只留最近幾份
+                profile = get_output_profile(st.session_state['output_profile'])
+                out_path = get_scratch().pin(profile.extension, owner=job_owner)
+                with client_context(job_owner):
+                    result = render_indigenous_episode(
+                        dialogue, out_path, bgm=bgm_file_1.getvalue() if bgm_file_1 else None, bgm_volume=bgm_vol_1, duck=duck_1,
+                        workers=st.session_state['tts_workers'], manifest_dir=manifest_dir_for(job_owner, "p1"), profile=profile.name,
+                        on_progress=lambda done, total: progress.progress(done/total), on_status=status.write)
+                if result:
+                    status.markdown(format_breakdown(result['stages'], result['wall']))
+                    status.update(label=f"✅ 完成！ ({result['wall']:.1f} 秒)", state="complete", expanded=False)
                     st.success("成功！")
-                    st.audio(tf.name)
-                    with open(tf.name, "rb") as f:
-                        st.download_button("📥 下載", f, "podcast_indigenous.mp3", "audio/mp3", use_container_width=True)
+                    warn_failed_lines(result)
+                    st.audio(out_path, format=profile.mime)
+                    with open(out_path, "rb") as f:
+                        st.download_button("📥 下載", f, "podcast_indigenous" + profile.extension, profile.mime, use_container_width=True)
             except Exception as e: st.error(f"錯誤: {e}")
 
 # ==========================================
@@ -541,75 +538,65 @@ with tab3:
         with c_set1:
             bgm_file_2 = st.file_uploader("🎵 BGM", type=["mp3", "wav"], key="bgm_2")
             bgm_vol_2 = st.slider("BGM音量", 0.05, 0.5, 0.15, 0.05, key="vol_2")
+            duck_2 = st.checkbox("人聲出現時自動壓低 BGM", key="duck_2")
         with c_set2:
             zh_gender = st.radio("中文配音", ["女聲", "男聲"], index=0, horizontal=True)
             gap_time = st.slider("翻譯間隔", 0.1, 2.0, 0.5)
+            zh_batch = st.checkbox("Azure 批次合成中文 (多句一次請求)", value=True, key="zh_batch")
             
     if st.button("🎙️ 開始製作 (雙語)", type="primary", key="run_p2", use_container_width=True):
         dialogue = st.session_state['dialogue_list']
+        # 取得側邊欄輸入的 Azure 設定
+        az_key = st.session_state.get('azure_key', '')
+        az_reg = st.session_state.get('azure_region', '')
         if not dialogue: st.warning("⚠️ 請先輸入劇本")
+        elif st.session_state['bg_jobs']:
+            submit_background_job('bilingual', {
+                'dialogue': dialogue, 'zh_gender': zh_gender, 'gap_time': gap_time, 'azure_key': az_key,
+                'azure_region': az_reg, 'zh_batch': zh_batch, 'bgm_volume': bgm_vol_2, 'duck': duck_2}, bgm_file_2)
         else:
             try:
                 progress = st.progress(0)
                 status = st.status("🚀 製作中...", expanded=True)
-                clips = []
                 
-                # 取得側邊欄輸入的 Azure 設定
-                az_key = st.session_state.get('azure_key', '')
-                az_reg = st.session_state.get('azure_region', '')
-                
-                for idx, item in enumerate(dialogue):
-                    txt = clean_text(item['text'])
-                    zh = clean_text(item.get('zh', ''))
-                    if not txt: continue
-                    
-                    status.write(f"合成 #{idx+1} 族語...")
-                    path = synthesize_indigenous_speech(item['tribe'], item['speaker'], txt)
-                    clip_ind = AudioFileClip(path)
-                    clips.append(clip_ind)
-                    
-                    if zh:
-                        status.write(f"合成 #{idx+1} 中文...")
-                        clips.append(AudioArrayClip(np.zeros((int(44100 * gap_time), clip_ind.nchannels)), fps=44100))
-                        
-                        tmp_zh_path = tempfile.mktemp(suffix=".mp3")
-                        # 呼叫新的 Azure API 智慧函式
-                        success, eng = generate_chinese_audio_smart(zh, zh_gender, tmp_zh_path, az_key, az_reg)
-                        
-                        if success and os.path.exists(tmp_zh_path):
-                            clips.append(AudioFileClip(tmp_zh_path))
-                            if eng == "Azure":
-                                st.toast(f"✅ #{idx+1} Azure 男聲成功", icon="🎉")
-                            elif eng == "gTTS-Fallback":
-                                st.toast(f"⚠️ #{idx+1} 降級為 gTTS 女聲", icon="ℹ️")
-                        else:
-                            st.error(f"#{idx+1} 中文合成失敗")
-                            
-                    clips.append(AudioArrayClip(np.zeros((int(44100 * 1.0), clip_ind.nchannels)), fps=44100))
-                    progress.progress((idx+1)/len(dialogue))
-                    
-                if clips:
-                    status.write("🎵 混音中...")
-                    final = concatenate_audioclips(clips)
-                    if bgm_file_2:
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-                            tmp.write(bgm_file_2.getvalue())
-                            tpath = tmp.name
-                        music = AudioFileClip(tpath)
-                        if music.duration < final.duration:
-                            music = concatenate_audioclips([music] * (int(final.duration/music.duration)+1))
-                        music = music.subclipped(0, final.duration+1).with_volume_scaled(bgm_vol_2)
-                        final = CompositeAudioClip([music, final])
-                        os.remove(tpath)
-                    tf = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-                    final.write_audiofile(tf.name, logger=None, fps=44100)
-                    for c in clips: c.close()
-                    final.close()
-                    status.update(label="✅ 完成！", state="complete", expanded=False)
+                azure_warned = []
+
+                def notify_chinese(idx, zh_ok, eng):
+                    if zh_ok:
+                        if eng == "Azure":
+                            st.toast(f"✅ #{idx+1} Azure 男聲成功", icon="🎉")
+                        elif eng == "gTTS-Fallback":
+                            st.toast(f"⚠️ #{idx+1} 降級為 gTTS 女聲", icon="ℹ️")
+                        if az_key and az_reg and eng != "Azure" and not azure_warned:
+                            from podcast_core.tts import azure_auth_rejected
+                            if azure_auth_rejected(az_key, az_reg):
+                                st.toast("⚠️ Azure 認證失敗或無效，轉為 gTTS", icon="🔒")
+                            else:
+                                st.toast("⚠️ Azure 暫時無法使用，部分中文改用 gTTS", icon="ℹ️")
+                            azure_warned.append(idx)
+                    else:
+                        st.error(f"#{idx+1} 中文合成失敗")
+
+                from podcast_core.manifest import manifest_dir_for
+                from podcast_core.render import render_bilingual_episode
+                # 成品要活過這次重跑 (st.audio / 下載按鈕)，放在受容量管理的保留區，每位使用者只留最近幾份
+                profile = get_output_profile(st.session_state['output_profile'])
+                out_path = get_scratch().pin(profile.extension, owner=job_owner)
+                with client_context(job_owner):
+                    result = render_bilingual_episode(
+                        dialogue, out_path, zh_gender=zh_gender, gap_time=gap_time, azure_key=az_key, azure_region=az_reg,
+                        zh_batch=zh_batch, bgm=bgm_file_2.getvalue() if bgm_file_2 else None, bgm_volume=bgm_vol_2, duck=duck_2,
+                        workers=st.session_state['tts_workers'], manifest_dir=manifest_dir_for(job_owner, "p2"), profile=profile.name,
+                        on_progress=lambda done, total: progress.progress(done/total), on_status=status.write,
+                        on_chinese=notify_chinese)
+                if result:
+                    status.markdown(format_breakdown(result['stages'], result['wall']))
+                    status.update(label=f"✅ 完成！ ({result['wall']:.1f} 秒)", state="complete", expanded=False)
                     st.success("完成！")
-                    st.audio(tf.name)
-                    with open(tf.name, "rb") as f:
-                        st.download_button("📥 下載", f, "podcast_bilingual.mp3", "audio/mp3", use_container_width=True)
+                    warn_failed_lines(result)
+                    st.audio(out_path, format=profile.mime)
+                    with open(out_path, "rb") as f:
+                        st.download_button("📥 下載", f, "podcast_bilingual" + profile.extension, profile.mime, use_container_width=True)
             except Exception as e: st.error(f"錯誤: {e}")
 
 # ==========================================
@@ -673,47 +660,43 @@ with tab4:
         # 取得文字框的值
         def_l_text = st.session_state.get('l_text_val', "")
         long_text = st.text_area("貼上文章 (自動切分)", value=def_l_text, height=200)
+        # 長篇文字檔直接上傳，製作時邊讀邊切段，不必貼進文字框
+        long_file = st.file_uploader("或上傳文字檔 (.txt，優先於文字框)", type=["txt"], key="l_txt")
         
         c_b3, c_b4 = st.columns([3, 1])
         with c_b3: bgm_file_l = st.file_uploader("BGM", type=["mp3", "wav"], key="bgm_l")
-        with c_b4: bgm_vol_l = st.slider("音量", 0.05, 0.5, 0.15, 0.05, key="vol_l")
+        with c_b4:
+            bgm_vol_l = st.slider("音量", 0.05, 0.5, 0.15, 0.05, key="vol_l")
+            duck_l = st.checkbox("人聲時壓低 BGM", key="duck_l")
     
     if st.button("📖 開始製作", type="primary", use_container_width=True):
-        if not long_text.strip(): st.warning("⚠️ 請先輸入文字")
+        budget = char_budget(long_speaker)
+        chunks = list(iter_text_file(long_file, budget)) if long_file else list(iter_segments([long_text], budget))
+        if not chunks: st.warning("⚠️ 請先輸入文字")
         else:
-            chunks = split_long_text(clean_text(long_text), 120)
-            st.info(f"ℹ️ 切分為 {len(chunks)} 段...")
-            progress = st.progress(0)
-            status = st.status("🚀 朗讀中...", expanded=True)
-            clips_l = []
-            try:
-                for idx, chunk in enumerate(chunks):
-                    status.write(f"朗讀段落 {idx+1}/{len(chunks)}...")
-                    path = synthesize_indigenous_speech(long_tribe, long_speaker, chunk)
-                    clip = AudioFileClip(path)
-                    clips_l.append(clip)
-                    clips_l.append(AudioArrayClip(np.zeros((int(44100 * 1.0), clip.nchannels)), fps=44100))
-                    progress.progress((idx + 1) / len(chunks))
-                if clips_l:
-                    status.write("🎵 混音中...")
-                    voice_trk = concatenate_audioclips(clips_l)
-                    final_out = voice_trk
-                    if bgm_file_l:
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-                            tmp.write(bgm_file_l.getvalue())
-                            tmppath = tmp.name
-                        mtrk = AudioFileClip(tmppath)
-                        if mtrk.duration < voice_trk.duration:
-                            mtrk = concatenate_audioclips([mtrk]*int(voice_trk.duration/mtrk.duration+2))
-                        mtrk = mtrk.subclipped(0, voice_trk.duration + 1).with_volume_scaled(bgm_vol_l)
-                        final_out = CompositeAudioClip([mtrk, voice_trk])
-                        os.remove(tmppath)
-                    tmpf = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-                    final_out.write_audiofile(tmpf.name, logger=None, fps=44100)
-                    for c in clips_l: c.close()
-                    final_out.close()
-                    status.update(label="✅ 完成！", state="complete", expanded=False)
-                    st.audio(tmpf.name)
-                    with open(tmpf.name, "rb") as f:
-                        st.download_button("📥 下載", f, "audiobook.mp3", "audio/mp3", use_container_width=True)
-            except Exception as e: st.error(f"❌ 錯誤: {e}")
+            st.info(f"ℹ️ 切分為 {len(chunks)} 段 (每段最多約 {budget} 字)...")
+            if st.session_state['bg_jobs']:
+                submit_background_job('audiobook', {
+                    'chunks': chunks, 'tribe': long_tribe, 'speaker': long_speaker, 'bgm_volume': bgm_vol_l, 'duck': duck_l}, bgm_file_l)
+            else:
+                progress = st.progress(0)
+                status = st.status("🚀 朗讀中...", expanded=True)
+                try:
+                    from podcast_core.manifest import manifest_dir_for
+                    from podcast_core.render import render_audiobook
+                    profile = get_output_profile(st.session_state['output_profile'])
+                    out_path = get_scratch().pin(profile.extension, owner=job_owner)
+                    with client_context(job_owner):
+                        result = render_audiobook(
+                            chunks, long_tribe, long_speaker, out_path, bgm=bgm_file_l.getvalue() if bgm_file_l else None,
+                            bgm_volume=bgm_vol_l, duck=duck_l, workers=st.session_state['tts_workers'],
+                            manifest_dir=manifest_dir_for(job_owner, "l"), profile=profile.name,
+                            on_progress=lambda done, total: progress.progress(done / total), on_status=status.write)
+                    if result:
+                        status.markdown(format_breakdown(result['stages'], result['wall']))
+                        status.update(label=f"✅ 完成！ ({result['wall']:.1f} 秒)", state="complete", expanded=False)
+                        warn_failed_lines(result, unit="段")
+                        st.audio(out_path, format=profile.mime)
+                        with open(out_path, "rb") as f:
+                            st.download_button("📥 下載", f, "audiobook" + profile.extension, profile.mime, use_container_width=True)
+                except Exception as e: st.error(f"❌ 錯誤: {e}")
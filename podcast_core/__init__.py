@@ -0,0 +1 @@
+# 原語 Podcast 核心模組 (與 Streamlit 介面無關的共用邏輯)
@@ -0,0 +1,186 @@
+import collections
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from podcast_core.metrics import get_metrics, timed
+
+# ---------------------------------------------------------
+# 遠端服務的全域限流 + 公平排程 (所有 Streamlit session 共用)
+# ---------------------------------------------------------
+# 每個遠端服務 (族語 Gradio、各 Azure 區域) 一個 Limiter，行程層級的單例：
+#   令牌桶     每秒補充 rate 個請求額度，最多累積 burst 個；超過就排隊，不再讓遠端回 429
+#   同時請求   最多 concurrency 個請求同時在遠端處理，其中 INTERACTIVE_RESERVE 個只留給即時試聽
+#   公平分配   排隊中的請求先看優先權 (即時試聽 > 批次製作)，同一優先權內各使用者輪流；
+#              同時已有 per_user 個請求的使用者排在其他人之後，只有沒人排隊時才能多用，
+#              所以大型有聲書只會用掉其他人沒在用的額度，單一使用者 (命令列) 也不會被限制
+# 族語 TTS 有多個複本時，額度依複本數放大 (admit 的 scale 參數)，吞吐量可隨節點數增加。
+# 請求的使用者與優先權放在 contextvars 中 (client_context)，scheduler 會帶進工作執行緒，所以合成函式不需要多傳參數。
+# 背景 worker 是獨立的行程，各自有一組 Limiter；多行程部署時請依行程數分配下面的額度。
+INTERACTIVE, BATCH = "interactive", "batch"
+LANES = (INTERACTIVE, BATCH)
+INTERACTIVE_RESERVE = 1
+
+# 服務種類 -> (每秒請求數, 令牌桶容量, 同時請求數)；服務名稱為「種類」或「種類-細分」(例如 azure-eastasia)
+LIMITS = {
+    "gradio": (float(os.environ.get("PODCAST_GRADIO_RPS", "4")),
+               int(os.environ.get("PODCAST_GRADIO_BURST", "8")),
+               int(os.environ.get("PODCAST_GRADIO_CONCURRENCY", "8"))),
+    "azure": (float(os.environ.get("PODCAST_AZURE_RPS", "10")),
+              int(os.environ.get("PODCAST_AZURE_BURST", "20")),
+              int(os.environ.get("PODCAST_AZURE_CONCURRENCY", "16"))),
+}
+# 有其他人排隊時，每位使用者同時最多幾個請求 (0 表示不限)
+PER_USER_CONCURRENCY = int(os.environ.get("PODCAST_RATE_PER_USER", "4"))
+
+_client = ContextVar("admission_client", default=("anonymous", BATCH))
+
+
+@contextmanager
+def client_context(owner, lane=BATCH):
+    # 這個區塊內 (含 scheduler 的工作執行緒) 發出的遠端請求都算在 owner 的額度，並排在 lane 的佇列
+    token = _client.set((owner or "anonymous", lane))
+    try:
+        yield
+    finally:
+        _client.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+
+    def try_take(self):
+        # 有額度就扣掉並回傳 0，否則回傳還要等幾秒 (呼叫端負責加鎖)
+        if self.rate <= 0:
+            return 0.0
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+class Limiter:
+    def __init__(self, name, rate, burst, concurrency, per_user=PER_USER_CONCURRENCY, reserve=INTERACTIVE_RESERVE):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = max(1, concurrency)
+        self.per_user = per_user
+        self.reserve = min(reserve, self.concurrency - 1)
+        self.admitted = collections.Counter()
+        self.wait_seconds = collections.Counter()
+        self._active = 0
+        self._active_by_owner = collections.Counter()
+        # 每個優先權一個 {使用者: [排隊中的票, ...]}，dict 的順序就是輪流的順序
+        self._queues = {lane: {} for lane in LANES}
+        self._cond = threading.Condition()
+
+    def _head(self):
+        # 依優先權與輪流順序，下一個可以放行的票；沒有空位時回傳 None
+        for lane in LANES:
+            limit = self.concurrency if lane == INTERACTIVE else self.concurrency - self.reserve
+            if self._active >= limit:
+                continue
+            queue = self._queues[lane]
+            for owner, tickets in queue.items():
+                if not self.per_user or self._active_by_owner[owner] < self.per_user:
+                    return tickets[0]
+            if queue:
+                # 排隊的人都已超過配額：空位不閒置，照輪流順序放行
+                return next(iter(queue.values()))[0]
+        return None
+
+    @contextmanager
+    def slot(self):
+        owner, lane = _client.get()
+        ticket = object()
+        started = time.perf_counter()
+        with timed("admission_wait"), self._cond:
+            self._queues[lane].setdefault(owner, collections.deque()).append(ticket)
+            try:
+                while True:
+                    if self._head() is ticket:
+                        delay = self.bucket.try_take()
+                        if not delay:
+                            break
+                        # 排在最前面但令牌還沒補上：等到補上為止 (期間有更高優先權的請求進來會被喚醒重新排)
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                # 等待中被中斷：撤回這張票，否則後面的人會一直等它
+                self._queues[lane][owner].remove(ticket)
+                if not self._queues[lane][owner]:
+                    del self._queues[lane][owner]
+                self._cond.notify_all()
+                raise
+            queue = self._queues[lane]
+            queue[owner].popleft()
+            # 放行後把這位使用者移到隊尾，輪到下一位
+            tickets = queue.pop(owner)
+            if tickets:
+                queue[owner] = tickets
+            self._active += 1
+            self._active_by_owner[owner] += 1
+            self.admitted[lane] += 1
+            self.wait_seconds[lane] += time.perf_counter() - started
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._active_by_owner[owner] -= 1
+                if not self._active_by_owner[owner]:
+                    del self._active_by_owner[owner]
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self._active,
+                "users": len(self._active_by_owner),
+                "queued": {lane: sum(len(t) for t in self._queues[lane].values()) for lane in LANES},
+                "admitted": dict(self.admitted),
+                "wait_seconds": dict(self.wait_seconds),
+            }
+
+
+def _limiter_samples(limiter):
+    stats = limiter.stats()
+    samples = [("podcast_admission_active", "gauge", {"service": limiter.name}, stats["active"]),
+               ("podcast_admission_concurrency", "gauge", {"service": limiter.name}, limiter.concurrency)]
+    for lane in LANES:
+        labels = {"service": limiter.name, "lane": lane}
+        samples.append(("podcast_admission_queued", "gauge", labels, stats["queued"][lane]))
+        samples.append(("podcast_admission_admitted_total", "counter", labels, stats["admitted"].get(lane, 0)))
+        samples.append(("podcast_admission_wait_seconds_total", "counter", labels, round(stats["wait_seconds"].get(lane, 0.0), 4)))
+    return samples
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name, scale=1):
+    # 行程層級的單例：同一個遠端服務的額度由所有 session 共用；scale 為服務背後的節點數 (第一次建立時決定)
+    with _limiters_lock:
+        if name not in _limiters:
+            rate, burst, concurrency = LIMITS[name.split("-", 1)[0]]
+            _limiters[name] = limiter = Limiter(name, rate * scale, burst * scale, concurrency * scale)
+            get_metrics().add_collector(lambda: _limiter_samples(limiter))
+        return _limiters[name]
+
+
+def admit(name, scale=1):
+    # with admit("gradio"): ... 包住一次遠端請求
+    return get_limiter(name, scale).slot()
@@ -0,0 +1,195 @@
+import functools
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from podcast_core.metrics import timed
+from podcast_core.profiles import get_output_profile
+
+# ---------------------------------------------------------
+# PCM 組裝引擎 (取代 moviepy 的逐格 concatenate / composite)
+# ---------------------------------------------------------
+SAMPLE_RATE = get_output_profile().sample_rate
+# 每次送進編碼器的區塊大小 (秒數固定，取樣數依取樣率)
+BLOCK_SECONDS = 10
+# 已解碼 BGM 的記憶體快取上限
+BGM_CACHE_MAX_MB = int(os.environ.get("PODCAST_BGM_CACHE_MAX_MB", "256"))
+# 人聲出現時 BGM 壓低到原音量的比例，以及音量變化的漸變時間
+DUCK_RATIO = 0.35
+DUCK_RAMP_SECONDS = 0.08
+
+
+def ffmpeg_binary():
+    # 與 moviepy 相同的尋找順序：環境變數 > imageio-ffmpeg 內附 > 系統 PATH
+    exe = os.environ.get("FFMPEG_BINARY")
+    if exe and exe != "ffmpeg-imageio":
+        return exe
+    return _discover_ffmpeg()
+
+
+@functools.lru_cache(maxsize=None)
+def _discover_ffmpeg():
+    # 每個行程只尋找一次 (第一次製作時才 import imageio_ffmpeg)，之後每次解碼 / 編碼都直接沿用
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which("ffmpeg") or "ffmpeg"
+
+
+def decode_audio(source, sample_rate=SAMPLE_RATE, channels=1, stage="decode"):
+    # 一次把整段音檔 (路徑或 bytes) 解碼成 float32 陣列：單聲道為 (n,)，多聲道為 (n, channels)
+    is_bytes = isinstance(source, (bytes, bytearray))
+    cmd = [ffmpeg_binary(), "-v", "error", "-i", "pipe:0" if is_bytes else source,
+           "-f", "f32le", "-ac", str(channels), "-ar", str(sample_rate), "pipe:1"]
+    with timed(stage):
+        proc = subprocess.run(cmd, input=source if is_bytes else None, capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg 解碼失敗: {proc.stderr.decode('utf-8', 'replace').strip()}")
+    pcm = np.frombuffer(proc.stdout, dtype=np.float32)
+    return pcm if channels == 1 else pcm.reshape(-1, channels)
+
+
+_bgm_cache = OrderedDict()
+_bgm_cache_bytes = 0
+_bgm_cache_lock = threading.Lock()
+
+
+def load_bgm(data, sample_rate=SAMPLE_RATE, channels=2):
+    # 上傳的 BGM 依內容雜湊只解碼 / 重新取樣一次，之後每次製作都直接共用 (唯讀) 陣列；形狀一律為 (n, channels)
+    global _bgm_cache_bytes
+    key = (hashlib.sha256(data).hexdigest(), sample_rate, channels)
+    with _bgm_cache_lock:
+        if key in _bgm_cache:
+            _bgm_cache.move_to_end(key)
+            return _bgm_cache[key]
+    music = decode_audio(data, sample_rate, channels=channels, stage="bgm_load").reshape(-1, channels)
+    music.flags.writeable = False
+    with _bgm_cache_lock:
+        if key not in _bgm_cache:
+            _bgm_cache[key] = music
+            _bgm_cache_bytes += music.nbytes
+            while _bgm_cache_bytes > BGM_CACHE_MAX_MB * 1024 * 1024 and len(_bgm_cache) > 1:
+                _, old = _bgm_cache.popitem(last=False)
+                _bgm_cache_bytes -= old.nbytes
+        return _bgm_cache[key]
+
+
+def tile_loop(music, start, n, out=None):
+    # 從循環播放的 music 第 start 個取樣開始取 n 個取樣：
+    # 以整段切片複製組成，不建立索引陣列也不逐格處理
+    if out is None:
+        out = np.empty((n,) + music.shape[1:], dtype=music.dtype)
+    length = len(music)
+    pos = start % length
+    filled = 0
+    while filled < n:
+        take = min(length - pos, n - filled)
+        out[filled:filled + take] = music[pos:pos + take]
+        filled += take
+        pos = 0
+    return out
+
+
+class StreamingEncoder:
+    # 常駐一個 ffmpeg 編碼行程，依劇本順序把 PCM 一段段送進去：
+    # 合成與編碼同時進行，記憶體只需保留目前這一段，最後一句回來後幾秒內就有成品。
+    # 有 BGM 時循環疊加，並比人聲多留 bgm_tail 秒的音樂尾巴；
+    # duck=True 時在人聲片段期間自動壓低 BGM。
+    # 取樣率、聲道與編碼格式依 profile (OutputProfile)；sample_rate 未指定時使用 profile 的取樣率。
+    def __init__(self, output_path, sample_rate=None, bgm=None, bgm_volume=0.15, bgm_tail=1.0, duck=False, profile=None):
+        profile = profile or get_output_profile()
+        sample_rate = sample_rate or profile.sample_rate
+        self.output_path = output_path
+        self.sample_rate = sample_rate
+        self.bgm_volume = np.float32(bgm_volume)
+        self.bgm_tail = bgm_tail
+        self.duck = duck
+        self.channels = profile.channels or (2 if bgm else 1)
+        self.music = load_bgm(bgm, sample_rate, self.channels) if bgm is not None else None
+        if self.music is not None and len(self.music) == 0:
+            self.music = None
+        self.position = 0
+        self._block_frames = sample_rate * BLOCK_SECONDS
+        self._gain = self.bgm_volume
+        self._ramp_frames = max(1, int(sample_rate * DUCK_RAMP_SECONDS))
+        cmd = [ffmpeg_binary(), "-v", "error", "-y",
+               "-f", "f32le", "-ar", str(sample_rate), "-ac", str(self.channels), "-i", "pipe:0",
+               *profile.ffmpeg_args(), output_path]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def _bgm_gain(self, n, is_voice):
+        # 回傳 BGM 增益：固定音量時為純量，ducking 漸變期間為 (n, 1) 的包絡
+        target = self.bgm_volume * np.float32(DUCK_RATIO) if (self.duck and is_voice) else self.bgm_volume
+        if self._gain == target:
+            return target
+        ramp = min(n, self._ramp_frames)
+        envelope = np.full((n, 1), target, dtype=np.float32)
+        envelope[:ramp, 0] = np.linspace(self._gain, target, ramp, endpoint=False, dtype=np.float32)
+        self._gain = target
+        return envelope
+
+    def _emit(self, voice_block, is_voice):
+        # voice_block 為單聲道人聲；BGM 循環取樣後以一次乘加疊上人聲
+        n = len(voice_block)
+        if self.music is None:
+            block = voice_block if self.channels == 1 else np.repeat(voice_block[:, None], self.channels, axis=1)
+        else:
+            with timed("bgm_mix"):
+                block = tile_loop(self.music, self.position, n)
+                np.multiply(block, self._bgm_gain(n, is_voice), out=block)
+                block += voice_block[:, None]
+        with timed("encode_write"):
+            self._proc.stdin.write(np.clip(block, -1.0, 1.0).astype(np.float32, copy=False).tobytes())
+        self.position += n
+
+    def write_pcm(self, pcm, is_voice=True):
+        for start in range(0, len(pcm), self._block_frames):
+            self._emit(pcm[start:start + self._block_frames], is_voice)
+
+    def add_audio(self, source):
+        # 回傳這段人聲在成品中的 (起點, 長度) 取樣位置
+        pcm = decode_audio(source, self.sample_rate)
+        offset = self.position
+        self.write_pcm(pcm)
+        return offset, len(pcm)
+
+    def add_silence(self, seconds):
+        remaining = int(round(self.sample_rate * seconds))
+        while remaining > 0:
+            n = min(remaining, self._block_frames)
+            self._emit(np.zeros(n, dtype=np.float32), False)
+            remaining -= n
+
+    def close(self):
+        if self.music is not None:
+            self.add_silence(self.bgm_tail)
+        with timed("encode_finish"):
+            self._proc.stdin.close()
+            err = self._proc.stderr.read()
+            returncode = self._proc.wait()
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg 編碼失敗: {err.decode('utf-8', 'replace').strip()}")
+        return self.position / self.sample_rate
+
+    def abort(self):
+        self._proc.kill()
+        self._proc.wait()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
@@ -0,0 +1,181 @@
+import os
+import threading
+import wave
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from podcast_core.admission import admit
+from podcast_core.assembly import decode_audio
+from podcast_core.metrics import get_metrics, timed
+
+# ---------------------------------------------------------
+# Azure TTS 連線池與批次合成 (SSML bookmark)
+# ---------------------------------------------------------
+# 可用環境變數指到本機替身伺服器 (測試 / 效能量測用)
+AZURE_TTS_URL_TEMPLATE = os.environ.get(
+    "PODCAST_AZURE_TTS_URL", "https://{region}.tts.speech.microsoft.com/cognitiveservices/v1"
+)
+AZURE_OUTPUT_FORMAT = "audio-16khz-128kbitrate-mono-mp3"
+AZURE_SAMPLE_RATE = 16000
+# 批次模式切出來的每句音檔格式 (快取 key 的一部分)
+AZURE_BATCH_FORMAT = "riff-16khz-16bit-mono-pcm-split"
+
+# 每批最多幾句 / 幾個字：批次太大時第一句要等整批回來，會拖慢串流編碼
+BATCH_MAX_LINES = 20
+BATCH_MAX_CHARS = 1500
+# 每句後面插入的固定停頓，用來在回傳音檔中找出句子邊界
+BATCH_BREAK_MS = 1200
+# 切開後每句前後保留的自然停頓
+BATCH_EDGE_PAD = 0.1
+SILENCE_DBFS = -45.0
+# 切出來的每句長度要接近「依字數分配的比例」：誤差超過預期長度的 SPLIT_TOLERANCE 倍 (且超過 SPLIT_SLACK 秒) 時，
+# 視為切錯位置 (例如句子本身有很長的停頓，或只有標點的句子讓兩個停頓連在一起)，整批改用逐句合成
+SPLIT_TOLERANCE = 0.35
+SPLIT_SLACK = 0.5
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_azure_session():
+    # 行程層級共用的 requests.Session：保留 TCP/TLS 連線，不必每句重新握手
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def azure_headers(api_key):
+    return {
+        "Ocp-Apim-Subscription-Key": api_key,
+        "Content-Type": "application/ssml+xml",
+        "X-Microsoft-OutputFormat": AZURE_OUTPUT_FORMAT,
+        "User-Agent": "StreamlitPodcastApp"
+    }
+
+
+def speech_weight(text):
+    # 預估的朗讀長度 (可發音的字數)；只有標點或空白的句子為 0，不適合放進批次
+    return sum(1 for c in text if c.isalnum())
+
+
+def plan_batches(texts, max_lines=BATCH_MAX_LINES, max_chars=BATCH_MAX_CHARS):
+    # 把 (索引, 文字) 依序切成多批，回傳 [[(索引, 文字), ...], ...]
+    batches, current, chars = [], [], 0
+    for item in texts:
+        if current and (len(current) >= max_lines or chars + len(item[1]) > max_chars):
+            batches.append(current)
+            current, chars = [], 0
+        current.append(item)
+        chars += len(item[1])
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_ssml(texts, voice_name, break_ms=BATCH_BREAK_MS):
+    body = "".join(
+        f"<bookmark mark='line-{i}'/>{escape(text)}<break time='{break_ms}ms'/>"
+        for i, text in enumerate(texts)
+    )
+    return (f"<speak version='1.0' xml:lang='zh-TW'>"
+            f"<voice xml:lang='zh-TW' name='{voice_name}'>{body}</voice></speak>")
+
+
+def find_split_points(pcm, count, sample_rate=AZURE_SAMPLE_RATE, break_ms=BATCH_BREAK_MS):
+    # REST 端點不回傳 bookmark 事件，因此以每個 bookmark 前固定長度的停頓反推位置：
+    # 找出最長的 count 段靜音 (長度需接近 break_ms)，回傳依時間排序的 (靜音起點, 靜音終點)。
+    frame = sample_rate // 100
+    n_frames = len(pcm) // frame
+    if n_frames == 0:
+        return None
+    rms = np.sqrt(np.mean(pcm[:n_frames * frame].reshape(n_frames, frame) ** 2, axis=1))
+    silent = rms < 10 ** (SILENCE_DBFS / 20)
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    min_frames = int(break_ms / 10 * 0.8)
+    runs = [(s, e) for s, e in zip(starts, ends) if e - s >= min_frames and e < n_frames]
+    if len(runs) < count:
+        return None
+    runs = sorted(sorted(runs, key=lambda r: r[1] - r[0], reverse=True)[:count])
+    return [(s * frame, e * frame) for s, e in runs]
+
+
+def check_split(lengths, texts, sample_rate=AZURE_SAMPLE_RATE, tolerance=SPLIT_TOLERANCE, slack=SPLIT_SLACK):
+    # lengths 為切出來的每句取樣數；每句應占總長度中依字數分配的比例，任何一句差太多就回傳 False
+    weights = [speech_weight(text) for text in texts]
+    if not all(weights):
+        return False
+    total, weight_total = sum(lengths), sum(weights)
+    for length, weight in zip(lengths, weights):
+        expected = total * weight / weight_total
+        if abs(length - expected) > max(tolerance * expected, slack * sample_rate):
+            return False
+    return True
+
+
+def _write_wav(path, pcm, sample_rate):
+    data = (np.clip(pcm, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(data.tobytes())
+
+
+def synthesize_azure_batch(texts, voice_name, api_key, region, output_dir, timeout=60):
+    # 一次請求合成多句，依停頓切回每句的 WAV 檔。
+    # 回傳與 texts 等長的路徑列表；切分失敗或切出來的長度與字數對不上時回傳 None，呼叫端應改用逐句合成。
+    if not texts:
+        return []
+    if not all(speech_weight(text) for text in texts):
+        return None
+    url = AZURE_TTS_URL_TEMPLATE.format(region=region)
+    ssml = build_batch_ssml(texts, voice_name)
+    with admit(f"azure-{region}"), timed("azure_batch_request"):
+        response = get_azure_session().post(url, headers=azure_headers(api_key), data=ssml.encode('utf-8'), timeout=timeout)
+    if response.status_code != 200:
+        raise RuntimeError(f"Azure Error: {response.status_code} - {response.text}")
+    pcm = decode_audio(response.content, AZURE_SAMPLE_RATE)
+    with timed("azure_batch_split"):
+        # 最後一句後面的停頓在音檔結尾，不算邊界
+        segments = split_batch_audio(pcm, texts)
+        if segments is None:
+            get_metrics().inc("podcast_azure_batch_split_failures_total")
+            return None
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for i, segment in enumerate(segments):
+            path = os.path.join(output_dir, f"zh_{i}.wav")
+            _write_wav(path, segment, AZURE_SAMPLE_RATE)
+            paths.append(path)
+    return paths
+
+
+def split_batch_audio(pcm, texts, sample_rate=AZURE_SAMPLE_RATE):
+    # 把批次合成的整段 PCM 切回每句；找不到足夠的停頓或長度與字數對不上時回傳 None
+    # 最後一句後面的停頓在音檔結尾，不算邊界
+    splits = find_split_points(pcm, len(texts) - 1, sample_rate)
+    if splits is None:
+        return None
+    pad = int(sample_rate * BATCH_EDGE_PAD)
+    bounds = [0] + [p for s, e in splits for p in (s + pad, e - pad)] + [len(pcm)]
+    segments = []
+    for i in range(len(texts)):
+        start, end = bounds[2 * i], bounds[2 * i + 1]
+        if i == len(texts) - 1:
+            # 去掉最後一句後面的固定停頓
+            loud = np.flatnonzero(np.abs(pcm[start:]) > 10 ** (SILENCE_DBFS / 20))
+            end = min(len(pcm), start + int(loud[-1]) + 1 + pad) if loud.size else start
+        segments.append(pcm[start:end])
+    if not check_split([len(segment) for segment in segments], texts, sample_rate):
+        return None
+    return segments
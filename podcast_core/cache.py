@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from podcast_core.metrics import get_metrics
+from podcast_core.workspace import link_scratch
+
+# ---------------------------------------------------------
+# 語音片段快取 (內容定址 + 磁碟持久化 + LRU 淘汰)
+# ---------------------------------------------------------
+DEFAULT_CACHE_DIR = os.environ.get(
+    "PODCAST_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "podcast-ai-tts")
+)
+DEFAULT_CACHE_MAX_MB = int(os.environ.get("PODCAST_CACHE_MAX_MB", "2048"))
+
+
+def make_cache_key(*parts):
+    # 每個欄位先寫入長度再寫入內容，避免 ("ab", "c") 與 ("a", "bc") 撞號
+    h = hashlib.sha256()
+    for part in parts:
+        raw = str(part).encode("utf-8")
+        h.update(len(raw).to_bytes(4, "big"))
+        h.update(raw)
+    return h.hexdigest()
+
+
+class SegmentCache:
+    # 音檔本體存成 root/<前兩碼>/<key><副檔名>，索引與存取時間記錄在 SQLite，
+    # 因此同一台機器上的所有 Streamlit session (甚至多個行程) 都能共用。
+    # 回傳給呼叫端的路徑是目前製作工作區中的硬連結 (workspace.link_scratch)：其他執行緒寫入新片段觸發 LRU 淘汰時，
+    # 已經查到但還沒解碼的檔案不會跟著消失。
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db_path = os.path.join(root, "index.sqlite3")
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL, meta TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+
+    def _connect(self):
+        return sqlite3.connect(self._db_path, timeout=30)
+
+    def _lookup(self, conn, key):
+        # 命中時回傳 (工作區中的路徑, meta)；檔案已被刪除 (淘汰或外部刪除) 時把索引一併清掉並回傳 None
+        row = conn.execute("SELECT path, meta FROM entries WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        try:
+            path = link_scratch(row[0]) if os.path.exists(row[0]) else None
+        except FileNotFoundError:
+            path = None
+        if path is None:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return path, (json.loads(row[1]) if row[1] else {})
+
+    def get_entry(self, key):
+        # 命中時回傳 (路徑, meta)，未命中回傳 None
+        with self._connect() as conn:
+            entry = self._lookup(conn, key)
+        with self._lock:
+            if entry:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry
+
+    def get_any(self, keys):
+        # 依序查多個 key，回傳第一個命中的 (key, 路徑, meta)；整次查詢只計一次命中或未命中
+        with self._connect() as conn:
+            for key in keys:
+                entry = self._lookup(conn, key)
+                if entry:
+                    with self._lock:
+                        self.hits += 1
+                    return (key, *entry)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def put(self, key, src_path, meta=None):
+        ext = os.path.splitext(src_path)[1]
+        folder = os.path.join(self.root, key[:2])
+        os.makedirs(folder, exist_ok=True)
+        dst = os.path.join(folder, key + ext)
+        # 先複製到暫存檔再 os.replace，避免其他 session 讀到寫一半的檔案
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".part")
+        os.close(fd)
+        try:
+            shutil.copyfile(src_path, tmp)
+            os.replace(tmp, dst)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        size = os.path.getsize(dst)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, path, size, last_access, meta) VALUES (?, ?, ?, ?, ?)",
+                (key, dst, size, time.time(), json.dumps(meta, ensure_ascii=False) if meta else None),
+            )
+        # 先在工作區留硬連結再淘汰，剛寫入的這一份即使馬上被淘汰也還能用
+        held = link_scratch(dst)
+        self._evict()
+        return held
+
+    def _evict(self):
+        with self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, path, size in conn.execute(
+                "SELECT key, path, size FROM entries ORDER BY last_access ASC"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+
+    def stats(self):
+        with self._connect() as conn:
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": (hits / lookups) if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+
+def _cache_samples(name, cache):
+    # 只讀記憶體中的計數，不查 SQLite，避免抓取 /metrics 時拖慢製作
+    with cache._lock:
+        hits, misses = cache.hits, cache.misses
+    return [("podcast_cache_lookups_total", "counter", {"cache": name, "result": "hit"}, hits),
+            ("podcast_cache_lookups_total", "counter", {"cache": name, "result": "miss"}, misses)]
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_segment_cache(name="segments"):
+    # 行程層級的單例：同一個 Streamlit 伺服器內的所有 session 共用同一份快取
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = cache = SegmentCache(
+                os.path.join(DEFAULT_CACHE_DIR, name), DEFAULT_CACHE_MAX_MB * 1024 * 1024
+            )
+            get_metrics().add_collector(lambda: _cache_samples(name, cache))
+        return _caches[name]
@@ -0,0 +1,177 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from podcast_core.cache import get_segment_cache
+from podcast_core.manifest import manifest_dir_for
+from podcast_core.metrics import STAGE_LABELS
+from podcast_core.profiles import DEFAULT_OUTPUT_PROFILE, OUTPUT_PROFILES, get_output_profile
+from podcast_core.render import render_audiobook, render_bilingual_episode, render_indigenous_episode
+from podcast_core.scheduler import DEFAULT_WORKERS
+from podcast_core.script_io import DEFAULT_SPEAKER, DEFAULT_TRIBE, fix_invalid_speakers, parse_script_file
+from podcast_core.segmenter import char_budget, iter_segments, iter_text_file
+from podcast_core.speakers import speaker_map
+
+# ---------------------------------------------------------
+# 命令列批次製作 (不需開啟 Streamlit)
+# ---------------------------------------------------------
+# 用法範例：
+#   python -m podcast_core.cli scripts/*.xlsx --mode bilingual --out-dir renders --jobs 3
+#   python -m podcast_core.cli book.txt --mode audiobook --tribe 排灣 --speaker 排灣_南_女聲
+#   python -m podcast_core.cli scripts/*.xlsx --profile speech-opus            # 24 kHz Opus，檔案最小
+# 多個劇本同時製作時共用同一組 Gradio 連線池、Azure Session 與語音快取。
+MODES = ("indigenous", "bilingual", "audiobook")
+OUTPUT_SUFFIX = {"indigenous": "_indigenous", "bilingual": "_bilingual", "audiobook": "_audiobook"}
+
+_print_lock = threading.Lock()
+
+
+def log(message):
+    with _print_lock:
+        print(message, flush=True)
+
+
+def load_dialogue(path):
+    with open(path, "rb") as f:
+        dialogue = parse_script_file(os.path.basename(path), f)
+    fixed = fix_invalid_speakers(dialogue, speaker_map)
+    if fixed:
+        log(f"[{os.path.basename(path)}] {fixed} 句的族群/語者不在清單中，已自動改正")
+    return dialogue
+
+
+def load_long_text_chunks(path, budget):
+    # 有聲書模式：.txt 邊讀邊切段 (大檔案不必整份載入)；其他劇本格式則把每一行族語內容依序接起來再切段
+    if path.endswith(".txt"):
+        with open(path, "rb") as f:
+            return list(iter_text_file(f, budget))
+    return list(iter_segments((item['text'] for item in load_dialogue(path)), budget))
+
+
+def output_names(paths):
+    # 每個輸入檔的輸出檔名 (不含副檔名)；不同資料夾的同名檔 (a/ep1.xlsx、b/ep1.xlsx) 加上資料夾名稱，
+    # 仍然重複時 (例如同一個檔案列了兩次) 再加上序號，避免同時製作時互相覆寫
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    names = []
+    for path, stem in zip(paths, stems):
+        if stems.count(stem) > 1:
+            parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+            stem = f"{parent}-{stem}" if parent else stem
+        names.append(stem)
+    return [f"{name}-{names[:i].count(name) + 1}" if names.count(name) > 1 else name for i, name in enumerate(names)]
+
+
+def render_file(path, name, args, bgm):
+    output_path = os.path.join(args.out_dir, name + OUTPUT_SUFFIX[args.mode] + get_output_profile(args.profile).extension)
+    on_status = (lambda msg: log(f"[{name}] {msg}")) if args.verbose else (lambda msg: None)
+    common = dict(bgm=bgm, bgm_volume=args.bgm_volume, duck=args.duck, workers=args.workers, on_status=on_status,
+                  profile=args.profile)
+    if args.incremental:
+        common['manifest_dir'] = manifest_dir_for("cli", os.path.abspath(output_path), args.mode)
+    started = time.perf_counter()
+    try:
+        if args.mode == "audiobook":
+            chunks = load_long_text_chunks(path, char_budget(args.speaker, args.max_chars))
+            result = render_audiobook(chunks, args.tribe, args.speaker, output_path, **common)
+        elif args.mode == "bilingual":
+            result = render_bilingual_episode(
+                load_dialogue(path), output_path, zh_gender=args.zh_gender, gap_time=args.gap,
+                azure_key=args.azure_key, azure_region=args.azure_region, zh_batch=not args.no_zh_batch, **common)
+        else:
+            result = render_indigenous_episode(load_dialogue(path), output_path, **common)
+        error = None if result else "沒有可合成的內容"
+    except Exception as e:
+        result, error = None, str(e)
+    return {
+        'file': path,
+        'output': output_path if result else None,
+        'lines': result['lines'] if result else 0,
+        'reused': result['reused'] if result else 0,
+        'failed': result['failed'] if result else [],
+        'stages': result['stages'] if result else [],
+        'duration': result['duration'] if result else 0.0,
+        'seconds': time.perf_counter() - started,
+        'error': error,
+    }
+
+
+def print_report(reports, wall, verbose=False):
+    log("")
+    log(f"{'檔案':<40} {'句數':>6} {'長度(秒)':>10} {'耗時(秒)':>10} {'倍速':>7}")
+    for r in reports:
+        if r['error']:
+            log(f"{r['file']:<40} 失敗: {r['error']}")
+            continue
+        speed = r['duration'] / r['seconds'] if r['seconds'] else 0.0
+        reused = f" (沿用 {r['reused']} 句)" if r['reused'] else ""
+        failed = f" (失敗略過 {len(r['failed'])} 句: #{', #'.join(map(str, r['failed'][:10]))})" if r['failed'] else ""
+        log(f"{r['file']:<40} {r['lines']:>6} {r['duration']:>10.1f} {r['seconds']:>10.1f} {speed:>6.1f}x{reused}{failed}")
+        if verbose:
+            # 各執行緒的累計耗時，找出時間花在哪個階段
+            log("    " + " · ".join(f"{STAGE_LABELS.get(stage, stage)} {total:.1f}s/{count}" for stage, count, total in r['stages'][:6]))
+    ok = [r for r in reports if not r['error']]
+    lines = sum(r['lines'] for r in ok)
+    audio = sum(r['duration'] for r in ok)
+    log("")
+    log(f"完成 {len(ok)}/{len(reports)} 個檔案，總耗時 {wall:.1f} 秒")
+    if wall > 0:
+        log(f"吞吐量: {lines / wall:.2f} 句/秒，每分鐘產出 {audio / wall:.1f} 分鐘音訊")
+    for name in ("segments", "zh"):
+        stats = get_segment_cache(name).stats()
+        log(f"快取 {name}: 命中 {stats['hits']} / 未命中 {stats['misses']} (命中率 {stats['hit_rate']:.0%})")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m podcast_core.cli", description="批次製作族語 Podcast / 有聲書")
+    parser.add_argument("inputs", nargs="+", help=".xlsx / .txt / .csv / .parquet / .jsonl 劇本檔")
+    parser.add_argument("--mode", choices=MODES, default="indigenous", help="indigenous=全族語, bilingual=雙語教學, audiobook=長文有聲書")
+    parser.add_argument("--out-dir", default="renders")
+    parser.add_argument("--jobs", type=int, default=2, help="同時製作的劇本數")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="每個劇本同時送出的合成請求數")
+    parser.add_argument("--profile", choices=list(OUTPUT_PROFILES), default=DEFAULT_OUTPUT_PROFILE,
+                        help="輸出設定檔: " + ", ".join(f"{p.name}={p.label}" for p in OUTPUT_PROFILES.values()))
+    parser.add_argument("--bgm", help="背景音樂檔")
+    parser.add_argument("--bgm-volume", type=float, default=0.15)
+    parser.add_argument("--duck", action="store_true", help="人聲出現時自動壓低 BGM")
+    parser.add_argument("--zh-gender", choices=["女聲", "男聲"], default="女聲")
+    parser.add_argument("--gap", type=float, default=0.5, help="族語與中文翻譯之間的間隔秒數")
+    parser.add_argument("--azure-key", default=os.environ.get("AZURE_SPEECH_KEY", ""))
+    parser.add_argument("--azure-region", default=os.environ.get("AZURE_SPEECH_REGION", ""))
+    parser.add_argument("--no-zh-batch", action="store_true", help="停用 Azure 批次合成")
+    parser.add_argument("--tribe", default=DEFAULT_TRIBE, help="有聲書模式的朗讀族群")
+    parser.add_argument("--speaker", default=DEFAULT_SPEAKER, help="有聲書模式的朗讀語者")
+    parser.add_argument("--max-chars", type=int, help="有聲書模式每段字數上限 (預設依語者的字數預算)")
+    parser.add_argument("--incremental", action="store_true", help="只重新合成與上次輸出相比有修改的句子")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.mode == "audiobook" and args.speaker not in speaker_map.get(args.tribe, []):
+        log(f"語者 {args.speaker} 不屬於族群 {args.tribe}")
+        return 2
+    os.makedirs(args.out_dir, exist_ok=True)
+    bgm = None
+    if args.bgm:
+        with open(args.bgm, "rb") as f:
+            bgm = f.read()
+    started = time.perf_counter()
+    reports = []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs), thread_name_prefix="render") as executor:
+        futures = {executor.submit(render_file, path, name, args, bgm): i
+                   for i, (path, name) in enumerate(zip(args.inputs, output_names(args.inputs)))}
+        for future in as_completed(futures):
+            r = future.result()
+            reports.append((futures[future], r))
+            log(f"{'✅' if not r['error'] else '❌'} {r['file']} ({r['seconds']:.1f} 秒)")
+    reports = [r for _, r in sorted(reports, key=lambda item: item[0])]
+    print_report(reports, time.perf_counter() - started, args.verbose)
+    return 0 if all(not r['error'] for r in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
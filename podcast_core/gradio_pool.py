@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from podcast_core.metrics import get_metrics, timed
+
+# ---------------------------------------------------------
+# Gradio Client 連線池 (常駐連線 + 記住各連線目前的族群)
+# ---------------------------------------------------------
+DEFAULT_POOL_SIZE = int(os.environ.get("PODCAST_GRADIO_POOL_SIZE", "8"))
+# 遠端切換族群 (/lambda) 後需要等模型載入，只有真的切換時才等待
+SWITCH_DELAY = float(os.environ.get("PODCAST_GRADIO_SWITCH_DELAY", "1.0"))
+
+
+def _default_client_factory(url):
+    from gradio_client import Client as GradioClient
+    from podcast_core.workspace import get_scratch
+    # 合成結果下載到受容量管理的暫存區，寫入片段快取後即刪除 (預設的 /tmp/gradio 永遠不會清理)
+    return GradioClient(url, download_files=get_scratch().area("downloads"))
+
+
+class PooledClient:
+    def __init__(self, client):
+        self.client = client
+        self.ethnicity = None
+        self.patched_speakers = set()
+
+
+class GradioClientPool:
+    def __init__(self, url, max_size=DEFAULT_POOL_SIZE, client_factory=None, switch_delay=SWITCH_DELAY):
+        self.url = url
+        self.max_size = max_size
+        self.switch_delay = switch_delay
+        self._factory = client_factory or _default_client_factory
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+        self.stats = {"created": 0, "discarded": 0, "switches": 0, "switch_skipped": 0}
+
+    def _acquire(self, tribe):
+        with timed("gradio_pool_wait"), self._cond:
+            while True:
+                # 優先挑已經切換到同一族群的閒置連線
+                for pc in self._idle:
+                    if pc.ethnicity == tribe:
+                        self._idle.remove(pc)
+                        return pc
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.max_size:
+                    self._created += 1
+                    break
+                self._cond.wait()
+        try:
+            with timed("gradio_client_create"):
+                pc = PooledClient(self._factory(self.url))
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.stats["created"] += 1
+        return pc
+
+    def has_idle(self, tribe):
+        # 是否有已切換到 tribe 的閒置連線 (路由時優先選這個端點，省下切換族群的等待)
+        with self._cond:
+            return any(pc.ethnicity == tribe for pc in self._idle)
+
+    def _release(self, pc, broken=False):
+        with self._cond:
+            if broken:
+                # 發生錯誤的連線狀態不明 (族群可能沒切成功)，直接丟棄重建
+                self._created -= 1
+                self.stats["discarded"] += 1
+            else:
+                self._idle.append(pc)
+            self._cond.notify()
+
+    def _patch_speaker(self, pc, speaker):
+        # 繞過 gradio_client 對語者 enum 的檢查，每條連線每位語者只需處理一次
+        if speaker in pc.patched_speakers:
+            return
+        try:
+            target_endpoints = [pc.client.endpoints.get('/default_speaker_tts'), pc.client.endpoints.get('/custom_speaker_tts')]
+            for endpoint in target_endpoints:
+                if endpoint and hasattr(endpoint, 'parameters'):
+                    for param in endpoint.parameters:
+                        if 'enum' in param and speaker not in param['enum']:
+                            param['enum'].append(speaker)
+                        if 'choices' in param and speaker not in param['choices']:
+                            param['choices'].append(speaker)
+        except Exception:
+            pass
+        pc.patched_speakers.add(speaker)
+
+    def _switch_ethnicity(self, pc, tribe):
+        if pc.ethnicity == tribe:
+            with self._cond:
+                self.stats["switch_skipped"] += 1
+            return
+        with timed("gradio_switch"):
+            pc.client.predict(ethnicity=tribe, api_name="/lambda")
+        with timed("gradio_switch_sleep"):
+            time.sleep(self.switch_delay)
+        pc.ethnicity = tribe
+        with self._cond:
+            self.stats["switches"] += 1
+
+    @contextmanager
+    def session(self, tribe, speaker):
+        # 取得一條已切換到 tribe 且已允許 speaker 的連線，用完自動歸還
+        pc = self._acquire(tribe)
+        try:
+            self._patch_speaker(pc, speaker)
+            self._switch_ethnicity(pc, tribe)
+            yield pc.client
+        except BaseException:
+            self._release(pc, broken=True)
+            raise
+        else:
+            self._release(pc)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_gradio_pool(url):
+    # 行程層級單例：所有 Streamlit session 共用暖機好的連線
+    with _pools_lock:
+        if url not in _pools:
+            _pools[url] = pool = GradioClientPool(url)
+            get_metrics().add_collector(lambda: [
+                (f"podcast_gradio_pool_{name}_total", "counter", {"url": url}, value) for name, value in pool.stats.items()
+            ])
+        return _pools[url]
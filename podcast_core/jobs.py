@@ -0,0 +1,247 @@
+import collections
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from podcast_core.cache import DEFAULT_CACHE_DIR
+from podcast_core.procs import pid_alive
+from podcast_core.workspace import get_scratch
+
+# ---------------------------------------------------------
+# 背景製作工作佇列 (SQLite 持久化，由獨立的 worker 行程執行)
+# ---------------------------------------------------------
+# 頁面重新整理、Streamlit rerun 或斷線都不會中斷已送出的工作，
+# 完成的 MP3 留在 jobs 目錄中，之後可以用同一個 owner 查回來。
+# 每件工作結束時清理已結束的舊工作 (成品檔與資料列一起刪除)：每位使用者只保留最近 JOBS_KEEP_PER_OWNER 件，
+# 超過 JOB_MAX_AGE 秒的一律刪除，成品總容量超過 DEFAULT_JOBS_MAX_MB 時再從最舊的開始刪。
+DEFAULT_JOBS_DIR = os.environ.get("PODCAST_JOBS_DIR", os.path.join(DEFAULT_CACHE_DIR, "jobs"))
+DEFAULT_JOB_WORKERS = int(os.environ.get("PODCAST_JOB_WORKERS", "2"))
+DEFAULT_JOBS_MAX_MB = int(os.environ.get("PODCAST_JOBS_MAX_MB", "2048"))
+JOBS_KEEP_PER_OWNER = int(os.environ.get("PODCAST_JOBS_KEEP", "10"))
+JOB_MAX_AGE = float(os.environ.get("PODCAST_JOBS_MAX_DAYS", "7")) * 86400
+# 找不到對應工作的 inputs/outputs 檔案，超過這個秒數才刪除 (送出工作時 BGM 會比資料列先寫入)
+ORPHAN_GRACE = 3600
+
+JOB_KINDS = ("indigenous", "bilingual", "audiobook")
+
+
+
+def _json_default(value):
+    # 劇本列 (ScriptLine) 等物件以 dict 形式存進 params
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class JobQueue:
+    def __init__(self, root=DEFAULT_JOBS_DIR, max_bytes=DEFAULT_JOBS_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.output_dir = os.path.join(root, "outputs")
+        self.input_dir = os.path.join(root, "inputs")
+        os.makedirs(self.output_dir, exist_ok=True)
+        os.makedirs(self.input_dir, exist_ok=True)
+        self._db_path = os.path.join(root, "jobs.sqlite3")
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, owner TEXT, kind TEXT NOT NULL, params TEXT NOT NULL,"
+                " status TEXT NOT NULL, progress REAL NOT NULL DEFAULT 0, message TEXT,"
+                " output_path TEXT, error TEXT, worker_pid INTEGER,"
+                " created REAL NOT NULL, started REAL, finished REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs(owner, created)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self._db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, kind, params, owner=None, bgm=None):
+        # params 需可轉成 JSON；BGM 音檔另存成檔案，只在 params 中記錄路徑
+        if kind not in JOB_KINDS:
+            raise ValueError(f"未知的工作類型: {kind}")
+        job_id = uuid.uuid4().hex
+        params = dict(params)
+        if bgm is not None:
+            bgm_path = os.path.join(self.input_dir, f"{job_id}_bgm")
+            with open(bgm_path, "wb") as f:
+                f.write(bgm)
+            params['bgm_path'] = bgm_path
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, owner, kind, params, status, message, created) VALUES (?, ?, ?, ?, 'queued', '排隊中', ?)",
+                (job_id, owner, kind, json.dumps(params, ensure_ascii=False, default=_json_default), time.time()),
+            )
+        return job_id
+
+    def claim(self, worker_pid):
+        # 以 IMMEDIATE 交易原子地領取最早排隊的工作，多個 worker 行程不會搶到同一件
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_pid = ?, started = ?, message = '開始製作' WHERE id = ?",
+                (worker_pid, time.time(), row['id']),
+            )
+            conn.execute("COMMIT")
+            return dict(row, params=json.loads(row['params']))
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def update_progress(self, job_id, progress, message=None):
+        with self._connect() as conn:
+            if message is None:
+                conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (progress, job_id))
+            else:
+                conn.execute("UPDATE jobs SET progress = ?, message = ? WHERE id = ?", (progress, message, job_id))
+
+    def _scrub_params(self, conn, job_id):
+        # 工作結束後移除 Azure Key 等敏感設定與暫存的 BGM
+        row = conn.execute("SELECT params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return
+        params = json.loads(row['params'])
+        params.pop('azure_key', None)
+        bgm_path = params.pop('bgm_path', None)
+        if bgm_path and os.path.exists(bgm_path):
+            os.remove(bgm_path)
+        conn.execute("UPDATE jobs SET params = ? WHERE id = ?", (json.dumps(params, ensure_ascii=False), job_id))
+
+    def finish(self, job_id, output_path, message="完成"):
+        with self._connect() as conn:
+            self._scrub_params(conn, job_id)
+            conn.execute(
+                "UPDATE jobs SET status = 'done', progress = 1, message = ?, output_path = ?, finished = ? WHERE id = ?",
+                (message, output_path, time.time(), job_id),
+            )
+        self.prune()
+
+    def fail(self, job_id, error):
+        with self._connect() as conn:
+            self._scrub_params(conn, job_id)
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', message = '失敗', error = ?, finished = ? WHERE id = ?",
+                (error, time.time(), job_id),
+            )
+        self.prune()
+
+    def prune(self, keep_per_owner=JOBS_KEEP_PER_OWNER, max_age=JOB_MAX_AGE):
+        # 只清理已結束 (done / failed) 的工作；回傳刪除的件數
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, owner, output_path, finished FROM jobs WHERE status IN ('done', 'failed') ORDER BY finished DESC"
+            ).fetchall()
+            per_owner = collections.Counter()
+            doomed, kept = [], []
+            for row in rows:
+                per_owner[row['owner']] += 1
+                if per_owner[row['owner']] > keep_per_owner or now - (row['finished'] or 0) > max_age:
+                    doomed.append(row)
+                else:
+                    kept.append(row)
+            total = sum(_file_size(row['output_path']) for row in kept)
+            for row in reversed(kept):
+                if total <= self.max_bytes:
+                    break
+                total -= _file_size(row['output_path'])
+                doomed.append(row)
+            for row in doomed:
+                if row['output_path']:
+                    _remove_file(row['output_path'])
+                conn.execute("DELETE FROM jobs WHERE id = ?", (row['id'],))
+            known = {row['id']: row['status'] for row in conn.execute("SELECT id, status FROM jobs")}
+        # 沒有對應工作的殘留檔：inputs 只留給排隊中 / 製作中的工作，outputs 只留給還在清單中的工作
+        for folder, keep in ((self.input_dir, lambda job_id: known.get(job_id) in ('queued', 'running')),
+                             (self.output_dir, lambda job_id: job_id in known)):
+            for entry in os.scandir(folder):
+                job_id = entry.name.split("_", 1)[0].split(".", 1)[0]
+                try:
+                    stale = now - entry.stat().st_mtime > ORPHAN_GRACE
+                except OSError:
+                    continue
+                if stale and not keep(job_id):
+                    _remove_file(entry.path)
+        if doomed:
+            print(f"Pruned {len(doomed)} finished jobs")
+        return len(doomed)
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_jobs(self, owner=None, limit=20):
+        with self._connect() as conn:
+            if owner is None:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs WHERE owner = ? ORDER BY created DESC LIMIT ?", (owner, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def requeue_orphans(self):
+        # worker 行程異常結束時，把它手上 running 的工作放回佇列
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, worker_pid FROM jobs WHERE status = 'running'").fetchall()
+            for row in rows:
+                if row['worker_pid'] and not pid_alive(row['worker_pid']):
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', worker_pid = NULL, progress = 0, message = '重新排隊' WHERE id = ?",
+                        (row['id'],),
+                    )
+
+
+_queue = None
+_workers = []
+_lock = threading.Lock()
+
+
+def get_job_queue():
+    global _queue
+    with _lock:
+        if _queue is None:
+            _queue = JobQueue()
+            # 成品由 prune() 自行清理，這裡只讓暫存空間統計 (側欄、/metrics) 也算到它們
+            get_scratch().track("background_jobs", _queue.root, _queue.max_bytes)
+        return _queue
+
+
+def ensure_local_workers(count=DEFAULT_JOB_WORKERS):
+    # 在本機啟動 worker 行程 (每個 Streamlit 伺服器行程只啟動一次，結束的會補上)；
+    # count 設為 0 代表 worker 由外部另外執行 (python -m podcast_core.worker)
+    with _lock:
+        _workers[:] = [p for p in _workers if p.poll() is None]
+        while len(_workers) < count:
+            _workers.append(subprocess.Popen(
+                [sys.executable, "-m", "podcast_core.worker"],
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            ))
+        return len(_workers)
@@ -0,0 +1,231 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from podcast_core.metrics import timed
+
+try:
+    import fcntl
+except ImportError:  # Windows：不做跨行程鎖定
+    fcntl = None
+
+from podcast_core.cache import DEFAULT_CACHE_DIR, make_cache_key
+
+# ---------------------------------------------------------
+# 片段清單 (manifest)：支援只重新合成修改過的句子、以及失敗後續跑
+# ---------------------------------------------------------
+# 每次製作都把每一句組好的人聲 PCM (int16) 依序寫進 voice.pcm，並在 manifest.json 記錄
+# 「句子內容雜湊 -> 在 voice.pcm 中的位置」。下次製作時，雜湊相同的句子直接從舊檔複製 PCM，
+# 不必再合成或解碼；只有新增或修改過的句子才送出合成。
+# 製作中途失敗時，已完成的句子與舊清單中仍可用的句子都會保留，重新按下製作即可從斷點接續。
+# 每個使用者 × 分頁 (或背景工作種類) 各一份清單，放在 DEFAULT_MANIFEST_DIR 底下：開啟清單時順便清掉
+# 超過 MANIFEST_MAX_AGE 秒沒用到的清單，總容量超過 DEFAULT_MANIFEST_MAX_MB 時再依最後使用時間 (LRU) 淘汰；
+# 正在被製作使用 (已上鎖) 的清單不會被刪除。
+DEFAULT_MANIFEST_DIR = os.path.join(DEFAULT_CACHE_DIR, "manifests")
+DEFAULT_MANIFEST_MAX_MB = int(os.environ.get("PODCAST_MANIFEST_MAX_MB", "1024"))
+MANIFEST_MAX_AGE = float(os.environ.get("PODCAST_MANIFEST_MAX_DAYS", "7")) * 86400
+MANIFEST_VERSION = 1
+# 每寫入幾句就把 manifest.json 落盤一次 (行程被強制中止時最多損失這麼多句)
+FLUSH_EVERY = 20
+
+
+def manifest_dir_for(*parts):
+    return os.path.join(DEFAULT_MANIFEST_DIR, make_cache_key(*parts)[:24])
+
+
+class ManifestBusy(Exception):
+    pass
+
+
+def _manifest_usage(path):
+    # 回傳 (最後使用時間, 位元組)；掃描途中被刪掉的檔案直接略過
+    last_used = size = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return 0, 0
+    for entry in entries:
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        last_used = max(last_used, st.st_mtime)
+        size += st.st_size
+    return last_used, size
+
+
+def _remove_unlocked(path):
+    # 只刪除目前沒有製作在使用的清單；回傳是否已刪除
+    if fcntl:
+        try:
+            lock_file = open(os.path.join(path, "lock"), "a")
+        except OSError:
+            return False
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        try:
+            shutil.rmtree(path, ignore_errors=True)
+        finally:
+            lock_file.close()
+        return True
+    shutil.rmtree(path, ignore_errors=True)
+    return True
+
+
+def prune_manifests(root=DEFAULT_MANIFEST_DIR, max_bytes=DEFAULT_MANIFEST_MAX_MB * 1024 * 1024, max_age=MANIFEST_MAX_AGE, keep=None):
+    # 先清掉過期的清單，總容量仍超過上限時從最久沒用到的開始淘汰
+    try:
+        dirs = [entry.path for entry in os.scandir(root) if entry.is_dir(follow_symlinks=False)]
+    except OSError:
+        return
+    now = time.time()
+    manifests = sorted((*_manifest_usage(path), path) for path in dirs if path != keep)
+    total = sum(size for _, size, _ in manifests) + (_manifest_usage(keep)[1] if keep else 0)
+    for last_used, size, path in manifests:
+        if now - last_used <= max_age and total <= max_bytes:
+            break
+        if _remove_unlocked(path):
+            total -= size
+
+
+def line_key(*parts):
+    # 影響這一句人聲內容的所有設定都要放進來 (族群、語者、文字、中文、間隔…)
+    return make_cache_key("line", *parts)
+
+
+class RenderManifest:
+    def __init__(self, root, sample_rate):
+        self.root = root
+        self.sample_rate = sample_rate
+        os.makedirs(root, exist_ok=True)
+        # 同一份清單同時只允許一個製作使用 (例如同一位使用者連按兩次製作)
+        self._lock_file = open(os.path.join(root, "lock"), "w")
+        if fcntl:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                raise ManifestBusy(root)
+        if os.path.dirname(os.path.abspath(root)) == os.path.abspath(DEFAULT_MANIFEST_DIR):
+            prune_manifests(keep=root)
+        self._json_path = os.path.join(root, "manifest.json")
+        self._track_path = os.path.join(root, "voice.pcm")
+        self._units = {}
+        self._old_track = None
+        try:
+            with open(self._json_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION and data.get("sample_rate") == sample_rate and os.path.exists(self._track_path):
+                self._units = {k: [tuple(p) for p in v] for k, v in data["units"].items()}
+                if os.path.getsize(self._track_path):
+                    self._old_track = np.memmap(self._track_path, dtype="<i2", mode="r")
+        except (OSError, ValueError, KeyError):
+            self._units = {}
+        self._new_units = None
+        self._new_track = None
+        self._new_position = 0
+        self._pending = 0
+        self._recover()
+
+    def _recover(self):
+        # 上次製作的行程被直接終止 (沒有機會 commit)：把已落盤的進度併回正式清單
+        new_json, new_track = self._json_path + ".new", self._track_path + ".new"
+        if not (os.path.exists(new_json) and os.path.exists(new_track)):
+            return
+        try:
+            with open(new_json, encoding="utf-8") as f:
+                data = json.load(f)
+            units = {k: [tuple(p) for p in v] for k, v in data["units"].items()}
+        except (OSError, ValueError, KeyError):
+            return
+        if data.get("version") != MANIFEST_VERSION or data.get("sample_rate") != self.sample_rate:
+            return
+        self._new_units = units
+        self._new_position = os.path.getsize(new_track) // 2
+        self._new_track = open(new_track, "ab")
+        self.commit(carry_over=True)
+
+    def has(self, key):
+        return key in self._units
+
+    def read_parts(self, key):
+        # 回傳 [(float32 PCM, 是否為人聲), ...]
+        with timed("manifest_read"):
+            return [(self._old_track[offset:offset + length].astype(np.float32) / 32767, bool(is_voice))
+                    for offset, length, is_voice in self._units[key]]
+
+    def begin(self):
+        self._new_units = {}
+        self._new_position = 0
+        self._new_track = open(self._track_path + ".new", "wb")
+
+    def record(self, key, parts):
+        if key in self._new_units:
+            return
+        with timed("manifest_write"):
+            self._append(key, parts)
+        self._pending += 1
+        if self._pending >= FLUSH_EVERY:
+            self._flush()
+
+    def _append(self, key, parts):
+        entry = []
+        for pcm, is_voice in parts:
+            data = (np.clip(pcm, -1.0, 1.0) * 32767).astype("<i2")
+            self._new_track.write(data.tobytes())
+            entry.append((self._new_position, len(data), int(is_voice)))
+            self._new_position += len(data)
+        self._new_units[key] = entry
+
+    def _flush(self):
+        # 先寫暫存檔再取代，確保 manifest.json 永遠是完整的 (指向 voice.pcm.new 的已寫入範圍)
+        self._new_track.flush()
+        tmp = self._json_path + ".new.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "sample_rate": self.sample_rate,
+                       "track": os.path.basename(self._track_path) + ".new", "units": self._new_units}, f)
+        os.replace(tmp, self._json_path + ".new")
+        self._pending = 0
+
+    def commit(self, carry_over=False):
+        # carry_over=True (製作失敗時)：舊清單中這次還沒用到的句子也搬進新檔，保留給下次續跑
+        if self._new_track is None:
+            return
+        if carry_over and self._old_track is not None:
+            for key in list(self._units):
+                if key not in self._new_units:
+                    self.record(key, self.read_parts(key))
+        self._new_track.close()
+        self._new_track = None
+        self._old_track = None
+        tmp = self._json_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "sample_rate": self.sample_rate, "units": self._new_units}, f)
+        os.replace(self._track_path + ".new", self._track_path)
+        os.replace(tmp, self._json_path)
+        if os.path.exists(self._json_path + ".new"):
+            os.remove(self._json_path + ".new")
+        self._units = self._new_units
+        if self._new_position:
+            self._old_track = np.memmap(self._track_path, dtype="<i2", mode="r")
+        self._new_units = None
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def close(self):
+        self._lock_file.close()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.commit(carry_over=exc_type is not None)
+        finally:
+            self.close()
+        return False
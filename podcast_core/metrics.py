@@ -0,0 +1,224 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ---------------------------------------------------------
+# 各階段耗時統計 + Prometheus 文字格式匯出
+# ---------------------------------------------------------
+# timed("gradio_predict") 包住要量測的程式區塊：
+#   1. 累加到行程層級的直方圖，供 /metrics 抓取 (長時間觀察熱點)
+#   2. 同時累加到目前這次製作的 StageBreakdown (介面上顯示本次的耗時分布)
+# 合成在執行緒池中進行，scheduler 會把 contextvars 帶進工作執行緒，所以各執行緒的耗時都會算進同一次製作。
+METRICS_PORT = int(os.environ.get("PODCAST_METRICS_PORT", "0"))
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_LABELS = {
+    "gradio_pool_wait": "等待 Gradio 連線",
+    "gradio_client_create": "建立 Gradio 連線",
+    "gradio_switch": "切換族群 (/lambda)",
+    "gradio_switch_sleep": "切換後固定等待",
+    "gradio_predict": "族語合成 + 下載",
+    "retry_sleep": "失敗重試等待",
+    "admission_wait": "排隊等待額度",
+    "segment_cache_lookup": "族語快取查詢",
+    "segment_cache_store": "族語快取寫入",
+    "zh_cache_lookup": "中文快取查詢",
+    "azure_request": "Azure 單句合成",
+    "azure_batch_request": "Azure 批次合成",
+    "azure_batch_split": "Azure 批次切句",
+    "gtts_request": "gTTS 合成",
+    "decode": "音檔解碼",
+    "bgm_load": "BGM 解碼",
+    "bgm_mix": "BGM 混音",
+    "encode_write": "送入編碼器",
+    "encode_finish": "收尾編碼",
+    "manifest_read": "沿用先前結果",
+    "manifest_write": "寫入片段清單",
+}
+
+_breakdown = ContextVar("stage_breakdown", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+
+def _label_value(value):
+    # Prometheus 文字格式：標籤值中的反斜線、雙引號與換行要跳脫，否則整份抓取結果都無法解析
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self._collectors = []
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            if stage not in self._stages:
+                self._stages[stage] = Histogram()
+            self._stages[stage].observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add_collector(self, fn):
+        # fn() 回傳 [(名稱, 類型, {標籤}, 數值), ...]，在每次抓取時才計算 (例如快取命中數)
+        with self._lock:
+            if fn not in self._collectors:
+                self._collectors.append(fn)
+
+    def render_prometheus(self):
+        with self._lock:
+            stages = [(name, list(h.counts), h.count, h.sum) for name, h in sorted(self._stages.items())]
+            counters = sorted(self._counters.items())
+            collectors = list(self._collectors)
+        lines = ["# HELP podcast_stage_seconds Time spent in each render stage.",
+                 "# TYPE podcast_stage_seconds histogram"]
+        for name, counts, count, total in stages:
+            cumulative = 0
+            for bound, n in zip(BUCKETS, counts):
+                cumulative += n
+                lines.append(f'podcast_stage_seconds_bucket{{stage="{_label_value(name)}",le="{bound}"}} {cumulative}')
+            lines.append(f'podcast_stage_seconds_bucket{{stage="{_label_value(name)}",le="+Inf"}} {count}')
+            lines.append(f'podcast_stage_seconds_sum{{stage="{_label_value(name)}"}} {total:.6f}')
+            lines.append(f'podcast_stage_seconds_count{{stage="{_label_value(name)}"}} {count}')
+        samples = [(name, "counter", dict(labels), value) for (name, labels), value in counters]
+        for fn in collectors:
+            try:
+                samples.extend(fn())
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        # 同名的樣本要連續輸出 (依第一次出現的順序分組)，不同 collector 交錯產生的也一樣
+        first_seen = {}
+        for name, _, _, _ in samples:
+            first_seen.setdefault(name, len(first_seen))
+        samples.sort(key=lambda sample: first_seen[sample[0]])
+        declared = set()
+        for name, kind, labels, value in samples:
+            if name not in declared:
+                lines.append(f"# TYPE {name} {kind}")
+                declared.add(name)
+            label_text = ",".join(f'{k}="{_label_value(v)}"' for k, v in sorted(labels.items()))
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class StageBreakdown:
+    # 單次製作的各階段累計耗時 (多執行緒同時累加，總和可能大於實際經過時間)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def add(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def summary(self):
+        # 回傳 [(階段, 次數, 累計秒數), ...]，依耗時由多到少
+        with self._lock:
+            items = [(stage, count, total) for stage, (count, total) in self._stages.items()]
+        return sorted(items, key=lambda item: item[2], reverse=True)
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics():
+    return _registry
+
+
+def observe(stage, seconds):
+    _registry.observe(stage, seconds)
+    breakdown = _breakdown.get()
+    if breakdown is not None:
+        breakdown.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+@contextmanager
+def collect_stages():
+    breakdown = StageBreakdown()
+    token = _breakdown.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        _breakdown.reset(token)
+
+
+def format_breakdown(stages, wall=None, limit=8):
+    # 給 st.status 顯示的 Markdown 表格
+    lines = ["| 階段 | 次數 | 累計秒數 |", "|---|---:|---:|"]
+    for stage, count, total in stages[:limit]:
+        lines.append(f"| {STAGE_LABELS.get(stage, stage)} | {count} | {total:.2f} |")
+    if wall is not None:
+        lines.append(f"| **實際經過時間** | | **{wall:.2f}** |")
+    return "\n".join(lines)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = _registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT, host="0.0.0.0"):
+    # 行程層級單例：在背景執行緒提供 http://host:port/metrics；port 為 0 時不啟動
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                # 同一台機器上的其他行程已佔用這個 port (例如多開的 worker)；只嘗試一次
+                print(f"Metrics server not started on port {port}: {e}")
+                _server = False
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server or None
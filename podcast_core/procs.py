@@ -0,0 +1,16 @@
+import os
+
+# ---------------------------------------------------------
+# 行程工具 (背景工作佇列與暫存工作區共用)
+# ---------------------------------------------------------
+
+
+def pid_alive(pid):
+    # 同一台機器上的行程是否還在執行 (沒有權限送訊號時視為還在)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
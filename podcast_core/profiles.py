@@ -0,0 +1,70 @@
+import os
+
+# ---------------------------------------------------------
+# 輸出設定檔 (取樣率 / 聲道 / 編碼格式 / 位元率)
+# ---------------------------------------------------------
+# 來源都是語音：族語 (Gradio) 與 gTTS 為 24 kHz、Azure 為 16 kHz 單聲道，所以預設整條流程都以 24 kHz 處理，
+# 不再升頻到 44.1 kHz 後才編碼 (解碼、混音、編碼的取樣數少了將近一半，檔案也小得多)。
+# channels 為 0 時自動決定：沒有 BGM 時單聲道、有 BGM 時立體聲。
+# bitrate 為 kbps；MP3 可改用 vbr (LAME 的 -q:a 品質等級，0 最好、9 最小)。
+# sample_rate 是製作流程解碼、混音與送進編碼器的取樣率。Opus 的串流規格固定以 48 kHz 解碼，
+# 所以 ffprobe / 播放器看到的 .opus 一律是 48 kHz；內容仍是 24 kHz 送入的頻寬 (約 12 kHz 以下)，不另外升頻。
+class OutputProfile:
+    def __init__(self, name, label, sample_rate, channels, codec, bitrate=None, vbr=None):
+        self.name = name
+        self.label = label
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.codec = codec
+        self.bitrate = bitrate
+        self.vbr = vbr
+
+    @property
+    def extension(self):
+        return CODECS[self.codec][2]
+
+    @property
+    def mime(self):
+        return CODECS[self.codec][3]
+
+    def ffmpeg_args(self):
+        encoder, muxer = CODECS[self.codec][:2]
+        args = ["-c:a", encoder]
+        if self.vbr is not None and self.codec == "mp3":
+            args += ["-q:a", str(self.vbr)]
+        elif self.bitrate:
+            args += ["-b:a", f"{self.bitrate}k"]
+        if self.codec == "aac":
+            # 讓播放器 (st.audio) 不必下載完整檔案就能開始播放
+            args += ["-movflags", "+faststart"]
+        elif self.codec == "opus":
+            # 預設的最高複雜度編碼很慢，語音用中等複雜度音質幾乎相同
+            args += ["-compression_level", "5"]
+        return args + ["-f", muxer]
+
+
+# 編碼格式 -> (ffmpeg 編碼器, 封裝格式, 副檔名, MIME)
+CODECS = {
+    "mp3": ("libmp3lame", "mp3", ".mp3", "audio/mpeg"),
+    "aac": ("aac", "mp4", ".m4a", "audio/mp4"),
+    "opus": ("libopus", "ogg", ".opus", "audio/ogg"),
+}
+
+OUTPUT_PROFILES = {p.name: p for p in (
+    OutputProfile("speech-mp3", "語音 MP3 (24 kHz, VBR 約 48 kbps)", 24000, 0, "mp3", vbr=7),
+    OutputProfile("speech-aac", "語音 AAC (24 kHz, 48 kbps)", 24000, 0, "aac", bitrate=48),
+    OutputProfile("speech-opus", "語音 Opus (32 kbps，檔案最小；Opus 播放時一律為 48 kHz)", 24000, 0, "opus", bitrate=32),
+    OutputProfile("studio-mp3", "高音質 MP3 (44.1 kHz, 128 kbps，與舊版相同)", 44100, 0, "mp3", bitrate=128),
+)}
+DEFAULT_OUTPUT_PROFILE = os.environ.get("PODCAST_OUTPUT_PROFILE", "speech-mp3")
+
+
+def get_output_profile(name=None):
+    # 未知的名稱退回預設值 (例如舊的背景工作參數)
+    return OUTPUT_PROFILES.get(name or DEFAULT_OUTPUT_PROFILE) or OUTPUT_PROFILES["speech-mp3"]
+
+
+def mime_for_path(path):
+    # 依成品副檔名回傳 MIME (背景工作的成品路徑)
+    ext = os.path.splitext(path)[1].lower()
+    return next((mime for _, _, extension, mime in CODECS.values() if extension == ext), "application/octet-stream")
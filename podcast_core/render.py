@@ -0,0 +1,285 @@
+import functools
+import os
+import time
+from contextlib import nullcontext
+
+import numpy as np
+
+from podcast_core.assembly import StreamingEncoder, decode_audio
+from podcast_core.azure_tts import AZURE_BATCH_FORMAT, plan_batches, speech_weight, synthesize_azure_batch
+from podcast_core.manifest import ManifestBusy, RenderManifest, line_key
+from podcast_core.metrics import collect_stages, get_metrics
+from podcast_core.profiles import get_output_profile
+from podcast_core.resilience import LineFailure, isolate
+from podcast_core.scheduler import DEFAULT_WORKERS, ReorderBuffer, iter_completed
+from podcast_core.tts import (INDIGENOUS_TTS_VERSION, chinese_voice_name, clean_text, generate_chinese_audio_smart,
+                              lookup_chinese_cache, store_chinese_cache, synthesize_indigenous_speech)
+from podcast_core.workspace import get_scratch, scratch_dir, scratch_file
+
+# ---------------------------------------------------------
+# 節目製作流程 (Streamlit 分頁與命令列批次製作共用)
+# ---------------------------------------------------------
+# 進度回報一律透過回呼：on_progress(已完成, 總數)、on_status(訊息)；
+# 回呼只會在呼叫端的執行緒中被呼叫，因此可以直接操作 Streamlit 元件。
+# 每個函式回傳 {'lines': 句數, 'reused': 沿用先前結果的句數, 'failed': [合成失敗的劇本行號 / 段落編號, ...],
+#              'duration': 成品秒數, 'wall': 實際耗時, 'stages': [(階段, 次數, 累計秒數), ...]}，沒有可合成的內容時回傳 None。
+# 族語單句重試後仍失敗時略過該句繼續製作 (不寫進 manifest)，下次增量製作只會重新合成這些句子；全部失敗才丟出例外。
+# 雙語節目的中文失敗或退回 gTTS (要求 Azure 時) 的句子仍會輸出，但同樣不寫進 manifest，下次增量製作會重試。
+# 中間檔一律放在這次製作的暫存工作區 (podcast_core.workspace)，製作結束時不論成敗都會刪除。
+# profile 為輸出設定檔名稱 (profiles.OUTPUT_PROFILES)，整條流程以它的取樣率解碼、混音與編碼；未指定時使用預設值。
+# 傳入 manifest_dir 時啟用增量製作：內容沒變的句子直接沿用上次的 PCM，失敗後也能從斷點續跑。
+
+
+def _noop(*args):
+    pass
+
+
+def _instrumented(mode):
+    # 收集本次製作各階段的耗時附在結果上，並累加 /metrics 的製作次數與耗時；整個製作在獨立的暫存工作區中進行
+    def decorator(render):
+        @functools.wraps(render)
+        def wrapper(*args, **kwargs):
+            metrics = get_metrics()
+            started = time.perf_counter()
+            with collect_stages() as breakdown, get_scratch().job():
+                try:
+                    result = render(*args, **kwargs)
+                except Exception:
+                    metrics.inc("podcast_renders_total", mode=mode, status="error")
+                    raise
+            if result is None:
+                return None
+            wall = time.perf_counter() - started
+            metrics.observe(f"render_{mode}", wall)
+            metrics.inc("podcast_renders_total", mode=mode, status="ok")
+            metrics.inc("podcast_render_lines_total", result['lines'], mode=mode)
+            metrics.inc("podcast_render_failed_lines_total", len(result['failed']), mode=mode)
+            metrics.inc("podcast_render_audio_seconds_total", round(result['duration'], 3), mode=mode)
+            return dict(result, wall=wall, stages=breakdown.summary())
+        return wrapper
+    return decorator
+
+
+def _open_manifest(manifest_dir, sample_rate):
+    if not manifest_dir:
+        return None
+    try:
+        # 取樣率不同 (換了輸出設定檔) 時舊的 PCM 不能沿用，清單會視為空的
+        return RenderManifest(manifest_dir, sample_rate)
+    except ManifestBusy:
+        # 另一個製作正在使用同一份清單：這次就完整合成，不沿用也不記錄
+        print(f"Manifest busy, rendering without it: {manifest_dir}")
+        return None
+
+
+def _emit_line(encoder, manifest, key, parts, record=True):
+    # parts: [(float32 PCM, 是否為人聲), ...]；寫進編碼器，record 為真時記錄到 manifest
+    for pcm, is_voice in parts:
+        encoder.write_pcm(pcm, is_voice)
+    encoder.add_silence(1.0)
+    if manifest and record:
+        manifest.record(key, parts)
+
+
+def _all_failed(failures):
+    error = next(iter(failures.values()))
+    return RuntimeError(f"全部 {len(failures)} 句合成失敗: {error}")
+
+
+def _render_indigenous_jobs(jobs, output_path, describe, bgm, bgm_volume, duck, workers, on_progress, on_status, manifest_dir,
+                            profile):
+    # jobs: [(族群, 語者, 文字), ...]；依完成順序回報進度，依劇本順序一到齊就直接送進編碼器
+    # 回傳結果中的 'failed' 為 jobs 的索引，由呼叫端換成劇本行號或段落編號
+    profile = get_output_profile(profile)
+    manifest = _open_manifest(manifest_dir, profile.sample_rate)
+    keys = [line_key("ind", INDIGENOUS_TTS_VERSION, *job) for job in jobs]
+    reused = [j for j in range(len(jobs)) if manifest and manifest.has(keys[j])]
+    todo = [j for j in range(len(jobs)) if not (manifest and manifest.has(keys[j]))]
+    if reused:
+        on_status(f"沿用先前結果 {len(reused)} 句，重新合成 {len(todo)} 句")
+    reorder = ReorderBuffer()
+    failures = {}
+
+    def emit(j, path):
+        if isinstance(path, LineFailure):
+            return
+        parts = manifest.read_parts(keys[j]) if path is None else [(decode_audio(path, encoder.sample_rate), True)]
+        _emit_line(encoder, manifest, keys[j], parts)
+
+    with StreamingEncoder(output_path, bgm=bgm, bgm_volume=bgm_volume, duck=duck, profile=profile) as encoder, \
+            manifest or nullcontext():
+        for j in reused:
+            for k, path in reorder.push(j, None):
+                emit(k, path)
+        synthesize = isolate(lambda j: synthesize_indigenous_speech(*jobs[j]))
+        for done, (t, path) in enumerate(iter_completed(synthesize, todo, workers), len(reused) + 1):
+            j = todo[t]
+            if isinstance(path, LineFailure):
+                failures[j] = path
+                on_status(f"⚠️ {describe(j, done)}：合成失敗 ({path})，略過")
+            else:
+                on_status(describe(j, done))
+            on_progress(done, len(jobs))
+            for k, ready_path in reorder.push(j, path):
+                emit(k, ready_path)
+        if failures and len(failures) == len(jobs):
+            raise _all_failed(failures)
+        on_status("🎵 收尾編碼中...")
+    return {'lines': len(jobs), 'reused': len(reused), 'failed': sorted(failures),
+            'duration': encoder.position / encoder.sample_rate}
+
+
+@_instrumented("indigenous")
+def render_indigenous_episode(dialogue, output_path, bgm=None, bgm_volume=0.15, duck=False,
+                              workers=DEFAULT_WORKERS, on_progress=_noop, on_status=_noop, manifest_dir=None, profile=None):
+    # Podcast I (全族語)
+    lines = [(idx, item['tribe'], item['speaker'], clean_text(item['text'])) for idx, item in enumerate(dialogue)]
+    lines = [line for line in lines if line[3]]
+    if not lines:
+        return None
+    on_status(f"同時合成 {len(lines)} 句 (併發 {workers})...")
+    result = _render_indigenous_jobs(
+        [line[1:] for line in lines], output_path,
+        lambda j, done: f"完成 #{lines[j][0]+1} {lines[j][1]}",
+        bgm, bgm_volume, duck, workers, on_progress, on_status, manifest_dir, profile)
+    return dict(result, failed=[lines[j][0] + 1 for j in result['failed']])
+
+
+@_instrumented("audiobook")
+def render_audiobook(chunks, tribe, speaker, output_path, bgm=None, bgm_volume=0.15, duck=False,
+                     workers=DEFAULT_WORKERS, on_progress=_noop, on_status=_noop, manifest_dir=None, profile=None):
+    # 長文有聲書：chunks 為已切分好的段落
+    if not chunks:
+        return None
+    result = _render_indigenous_jobs(
+        [(tribe, speaker, chunk) for chunk in chunks], output_path,
+        lambda j, done: f"完成段落 {j+1}/{len(chunks)} (已完成 {done})",
+        bgm, bgm_volume, duck, workers, on_progress, on_status, manifest_dir, profile)
+    return dict(result, failed=[j + 1 for j in result['failed']])
+
+
+@_instrumented("bilingual")
+def render_bilingual_episode(dialogue, output_path, zh_gender="女聲", gap_time=0.5, azure_key='', azure_region='',
+                             zh_batch=True, bgm=None, bgm_volume=0.15, duck=False, workers=DEFAULT_WORKERS,
+                             on_progress=_noop, on_status=_noop, on_chinese=_noop, manifest_dir=None, profile=None):
+    # Podcast II (雙語教學)；on_chinese(劇本行號, 是否成功, 引擎) 在每句中文完成時呼叫
+    jobs = []
+    for idx, item in enumerate(dialogue):
+        txt = clean_text(item['text'])
+        zh = clean_text(item.get('zh', ''))
+        if txt: jobs.append((idx, item['tribe'], item['speaker'], txt, zh))
+    if not jobs:
+        return None
+
+    profile = get_output_profile(profile)
+    manifest = _open_manifest(manifest_dir, profile.sample_rate)
+    azure_enabled = bool(azure_key and azure_region)
+    keys = [line_key("bi", INDIGENOUS_TTS_VERSION, *job[1:], zh_gender, gap_time, azure_enabled) for job in jobs]
+    reused = [j for j in range(len(jobs)) if manifest and manifest.has(keys[j])]
+    if reused:
+        on_status(f"沿用先前結果 {len(reused)} 句，重新合成 {len(jobs) - len(reused)} 句")
+
+    # 族語 (Gradio) 與中文 (Azure/gTTS) 走不同後端、彼此無相依，拆成獨立工作一起送出，
+    # 每句的耗時取兩者中較慢的一方；同一個執行緒池也會同時處理後面幾句。
+    tasks = []
+    zh_lines = []
+    for j, job in enumerate(jobs):
+        if manifest and manifest.has(keys[j]): continue
+        tasks.append(('ind', j))
+        if job[4]: zh_lines.append((j, job[4]))
+    if azure_key and azure_region and zh_batch:
+        # Azure 批次模式：多句中文包進同一份 SSML，只需少數幾次 HTTPS 請求；只有標點的句子無法在批次中定位，逐句合成
+        batchable = [(j, zh) for j, zh in zh_lines if speech_weight(zh)]
+        tasks.extend(('zhb', [j for j, _ in batch]) for batch in plan_batches(batchable))
+        tasks.extend(('zh', j) for j, zh in zh_lines if not speech_weight(zh))
+    else:
+        tasks.extend(('zh', j) for j, _ in zh_lines)
+
+    def synthesize_chinese_line(j):
+        tmp_zh_path = scratch_file(suffix=".mp3", prefix="zh-")
+        # 呼叫新的 Azure API 智慧函式
+        success, eng = generate_chinese_audio_smart(jobs[j][4], zh_gender, tmp_zh_path, azure_key, azure_region)
+        return tmp_zh_path, success and os.path.exists(tmp_zh_path), eng
+
+    def synthesize_bilingual_part(task):
+        # 回傳 (族語路徑) 或 [(行號, 中文結果), ...]
+        kind, arg = task
+        if kind == 'ind':
+            idx, tribe, speaker, txt, zh = jobs[arg]
+            return isolate(synthesize_indigenous_speech)(tribe, speaker, txt)
+        if kind == 'zh':
+            return [(arg, synthesize_chinese_line(arg))]
+        voice_name = chinese_voice_name(zh_gender)
+        cached = {j: lookup_chinese_cache(jobs[j][4], voice_name, "Azure") for j in arg}
+        todo = [j for j in arg if not cached[j]]
+        paths = []
+        try:
+            if todo: paths = synthesize_azure_batch([jobs[j][4] for j in todo], voice_name, azure_key, azure_region, scratch_dir(prefix="azure-"))
+        except Exception as e:
+            print(f"Azure batch failed (Turning to single requests): {e}")
+            paths = None
+        if paths is None:
+            return [(j, (cached[j], True, "Azure") if cached[j] else synthesize_chinese_line(j)) for j in arg]
+        for j, path in zip(todo, paths):
+            cached[j] = store_chinese_cache(jobs[j][4], voice_name, "Azure", AZURE_BATCH_FORMAT, path)
+        return [(j, (cached[j], True, "Azure")) for j in arg]
+
+    ind_paths = [None] * len(jobs)
+    zh_results = [(None, False, None)] * len(jobs)
+    remaining = [1 + bool(job[4]) for job in jobs]
+    lines_done = len(reused)
+    on_status(f"同時合成 {len(jobs) - len(reused)} 句族語與中文 (併發 {workers})...")
+    reorder = ReorderBuffer()
+    failures = {}
+
+    def emit(k):
+        if isinstance(ind_paths[k], LineFailure):
+            # 族語失敗的句子整句略過 (中文單獨出現沒有意義)
+            return
+        record = True
+        if manifest and manifest.has(keys[k]) and ind_paths[k] is None:
+            parts = manifest.read_parts(keys[k])
+        else:
+            zh_path, zh_ok, zh_engine = zh_results[k]
+            parts = [(decode_audio(ind_paths[k], encoder.sample_rate), True)]
+            if jobs[k][4]:
+                parts.append((np.zeros(int(round(encoder.sample_rate * gap_time)), dtype=np.float32), False))
+                if zh_ok: parts.append((decode_audio(zh_path, encoder.sample_rate), True))
+                # 中文失敗或 Azure 退回 gTTS 的句子這次照樣輸出，但不記錄到 manifest，下次增量製作會重新合成中文
+                record = zh_ok and (zh_engine == "Azure" or not azure_enabled)
+        _emit_line(encoder, manifest, keys[k], parts, record)
+
+    with StreamingEncoder(output_path, bgm=bgm, bgm_volume=bgm_volume, duck=duck, profile=profile) as encoder, \
+            manifest or nullcontext():
+        for j in reused:
+            for k, _ in reorder.push(j, True):
+                emit(k)
+        for t, result in iter_completed(synthesize_bilingual_part, tasks, workers):
+            if tasks[t][0] == 'ind':
+                finished = [tasks[t][1]]
+                ind_paths[tasks[t][1]] = result
+                if isinstance(result, LineFailure):
+                    failures[tasks[t][1]] = result
+            else:
+                finished = []
+                for j, zh_result in result:
+                    finished.append(j)
+                    zh_results[j] = zh_result
+                    on_chinese(jobs[j][0], zh_result[1], zh_result[2])
+            for j in finished:
+                remaining[j] -= 1
+                if remaining[j] > 0: continue
+                lines_done += 1
+                if j in failures:
+                    on_status(f"⚠️ #{jobs[j][0]+1} 族語合成失敗 ({failures[j]})，略過")
+                else:
+                    on_status(f"完成 #{jobs[j][0]+1}")
+                on_progress(lines_done, len(jobs))
+                # 整句 (族語 + 中文) 到齊後依劇本順序送進編碼器
+                for k, _ in reorder.push(j, True):
+                    emit(k)
+        if failures and len(failures) == len(jobs):
+            raise _all_failed(failures)
+        on_status("🎵 收尾編碼中...")
+    return {'lines': len(jobs), 'reused': len(reused), 'failed': [jobs[j][0] + 1 for j in sorted(failures)],
+            'duration': encoder.position / encoder.sample_rate}
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from podcast_core.gradio_pool import get_gradio_pool
+from podcast_core.metrics import get_metrics
+from podcast_core.resilience import (_STATE_VALUES, BREAKER_RESET, CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen,
+                                     LatencyTracker)
+
+# ---------------------------------------------------------
+# 族語 TTS 多複本負載平衡 (健康檢查 + 最少進行中請求 + 各複本延遲統計)
+# ---------------------------------------------------------
+# PODCAST_INDIGENOUS_TTS_URL 可以用逗號列出多個相容的 Gradio 端點 (同一個模型的複本)：
+#   路由     每個請求送到「進行中請求最少」的複本；FAILURE_PENALTY 秒內失敗過的複本排在後面，
+#            同分時優先選有已切換到同一族群的閒置連線、延遲中位數較低的複本
+#   斷路器   每個複本各自一組 (resilience.CircuitBreaker)，斷開的複本不分配請求，冷卻後放一個試探請求
+#   健康檢查 有兩個以上複本時，背景執行緒每 HEALTH_INTERVAL 秒對各複本 GET /config，沒回應的複本暫停分配
+#            (全部都不健康時仍照常嘗試，不因健康檢查本身出問題而停擺)
+# 重試與對沖仍由 resilience.ResilientEndpoint 負責：ReplicaSet 扮演它的斷路器，所有複本都斷開時才直接失敗，
+# 重試 / 對沖的那一份請求會因為進行中請求數較少而自然送到別的複本。
+HEALTH_INTERVAL = float(os.environ.get("PODCAST_REPLICA_HEALTH_INTERVAL", "15"))
+HEALTH_TIMEOUT = 5
+FAILURE_PENALTY = BREAKER_RESET
+
+
+def parse_urls(value):
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+
+class Replica:
+    def __init__(self, url):
+        self.url = url
+        self.pool = get_gradio_pool(url)
+        self.breaker = CircuitBreaker(url)
+        self.latency = LatencyTracker()
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.failed_at = float("-inf")
+
+    def rank(self, tribe):
+        # 數值越小越優先
+        median = self.latency.quantile(0.5, min_samples=1)
+        recently_failed = time.monotonic() - self.failed_at < FAILURE_PENALTY
+        return (recently_failed, self.outstanding, not self.pool.has_idle(tribe), median or 0.0)
+
+
+class ReplicaSet:
+    def __init__(self, urls, health_interval=HEALTH_INTERVAL):
+        self.replicas = [Replica(url) for url in urls]
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if len(self.replicas) > 1 and health_interval > 0:
+            threading.Thread(target=self._health_loop, name="replica-health", daemon=True).start()
+
+    def _pick(self, tribe, exclude):
+        with self._lock:
+            candidates = [r for r in self.replicas if r not in exclude and not r.breaker.retry_in()]
+            candidates = [r for r in candidates if r.healthy] or candidates
+            if not candidates:
+                return None
+            replica = min(candidates, key=lambda r: r.rank(tribe))
+            replica.outstanding += 1
+            return replica
+
+    def _finish(self, replica, failed=None):
+        with self._lock:
+            replica.outstanding -= 1
+            if failed is not None:
+                replica.requests += 1
+                replica.failures += failed
+                if failed:
+                    replica.failed_at = time.monotonic()
+
+    @contextmanager
+    def route(self, tribe):
+        # 挑一個複本並記錄這次請求的結果與耗時；斷路器不放行的複本改挑下一個
+        tried = []
+        while True:
+            replica = self._pick(tribe, tried)
+            if replica is None:
+                raise CircuitOpen(f"族語 TTS 的 {len(self.replicas)} 個端點都暫時無法使用 (連續失敗)")
+            try:
+                replica.breaker.before_call()
+                break
+            except CircuitOpen:
+                self._finish(replica)
+                tried.append(replica)
+        started = time.perf_counter()
+        try:
+            yield replica
+        except BaseException:
+            replica.breaker.on_failure()
+            self._finish(replica, failed=True)
+            raise
+        replica.breaker.on_success()
+        replica.latency.observe(time.perf_counter() - started)
+        self._finish(replica, failed=False)
+
+    # ResilientEndpoint 的斷路器介面：各複本自己記錄成敗，這裡只在全部斷開時擋下請求
+    def before_call(self):
+        waits = [r.breaker.retry_in() for r in self.replicas]
+        if all(waits):
+            raise CircuitOpen(f"族語 TTS 的 {len(self.replicas)} 個端點都暫時無法使用 (連續失敗)，約 {min(waits):.0f} 秒後重試")
+
+    def on_success(self):
+        pass
+
+    def on_failure(self):
+        pass
+
+    @property
+    def state(self):
+        states = {r.breaker.state for r in self.replicas}
+        if CLOSED in states:
+            return CLOSED
+        return OPEN if states == {OPEN} else HALF_OPEN
+
+    @property
+    def opens(self):
+        return sum(r.breaker.opens for r in self.replicas)
+
+    def check_health(self):
+        import requests
+        for replica in self.replicas:
+            try:
+                healthy = requests.get(replica.url.rstrip("/") + "/config", timeout=HEALTH_TIMEOUT).status_code == 200
+            except requests.RequestException:
+                healthy = False
+            if healthy != replica.healthy:
+                print(f"Indigenous TTS replica {'recovered' if healthy else 'unhealthy'}: {replica.url}")
+            replica.healthy = healthy
+
+    def _health_loop(self):
+        while True:
+            try:
+                self.check_health()
+            except Exception as e:
+                print(f"Replica health check failed: {e}")
+            if self._stop.wait(self.health_interval):
+                return
+
+    def close(self):
+        self._stop.set()
+
+
+def _replica_samples(replica_set):
+    samples = []
+    for replica in replica_set.replicas:
+        labels = {"url": replica.url}
+        samples.append(("podcast_replica_healthy", "gauge", labels, int(replica.healthy)))
+        samples.append(("podcast_replica_outstanding", "gauge", labels, replica.outstanding))
+        samples.append(("podcast_replica_requests_total", "counter", labels, replica.requests))
+        samples.append(("podcast_replica_failures_total", "counter", labels, replica.failures))
+        samples.append(("podcast_replica_breaker_state", "gauge", labels, _STATE_VALUES[replica.breaker.state]))
+        for q in (0.5, 0.95):
+            value = replica.latency.quantile(q, min_samples=1)
+            if value is not None:
+                samples.append((f"podcast_replica_latency_p{int(q * 100)}_seconds", "gauge", labels, round(value, 4)))
+    return samples
+
+
+_sets = {}
+_sets_lock = threading.Lock()
+
+
+def get_replica_set(urls):
+    # 行程層級的單例：所有 session 共用各複本的連線池、進行中請求數與健康狀態
+    key = tuple(urls)
+    with _sets_lock:
+        if key not in _sets:
+            _sets[key] = replica_set = ReplicaSet(urls)
+            get_metrics().add_collector(lambda: _replica_samples(replica_set))
+        return _sets[key]
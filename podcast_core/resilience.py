@@ -0,0 +1,226 @@
+import collections
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from podcast_core.metrics import get_metrics, timed
+
+# ---------------------------------------------------------
+# 遠端 TTS 的韌性層：指數退避重試 + 斷路器 + (選用) 對沖請求
+# ---------------------------------------------------------
+# 每個端點一組 ResilientEndpoint (行程層級，所有 session 共用)：
+#   重試     失敗後等待 uniform(0, min(上限, 基準 × 2^n)) 秒 (full jitter)，多位使用者同時失敗時不會一起重打
+#   斷路器   連續失敗 BREAKER_THRESHOLD 次就「斷開」，之後 BREAKER_RESET 秒內的請求直接失敗，不再佔用重試時間；
+#            時間到先放一個試探請求 (half-open)，成功才恢復
+#   對沖     PODCAST_TTS_HEDGE=1 時，請求超過最近成功請求的 p95 延遲仍未回應，就再送一份相同的請求，取先完成的結果
+RETRY_ATTEMPTS = int(os.environ.get("PODCAST_TTS_RETRIES", "3"))
+BACKOFF_BASE = float(os.environ.get("PODCAST_TTS_BACKOFF_BASE", "0.5"))
+BACKOFF_CAP = float(os.environ.get("PODCAST_TTS_BACKOFF_CAP", "8"))
+BREAKER_THRESHOLD = int(os.environ.get("PODCAST_TTS_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.environ.get("PODCAST_TTS_BREAKER_RESET", "30"))
+HEDGE_ENABLED = os.environ.get("PODCAST_TTS_HEDGE", "0") == "1"
+HEDGE_QUANTILE = 0.95
+# 延遲樣本數不足時不對沖 (p95 還不可靠)
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 256
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP, rng=random):
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    def __init__(self, name, threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET, clock=time.monotonic):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.opens = 0
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def failures(self):
+        # 目前連續失敗的次數
+        return self._failures
+
+    def retry_in(self):
+        # 斷開時還要幾秒才會放行試探請求；沒有斷開時為 0
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def before_call(self):
+        # 斷開期間直接丟出 CircuitOpen；冷卻時間到了只放行一個試探請求
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            remaining = self.reset_timeout - (self._clock() - self._opened_at)
+            if self.state == OPEN and remaining <= 0:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+        raise CircuitOpen(f"{self.name} 暫時無法使用 (連續失敗)，約 {max(remaining, 0):.0f} 秒後重試")
+
+    def on_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def on_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.threshold):
+                self.state = OPEN
+                self._opened_at = self._clock()
+                self._probing = False
+                self.opens += 1
+
+
+class LatencyTracker:
+    # 最近 LATENCY_WINDOW 次成功請求的耗時 (秒)
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q, min_samples=HEDGE_MIN_SAMPLES):
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+# 對沖請求在獨立的執行緒池中執行 (合成用的執行緒池此時都在等結果)
+_hedge_executor = None
+_hedge_lock = threading.Lock()
+
+
+def _get_hedge_executor():
+    global _hedge_executor
+    with _hedge_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+        return _hedge_executor
+
+
+class ResilientEndpoint:
+    def __init__(self, name, attempts=RETRY_ATTEMPTS, hedge=HEDGE_ENABLED, breaker=None, sleep=time.sleep):
+        self.name = name
+        self.attempts = max(1, attempts)
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker(name)
+        self.latency = LatencyTracker()
+        self._sleep = sleep
+
+    def call(self, fn, discard=None):
+        # fn() 送出一次請求並回傳結果；discard(結果) 用來清掉對沖落敗那一份的結果 (例如下載的暫存檔)
+        metrics = get_metrics()
+        for attempt in range(self.attempts):
+            self.breaker.before_call()
+            try:
+                result = self._attempt(fn, discard)
+            except Exception:
+                self.breaker.on_failure()
+                # 這次失敗讓斷路器斷開時不必再等待重試
+                if attempt == self.attempts - 1 or self.breaker.state == OPEN:
+                    raise
+                metrics.inc("podcast_tts_retries_total", endpoint=self.name)
+                with timed("retry_sleep"):
+                    self._sleep(backoff_delay(attempt))
+                continue
+            self.breaker.on_success()
+            return result
+
+    def _attempt(self, fn, discard):
+        delay = self.latency.quantile(HEDGE_QUANTILE) if self.hedge else None
+        started = time.perf_counter()
+        if delay is None:
+            result = fn()
+            self.latency.observe(time.perf_counter() - started)
+            return result
+        executor = _get_hedge_executor()
+        futures = [executor.submit(contextvars.copy_context().run, fn)]
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            get_metrics().inc("podcast_tts_hedges_total", endpoint=self.name)
+            futures.append(executor.submit(contextvars.copy_context().run, fn))
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                self.latency.observe(time.perf_counter() - started)
+                if future is not futures[0]:
+                    get_metrics().inc("podcast_tts_hedge_wins_total", endpoint=self.name)
+                for other in pending:
+                    if not other.cancel() and discard:
+                        other.add_done_callback(lambda f: f.exception() is None and discard(f.result()))
+                return future.result()
+        raise error
+
+
+def _endpoint_samples(endpoint):
+    samples = [("podcast_tts_breaker_state", "gauge", {"endpoint": endpoint.name}, _STATE_VALUES[endpoint.breaker.state]),
+               ("podcast_tts_breaker_opens_total", "counter", {"endpoint": endpoint.name}, endpoint.breaker.opens)]
+    p95 = endpoint.latency.quantile(HEDGE_QUANTILE, min_samples=1)
+    if p95 is not None:
+        samples.append(("podcast_tts_latency_p95_seconds", "gauge", {"endpoint": endpoint.name}, round(p95, 4)))
+    return samples
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def get_resilient_endpoint(name, breaker=None):
+    # 行程層級的單例：同一個端點的斷路器狀態與延遲統計由所有 session 共用
+    # breaker 可換成其他具有 before_call / on_success / on_failure / state / opens 的物件 (例如多個複本的 ReplicaSet)
+    with _endpoints_lock:
+        if name not in _endpoints:
+            _endpoints[name] = endpoint = ResilientEndpoint(name, breaker=breaker)
+            get_metrics().add_collector(lambda: _endpoint_samples(endpoint))
+        return _endpoints[name]
+
+
+class LineFailure:
+    # 單句合成失敗的結果：製作流程略過這一句繼續往下，最後在結果中列出，下次製作 (增量) 只重試這些句子
+    def __init__(self, error):
+        self.error = error
+
+    def __str__(self):
+        return str(self.error)
+
+
+def isolate(fn):
+    # 包裝單句合成函式：例外轉成 LineFailure 回傳，不會中斷整個執行緒池
+    def wrapper(*args):
+        try:
+            return fn(*args)
+        except Exception as e:
+            return LineFailure(e)
+    return wrapper
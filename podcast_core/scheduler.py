@@ -0,0 +1,64 @@
+import contextvars
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# ---------------------------------------------------------
+# 併發合成排程器 (有上限的執行緒池，結果依完成順序回報)
+# ---------------------------------------------------------
+DEFAULT_WORKERS = int(os.environ.get("PODCAST_TTS_WORKERS", "4"))
+MAX_WORKERS = 8
+
+
+def iter_completed(fn, items, max_workers=DEFAULT_WORKERS):
+    # 以 max_workers 條執行緒同時執行 fn(item)，依完成先後 yield (索引, 結果)。
+    # 呼叫端用索引把結果放回原本的劇本順序；Streamlit 元件只在呼叫端 (主執行緒) 更新。
+    # 任一項目失敗時取消尚未開始的工作並把例外往外丟，行為與原本逐行合成一致。
+    items = list(items)
+    if not items:
+        return
+    max_workers = max(1, min(max_workers, len(items)))
+    pending_items = iter(enumerate(items))
+    # 同時在途的工作量限制在 workers 的兩倍，避免一次建立上千個 future
+    window = max_workers * 2
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts") as executor:
+        in_flight = {}
+
+        def submit_next():
+            for idx, item in pending_items:
+                # 帶入呼叫端的 contextvars (例如本次製作的耗時統計)
+                in_flight[executor.submit(contextvars.copy_context().run, fn, item)] = idx
+                return True
+            return False
+
+        for _ in range(window):
+            if not submit_next():
+                break
+        try:
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    idx = in_flight.pop(future)
+                    result = future.result()
+                    submit_next()
+                    yield idx, result
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+class ReorderBuffer:
+    # 收集依完成順序到達的結果，按原始索引順序放行，供串流編碼依劇本順序寫入
+    def __init__(self):
+        self.next_index = 0
+        self._ready = {}
+
+    def push(self, idx, value):
+        self._ready[idx] = value
+        released = []
+        while self.next_index in self._ready:
+            released.append((self.next_index, self._ready.pop(self.next_index)))
+            self.next_index += 1
+        return released
+
+    def __len__(self):
+        return len(self._ready)
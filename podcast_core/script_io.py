@@ -0,0 +1,404 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# ---------------------------------------------------------
+# Excel/Txt 劇本處理 (介面與命令列共用)
+# ---------------------------------------------------------
+# pandas / openpyxl / pyarrow 都在函式內才 import：頁面載入與逐行編輯不需要它們，第一次匯入或匯出時才載入。
+DEFAULT_TRIBE = '阿美'
+DEFAULT_SPEAKER = '阿美_秀姑巒_女聲1'
+# 劇本欄位的中文標題；匯入時中文與英文欄名都接受 (中文優先)
+COLUMN_LABELS = {'tribe': '族群', 'speaker': '語者', 'text': '族語內容', 'zh': '中文翻譯'}
+COLUMN_ALIASES = {field: (label, field) for field, label in COLUMN_LABELS.items()}
+# 串流匯入時每批整理的列數
+IMPORT_CHUNK_ROWS = 5000
+# 專案存檔格式：副檔名 -> (顯示名稱, MIME)；每一種都能再用 parse_script_file 讀回來
+EXPORT_FORMATS = {
+    'xlsx': ("Excel (.xlsx)", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'csv': ("CSV (.csv)", "text/csv"),
+    'parquet': ("Parquet (.parquet)", "application/vnd.apache.parquet"),
+    'jsonl': ("JSON Lines (.jsonl)", "application/jsonl"),
+}
+EXPORT_CACHE_ENTRIES = 8
+
+
+class ScriptLine:
+    # 劇本中的一句。用 __slots__ 取代 dict，族群 / 語者字串經過 intern，上千句共用同一份字串；
+    # 仍支援 line['text']、line.get('zh')、update()、copy() 等 dict 寫法，介面與製作流程不需改動。
+    __slots__ = ('tribe', 'speaker', 'text', 'zh')
+    FIELDS = __slots__
+
+    def __init__(self, tribe=DEFAULT_TRIBE, speaker=DEFAULT_SPEAKER, text='', zh=''):
+        self.tribe = sys.intern(str(tribe))
+        self.speaker = sys.intern(str(speaker))
+        self.text = text
+        self.zh = zh
+
+    def __getitem__(self, field):
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __setitem__(self, field, value):
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        setattr(self, field, sys.intern(str(value)) if field in ('tribe', 'speaker') else value)
+
+    def __contains__(self, field):
+        return field in self.FIELDS
+
+    def __eq__(self, other):
+        return isinstance(other, ScriptLine) and all(self[f] == other[f] for f in self.FIELDS)
+
+    def __repr__(self):
+        return f"ScriptLine({self.tribe!r}, {self.speaker!r}, {self.text!r}, {self.zh!r})"
+
+    def get(self, field, default=None):
+        return getattr(self, field) if field in self.FIELDS else default
+
+    def keys(self):
+        return self.FIELDS
+
+    def items(self):
+        return [(f, getattr(self, f)) for f in self.FIELDS]
+
+    def update(self, values=(), **kwargs):
+        for field, value in dict(values, **kwargs).items():
+            self[field] = value
+
+    def copy(self):
+        return ScriptLine(self.tribe, self.speaker, self.text, self.zh)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    @classmethod
+    def from_mapping(cls, item):
+        if isinstance(item, ScriptLine):
+            return item
+        return cls(item.get('tribe', DEFAULT_TRIBE), item.get('speaker', DEFAULT_SPEAKER), item.get('text', ''), item.get('zh', '') or '')
+
+
+def compact_dialogue(items):
+    # 把 dict 列表 (範例、舊版存檔、背景工作參數) 轉成 ScriptLine 列表
+    return [ScriptLine.from_mapping(item) for item in items]
+
+
+def convert_df_to_excel(dialogue_list):
+    # write_only 活頁簿逐列寫出，不建立 DataFrame，也不在記憶體中保留整張工作表的儲存格物件
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Script')
+    ws.append([COLUMN_LABELS[field] for field in ScriptLine.FIELDS])
+    for item in dialogue_list:
+        ws.append([item.get(field, '') for field in ScriptLine.FIELDS])
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def convert_list_to_csv(dialogue_list):
+    # 加上 BOM，直接用 Excel 開啟也不會變成亂碼
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow([COLUMN_LABELS[field] for field in ScriptLine.FIELDS])
+    writer.writerows([item.get(field, '') for field in ScriptLine.FIELDS] for item in dialogue_list)
+    return output.getvalue().encode("utf-8-sig")
+
+
+def convert_list_to_parquet(dialogue_list):
+    # 欄式壓縮格式 (需要 pyarrow，Streamlit 已內含)；族群 / 語者以字典編碼儲存，大型劇本檔案最小
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.table({field: pa.array([item.get(field, '') for item in dialogue_list], type=pa.string())
+                      for field in ScriptLine.FIELDS})
+    output = io.BytesIO()
+    pq.write_table(table, output)
+    return output.getvalue()
+
+
+def convert_list_to_jsonl(dialogue_list):
+    lines = [json.dumps({field: item.get(field, '') for field in ScriptLine.FIELDS}, ensure_ascii=False)
+             for item in dialogue_list]
+    return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+
+_EXPORTERS = {
+    'xlsx': convert_df_to_excel,
+    'csv': convert_list_to_csv,
+    'parquet': convert_list_to_parquet,
+    'jsonl': convert_list_to_jsonl,
+}
+_export_cache = OrderedDict()
+_export_cache_lock = threading.Lock()
+
+
+def script_digest(dialogue_list):
+    # 劇本內容雜湊 (欄位以控制字元分隔，不會與文字內容混淆)
+    h = hashlib.sha256()
+    for item in dialogue_list:
+        h.update("\x1f".join(str(item.get(field, '')) for field in ScriptLine.FIELDS).encode("utf-8"))
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+
+def export_script(dialogue_list, fmt='xlsx'):
+    # 依內容雜湊快取匯出結果：劇本沒變時重複下載 (或多個分頁下載同一份劇本) 不必重新產生檔案
+    if fmt not in _EXPORTERS:
+        raise ValueError(f"不支援的匯出格式: {fmt}")
+    key = (script_digest(dialogue_list), fmt)
+    with _export_cache_lock:
+        if key in _export_cache:
+            _export_cache.move_to_end(key)
+            return _export_cache[key]
+    data = _EXPORTERS[fmt](dialogue_list)
+    with _export_cache_lock:
+        _export_cache[key] = data
+        while len(_export_cache) > EXPORT_CACHE_ENTRIES:
+            _export_cache.popitem(last=False)
+    return data
+
+def convert_list_to_txt(dialogue_list):
+    txt_content = ""
+    for item in dialogue_list:
+        zh_part = f" | {item.get('zh', '')}" if item.get('zh') else ""
+        txt_content += f"{item['text']}{zh_part}\n"
+    return txt_content
+
+def _open_binary(data):
+    # 接受 bytes 或二進位檔案物件 (例如 Streamlit 的 UploadedFile、open(path, "rb"))
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return io.BytesIO(data)
+    if hasattr(data, "seek"):
+        data.seek(0)
+    return data
+
+
+def _normalize_chunk(df):
+    # 以欄為單位整理一批列：中文欄位優先，空白時改用英文欄位，再補上預設族群/語者；族語內容空白的列略過
+    import pandas as pd
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        merged = pd.Series(pd.NA, index=df.index, dtype="string")
+        for name in aliases:
+            if name in df.columns:
+                values = df[name].astype("string").str.strip()
+                merged = merged.fillna(values.mask(values == ""))
+        columns[field] = merged
+    frame = pd.DataFrame(columns)
+    frame = frame[frame['text'].notna()]
+    return (frame['tribe'].fillna(DEFAULT_TRIBE).tolist(), frame['speaker'].fillna(DEFAULT_SPEAKER).tolist(),
+            frame['text'].tolist(), frame['zh'].fillna("").tolist())
+
+
+def _unique_header(header):
+    # 重複或空白的標題欄位加上序號，避免 DataFrame 欄名衝突
+    header = [str(name).strip() if name is not None else f"_col{i}" for i, name in enumerate(header)]
+    return [name if header.index(name) == i else f"{name}_{i}" for i, name in enumerate(header)]
+
+
+def _iter_rows(header, rows, chunk_rows):
+    # 逐列讀取的表格格式 (xlsx / csv)：補齊欄數後每 chunk_rows 列整理一次
+    import pandas as pd
+    header = _unique_header(header)
+    width = len(header)
+    chunk = []
+    for row in rows:
+        row = tuple(row[:width])
+        chunk.append(row + (None,) * (width - len(row)))
+        if len(chunk) >= chunk_rows:
+            yield _normalize_chunk(pd.DataFrame(chunk, columns=header, dtype=object))
+            chunk = []
+    if chunk:
+        yield _normalize_chunk(pd.DataFrame(chunk, columns=header, dtype=object))
+
+
+def _iter_xlsx(stream, chunk_rows):
+    # openpyxl 唯讀模式逐列串流讀取第一個工作表，每 chunk_rows 列整理一次，記憶體用量與檔案大小無關
+    from openpyxl import load_workbook
+    wb = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is not None:
+            yield from _iter_rows(header, rows, chunk_rows)
+    finally:
+        wb.close()
+
+
+def _iter_csv(stream, chunk_rows):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        rows = csv.reader(text)
+        header = next(rows, None)
+        if header is not None:
+            yield from _iter_rows(header, rows, chunk_rows)
+    finally:
+        # 解析失敗時也要卸下 wrapper，否則它被回收時會連同呼叫端的檔案 (UploadedFile) 一起關閉
+        text.detach()
+
+
+def _iter_parquet(stream, chunk_rows):
+    # 依 record batch 讀取，只載入需要的欄位
+    import pyarrow.parquet as pq
+    pf = pq.ParquetFile(stream)
+    wanted = {name for aliases in COLUMN_ALIASES.values() for name in aliases}
+    columns = [name for name in pf.schema_arrow.names if name in wanted]
+    for batch in pf.iter_batches(batch_size=chunk_rows, columns=columns):
+        yield _normalize_chunk(batch.to_pandas().astype(object))
+
+
+def _iter_jsonl(stream, chunk_rows):
+    # 每行一個 JSON 物件 {"tribe", "speaker", "text", "zh"} (中文欄名也接受)
+    import pandas as pd
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline=None)
+    chunk = []
+    try:
+        for line in text:
+            line = line.strip()
+            if not line: continue
+            chunk.append(json.loads(line))
+            if len(chunk) >= chunk_rows:
+                yield _normalize_chunk(pd.DataFrame.from_records(chunk).astype(object))
+                chunk = []
+    finally:
+        text.detach()
+    if chunk:
+        yield _normalize_chunk(pd.DataFrame.from_records(chunk).astype(object))
+
+
+def _iter_txt(stream, chunk_rows):
+    # 每行「族語 | 中文」；以緩衝區逐行讀取，不必一次把整個檔案解碼成字串
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline=None)
+    chunk = ([], [], [], [])
+    try:
+        for line in text:
+            line = line.strip()
+            if not line: continue
+            raw, _, zh = line.partition('|')
+            chunk[0].append(DEFAULT_TRIBE)
+            chunk[1].append(DEFAULT_SPEAKER)
+            chunk[2].append(raw.strip())
+            chunk[3].append(zh.split('|')[0].strip())
+            if len(chunk[0]) >= chunk_rows:
+                yield chunk
+                chunk = ([], [], [], [])
+    finally:
+        text.detach()
+    if chunk[0]:
+        yield chunk
+
+
+_IMPORTERS = {'xlsx': _iter_xlsx, 'txt': _iter_txt, 'csv': _iter_csv, 'parquet': _iter_parquet, 'jsonl': _iter_jsonl}
+IMPORT_TYPES = list(_IMPORTERS)
+
+
+def iter_script_file(filename, data, chunk_rows=IMPORT_CHUNK_ROWS):
+    # 串流匯入：依序產生 ScriptLine；大檔案 (5 萬列以上) 也只保留一批列在記憶體中
+    reader = _IMPORTERS.get(os.path.splitext(filename)[1].lower().lstrip('.'))
+    if reader is None:
+        return
+    for tribes, speakers, texts, zhs in reader(_open_binary(data), chunk_rows):
+        for tribe, speaker, text, zh in zip(tribes, speakers, texts, zhs):
+            yield ScriptLine(tribe, speaker, text, zh)
+
+
+def parse_script_file(filename, data):
+    # data 為上傳檔案的 bytes 或檔案物件；解析失敗時直接拋出例外，由呼叫端決定如何顯示
+    return list(iter_script_file(filename, data))
+
+
+def find_invalid_speakers(dialogue, speakers):
+    # 批次檢查族群/語者：只對不重複的 (族群, 語者) 組合查表，回傳 {(族群, 語者): 句數}
+    counts = {}
+    for line in dialogue:
+        pair = (line['tribe'], line['speaker'])
+        counts[pair] = counts.get(pair, 0) + 1
+    return {pair: n for pair, n in counts.items() if pair[1] not in speakers.get(pair[0], ())}
+
+
+def fix_invalid_speakers(dialogue, speakers, invalid=None):
+    # 語者屬於其他族群時改正族群，否則改用該族群 (或預設族群) 的第一位語者；回傳修正的句數
+    invalid = find_invalid_speakers(dialogue, speakers) if invalid is None else invalid
+    if not invalid:
+        return 0
+    owner = {name: tribe for tribe, names in speakers.items() for name in names}
+    replacement = {}
+    for tribe, speaker in invalid:
+        if speaker in owner:
+            replacement[(tribe, speaker)] = (owner[speaker], speaker)
+        else:
+            fixed_tribe = tribe if tribe in speakers else DEFAULT_TRIBE
+            replacement[(tribe, speaker)] = (fixed_tribe, speakers[fixed_tribe][0])
+    for line in dialogue:
+        pair = (line['tribe'], line['speaker'])
+        if pair in replacement:
+            line['tribe'], line['speaker'] = replacement[pair]
+    return sum(invalid.values())
+
+
+# ---------------------------------------------------------
+# 表格編輯模式 (st.data_editor) 的資料轉換
+# ---------------------------------------------------------
+# 表格一次只顯示一頁，data_editor 回傳的編輯狀態索引都是相對於這一頁；
+# 套用時只動到有變更的列，成本與劇本總長度無關。
+GRID_COLUMNS = COLUMN_LABELS
+GRID_FIELDS = {label: field for field, label in GRID_COLUMNS.items()}
+
+
+def dialogue_page_frame(dialogue, start, end):
+    import pandas as pd
+    rows = dialogue[start:end]
+    return pd.DataFrame({label: [row.get(field, '') for row in rows] for field, label in GRID_COLUMNS.items()},
+                        index=pd.RangeIndex(start + 1, start + 1 + len(rows), name='#'))
+
+
+def _fix_speaker(row, speakers, changed_speaker=False):
+    # 表格中的族群與語者是兩個獨立下拉選單：改了語者就跟著換族群，改了族群就確保語者屬於該族群
+    if changed_speaker:
+        for tribe, names in speakers.items():
+            if row['speaker'] in names:
+                row['tribe'] = tribe
+                return
+    if row['tribe'] not in speakers:
+        row['tribe'] = DEFAULT_TRIBE
+    if row['speaker'] not in speakers[row['tribe']]:
+        row['speaker'] = speakers[row['tribe']][0]
+
+
+def apply_grid_changes(dialogue, start, page_len, changes, speakers, template=None):
+    # changes 為 data_editor 的編輯狀態 {'edited_rows', 'added_rows', 'deleted_rows'}；
+    # 直接修改 dialogue，回傳最前面一個受影響的索引 (沒有變更時回傳 None)
+    touched = []
+    for pos, edits in changes.get('edited_rows', {}).items():
+        idx = start + int(pos)
+        row = dialogue[idx]
+        for label, value in edits.items():
+            if label in GRID_FIELDS:
+                row[GRID_FIELDS[label]] = '' if value is None else str(value)
+        _fix_speaker(row, speakers, GRID_COLUMNS['speaker'] in edits)
+        touched.append(idx)
+    added = []
+    for values in changes.get('added_rows', []):
+        row = ScriptLine(template['tribe'], template['speaker']) if template else ScriptLine()
+        for label, value in values.items():
+            if label in GRID_FIELDS and value is not None:
+                row[GRID_FIELDS[label]] = str(value)
+        _fix_speaker(row, speakers, GRID_COLUMNS['speaker'] in values)
+        added.append(row)
+    # 新增的列插在這一頁的最後面；要刪除的列都在插入點之前，索引不受影響
+    insert_at = start + page_len
+    if added:
+        dialogue[insert_at:insert_at] = added
+        touched.append(insert_at)
+    deleted = sorted({start + int(pos) for pos in changes.get('deleted_rows', [])}, reverse=True)
+    for idx in deleted:
+        del dialogue[idx]
+    touched.extend(deleted)
+    return min(touched) if touched else None
@@ -0,0 +1,158 @@
+import io
+import os
+import re
+
+# ---------------------------------------------------------
+# 文字正規化與長文切段 (有聲書)
+# ---------------------------------------------------------
+# 每一段都是一次遠端 TTS 請求，所以切段的目標是「段數越少越好」，同時每段不超過語者的字數預算：
+#   1. 以句號 / 問號 / 驚嘆號切成句子，依序把句子裝進目前這一段，裝不下才開新段 (依序裝箱時貪婪法的段數最少)
+#   2. 單一句子超過預算時，先在逗號、分號等子句邊界切開，再不行才在空白或固定字數處切開
+#   3. 最後一段如果只剩零星幾個字，在略為超出預算的範圍內併回前一段，不為它多打一次請求
+# 整個流程只掃描文字一次 (線性時間)，可以邊讀檔邊產生段落，數 MB 的文字檔也不必整份載入。
+DEFAULT_CHAR_BUDGET = int(os.environ.get("PODCAST_SEGMENT_CHARS", "120"))
+
+
+def parse_speaker_budgets(value):
+    # "語者=字數,語者=字數" -> {語者: 字數}；格式不對的項目略過並提示
+    budgets = {}
+    for item in value.split(","):
+        speaker, _, chars = item.partition("=")
+        if not item.strip():
+            continue
+        try:
+            budgets[speaker.strip()] = int(chars)
+        except ValueError:
+            print(f"Ignoring invalid speaker budget: {item!r}")
+    return budgets
+
+
+# 個別語者的字數預算 (語者名稱 -> 字數)，例如長段落會被截斷的語者：
+#   PODCAST_SPEAKER_CHARS="阿美_秀姑巒_女聲1=90,排灣_南_女聲=100"
+# 未列出的語者使用 DEFAULT_CHAR_BUDGET
+SPEAKER_CHAR_BUDGETS = parse_speaker_budgets(os.environ.get("PODCAST_SPEAKER_CHARS", ""))
+# 最後一段少於預算的這個比例時視為零星片段；併回前一段時最多允許超出預算的比例
+TAIL_FRACTION = 0.25
+TAIL_SLACK = 0.15
+# 串流讀檔時每次讀取的字元數
+READ_BLOCK_CHARS = 64 * 1024
+
+SENTENCE_END = re.compile(r'[.?!。？！]+["\'」』)\]]*(?=\s|$|[^\x00-\x7f])')
+CLAUSE_END = re.compile(r'[,;:、，；：]+(?=\s|$|[^\x00-\x7f])')
+WORD = re.compile(r'\s*\S+')
+
+
+def clean_text(text):
+    if not text: return ""
+    text = text.replace("，", ",").replace("。", ".").replace("？", "?").replace("！", "!")
+    text = text.replace("：", ":").replace("；", ";").replace("（", "(").replace("）", ")")
+    text = text.replace("―", " ").replace("—", " ").replace("…", " ")
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def char_budget(speaker=None, max_chars=None):
+    if max_chars:
+        return max_chars
+    return SPEAKER_CHAR_BUDGETS.get(speaker, DEFAULT_CHAR_BUDGET)
+
+
+def _split_at(text, pattern):
+    # 依 pattern 的結尾位置切開；切出的片段保留原本的前置空白，接回去時與原文相同
+    pieces = []
+    pos = 0
+    for m in pattern.finditer(text):
+        pieces.append(text[pos:m.end()])
+        pos = m.end()
+    if pos < len(text):
+        pieces.append(text[pos:])
+    return pieces
+
+
+def _fit(piece, budget, patterns=(CLAUSE_END, WORD)):
+    # 超過預算的句子：依序改用子句邊界、空白切開，最後才以固定字數硬切
+    if len(piece.strip()) <= budget:
+        return [piece]
+    if not patterns:
+        word = piece.lstrip()
+        cuts = [word[i:i + budget] for i in range(0, len(word), budget)]
+        cuts[0] = piece[:len(piece) - len(word)] + cuts[0]
+        return cuts
+    parts = _split_at(piece, patterns[0])
+    if len(parts) == 1:
+        return _fit(piece, budget, patterns[1:])
+    return [p for part in parts for p in _fit(part, budget, patterns[1:])]
+
+
+def iter_sentences(blocks, max_carry=READ_BLOCK_CHARS):
+    # blocks 為依序讀入的文字區塊 (例如檔案的每一行)；區塊之間視為空白，句子可以跨越區塊。
+    # 尚未遇到句尾的文字超過 max_carry 時直接送出，交給 _fit 在子句邊界切開，避免重複掃描同一段文字。
+    # carry 保留句首的空白、新區塊前面補上一個空白，裝箱時接回去才不會把羅馬字的句子黏在一起
+    carry, sep = "", ""
+    for block in blocks:
+        block = clean_text(block)
+        if not block: continue
+        text = f"{carry} {block}" if carry else sep + block
+        sep = " "
+        # carry 之中不會有句尾 (否則上一輪就已送出)，只需從新區塊開始找
+        pos = 0
+        for m in SENTENCE_END.finditer(text, len(carry)):
+            yield text[pos:m.end()]
+            pos = m.end()
+        carry = text[pos:].rstrip()
+        if len(carry) > max_carry:
+            yield carry
+            carry = ""
+    if carry:
+        yield carry
+
+
+def pack_segments(sentences, budget=DEFAULT_CHAR_BUDGET):
+    # 依序裝箱：每段盡量接近 budget 個字；前一段延後一步送出，才能把零星的最後一段併回去
+    # sep 記錄最後一段開頭原本的空白 (硬切的片段之間沒有空白)，併回時照原樣接上
+    previous, sep = None, ""
+    parts, size = [], 0
+    for sentence in sentences:
+        for piece in _fit(sentence, budget):
+            if parts and size + len(piece) > budget:
+                chunk = "".join(parts).strip()
+                if previous is not None:
+                    yield previous
+                previous = chunk
+                parts, size = [], 0
+            if not parts:
+                stripped = piece.lstrip()
+                if not stripped: continue
+                sep = " " if stripped != piece else ""
+                piece = stripped
+            parts.append(piece)
+            size += len(piece)
+    last = "".join(parts).strip()
+    if previous is not None and last and len(last) < budget * TAIL_FRACTION \
+            and len(previous) + len(sep) + len(last) <= budget * (1 + TAIL_SLACK):
+        previous, last = previous + sep + last, ""
+    if previous is not None:
+        yield previous
+    if last:
+        yield last
+
+
+def iter_segments(blocks, budget=DEFAULT_CHAR_BUDGET):
+    return pack_segments(iter_sentences(blocks, max(budget * 4, 1024)), budget)
+
+
+def iter_text_file(data, budget=DEFAULT_CHAR_BUDGET, encoding="utf-8-sig"):
+    # 串流切段：data 為 bytes 或二進位檔案物件 (Streamlit UploadedFile、open(path, "rb"))
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = io.BytesIO(data)
+    elif hasattr(data, "seek"):
+        data.seek(0)
+    text = io.TextIOWrapper(data, encoding=encoding, newline=None)
+    try:
+        yield from iter_segments(iter(lambda: text.readline(READ_BLOCK_CHARS), ""), budget)
+    finally:
+        text.detach()
+
+
+def split_long_text(text, max_chars=DEFAULT_CHAR_BUDGET):
+    return list(iter_segments([text], max_chars))
@@ -0,0 +1,22 @@
+# ---------------------------------------------------------
+# 族群與語者清單 (介面下拉選單、劇本檢查與合成共用)
+# ---------------------------------------------------------
+# 獨立成不依賴其他套件的模組：頁面載入時只需要這份清單，不必先載入合成引擎。
+speaker_map = {
+    '阿美': ['阿美_海岸_男聲', '阿美_恆春_女聲', '阿美_馬蘭_女聲', '阿美_南勢_女聲', '阿美_秀姑巒_女聲1', '阿美_秀姑巒_女聲2'],
+    '泰雅': ['泰雅_四季_女聲', '泰雅_賽考利克_男聲', '泰雅_萬大_女聲', '泰雅_汶水_男聲', '泰雅_宜蘭澤敖利_女聲', '泰雅_澤敖利_男聲'],
+    '排灣': ['排灣_中_男聲', '排灣_東_男聲', '排灣_北_女聲', '排灣_南_女聲'],
+    '布農': ['布農_郡群_男聲', '布農_卡群_男聲', '布農_巒群_男聲', '布農_丹群_男聲', '布農_卓群_女聲'],
+    '太魯閣': ['太魯閣_女聲', '太魯閣_男聲1', '太魯閣_男聲2'],
+    '賽德克': ['賽德克_德鹿谷_女聲', '賽德克_都達_女聲', '賽德克_德固達雅_男聲', '賽德克_德固達雅_女聲'],
+    '魯凱': ['魯凱_大武_女聲', '魯凱_多納_男聲', '魯凱_東_女聲', '魯凱_茂林_男聲', '魯凱_萬山_女聲', '魯凱_霧台_女聲'],
+    '卑南': ['卑南_建和_女聲', '卑南_南王_女聲', '卑南_西群_女聲', '卑南_知本_女聲'],
+    '鄒': ['鄒_女聲'],
+    '賽夏': ['賽夏_女聲'],
+    '雅美': ['雅美_女聲'],
+    '邵': ['邵_男聲'],
+    '噶瑪蘭': ['噶瑪蘭_女聲'],
+    '拉阿魯哇': ['拉阿魯哇_女聲'],
+    '撒奇萊雅': ['撒奇萊雅_女聲'],
+    '卡那卡那富': ['卡那卡那富_男聲'],
+}
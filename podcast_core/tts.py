@@ -0,0 +1,167 @@
+import os
+import shutil
+
+from podcast_core.admission import admit
+from podcast_core.azure_tts import AZURE_BATCH_FORMAT, AZURE_OUTPUT_FORMAT, AZURE_TTS_URL_TEMPLATE, azure_headers, get_azure_session
+from podcast_core.cache import get_segment_cache, make_cache_key
+from podcast_core.metrics import timed
+from podcast_core.replicas import get_replica_set, parse_urls
+from podcast_core.resilience import get_resilient_endpoint
+from podcast_core.segmenter import clean_text
+from podcast_core.workspace import adopt_scratch, get_scratch
+
+# ---------------------------------------------------------
+# 🔧 核心：Azure TTS API 函式 (官方穩定版)
+# ---------------------------------------------------------
+# 被 Azure 以 401/403 拒絕的 (區域, Key 雜湊)；頁面據此區分「認證失敗」與逾時、5xx 等其他原因的降級提示
+AZURE_AUTH_STATUSES = (401, 403)
+_azure_auth_rejected = set()
+
+
+def azure_auth_rejected(api_key, region):
+    return (region, make_cache_key(api_key)) in _azure_auth_rejected
+
+
+def generate_audio_azure_api(text, voice_name, api_key, region, output_path):
+    if not api_key or not region:
+        return False, "未設定 Azure Key"
+
+    url = AZURE_TTS_URL_TEMPLATE.format(region=region)
+    
+    headers = azure_headers(api_key)
+    
+    ssml = f"""
+    <speak version='1.0' xml:lang='zh-TW'>
+        <voice xml:lang='zh-TW' name='{voice_name}'>
+            {text}
+        </voice>
+    </speak>
+    """
+    
+    try:
+        # 共用連線池的 Session，避免每句重新建立 TCP/TLS 連線
+        with admit(f"azure-{region}"), timed("azure_request"):
+            response = get_azure_session().post(url, headers=headers, data=ssml.encode('utf-8'), timeout=60)
+        
+        if response.status_code == 200:
+            _azure_auth_rejected.discard((region, make_cache_key(api_key)))
+            with open(output_path, 'wb') as f:
+                f.write(response.content)
+            return True, "Azure API"
+        else:
+            if response.status_code in AZURE_AUTH_STATUSES:
+                _azure_auth_rejected.add((region, make_cache_key(api_key)))
+            error_msg = f"Azure Error: {response.status_code} - {response.text}"
+            print(error_msg)
+            return False, error_msg
+            
+    except Exception as e:
+        print(f"Connection Error: {e}")
+        return False, str(e)
+
+
+def chinese_voice_name(gender):
+    # Azure 官方語者代號
+    return "zh-TW-YunJheNeural" if gender == "男聲" else "zh-TW-HsiaoChenNeural"
+
+
+# 中文語音快取：key 包含實際產生音檔的引擎，Azure 可用時絕不拿 gTTS 的結果頂替
+GTTS_VOICE = "gtts-zh-tw"
+GTTS_FORMAT = "gtts-mp3"
+ZH_CACHE_FORMATS = {"Azure": [AZURE_OUTPUT_FORMAT, AZURE_BATCH_FORMAT], "gTTS": [GTTS_FORMAT]}
+
+def chinese_cache_key(text, voice_name, engine, output_format):
+    return make_cache_key(engine, voice_name, output_format, clean_text(text))
+
+def lookup_chinese_cache(text, voice_name, engine):
+    with timed("zh_cache_lookup"):
+        hit = get_segment_cache("zh").get_any([chinese_cache_key(text, voice_name, engine, fmt) for fmt in ZH_CACHE_FORMATS[engine]])
+    return hit[1] if hit else None
+
+def store_chinese_cache(text, voice_name, engine, output_format, path):
+    try:
+        return get_segment_cache("zh").put(chinese_cache_key(text, voice_name, engine, output_format), path, meta={"engine": engine, "voice": voice_name})
+    except OSError as e:
+        print(f"Chinese cache write failed: {e}")
+        return path
+
+
+def generate_chinese_audio_smart(text, gender, output_path, azure_key, azure_region):
+    # 1. 決定語者 (Azure 官方代號)
+    voice_name = chinese_voice_name(gender)
+        
+    # 2. 嘗試 Azure API (先查快取)
+    if azure_key and azure_region:
+        cached = lookup_chinese_cache(text, voice_name, "Azure")
+        if cached:
+            shutil.copyfile(cached, output_path)
+            return True, "Azure"
+        success, msg = generate_audio_azure_api(text, voice_name, azure_key, azure_region, output_path)
+        if success:
+            store_chinese_cache(text, voice_name, "Azure", AZURE_OUTPUT_FORMAT, output_path)
+            return True, "Azure"
+        else:
+            print(f"Azure Failed (Turning to gTTS): {msg}")
+            # (此函式會在背景執行緒中執行，提示訊息改由呼叫端在主執行緒顯示)
+            
+    # 3. 備援 gTTS (同樣先查快取)
+    is_downgrade = (gender == "男聲")
+    label = "gTTS-Fallback" if is_downgrade else "gTTS"
+    cached = lookup_chinese_cache(text, GTTS_VOICE, "gTTS")
+    if cached:
+        shutil.copyfile(cached, output_path)
+        return True, label
+    try:
+        with timed("gtts_request"):
+            from gtts import gTTS
+            tts = gTTS(text=text, lang='zh-tw')
+            tts.save(output_path)
+        store_chinese_cache(text, GTTS_VOICE, "gTTS", GTTS_FORMAT, output_path)
+        return True, label
+    except Exception as e:
+        return False, f"All Failed: {e}"
+
+# 原住民語音 (維持 Gradio Client)；可用環境變數指到本機替身伺服器，或以逗號列出多個相容的端點 (模型複本)
+INDIGENOUS_TTS_URLS = parse_urls(os.environ.get("PODCAST_INDIGENOUS_TTS_URL", "https://hnang-kari-ai-asi-sluhay.ithuan.tw/"))
+# 快取 key 與重試統計以第一個端點作為服務識別 (各複本必須是相同的模型，結果可以共用)
+INDIGENOUS_TTS_URL = INDIGENOUS_TTS_URLS[0]
+# 遠端模型或 API 行為改變時請更新版本號，舊快取就會自動失效
+INDIGENOUS_TTS_VERSION = "default_speaker_tts-v1"
+
+def synthesize_indigenous_speech(tribe, speaker, text):
+    # 先查片段快取：同樣的 (族群, 語者, 清理後文字, 端點版本) 不再重複呼叫遠端
+    cache = get_segment_cache()
+    cache_key = make_cache_key(INDIGENOUS_TTS_URL, INDIGENOUS_TTS_VERSION, tribe, speaker, clean_text(text))
+    with timed("segment_cache_lookup"):
+        cached_path = cache.get(cache_key)
+    if cached_path:
+        return cached_path
+
+    # 重試 / 對沖由 resilience 層負責；每個複本各有斷路器，全部斷開時直接丟出 CircuitOpen，不再等待重試
+    replicas = get_replica_set(INDIGENOUS_TTS_URLS)
+    endpoint = get_resilient_endpoint(INDIGENOUS_TTS_URL, breaker=replicas)
+
+    def request():
+        # 先取得全域額度 (排隊時依使用者輪流)，再挑進行中請求最少的複本，從它的連線池取出常駐的 GradioClient；
+        # 族群相同時會略過 /lambda 與等待
+        with admit("gradio", scale=len(replicas.replicas)), replicas.route(tribe) as replica, \
+                replica.pool.session(tribe, speaker) as client:
+            with timed("gradio_predict"):
+                return client.predict(ref=speaker, gen_text_input=text, api_name="/default_speaker_tts")
+
+    try:
+        path = endpoint.call(request, discard=get_scratch().discard_download)
+    except Exception as e:
+        print(f"Indigenous TTS Failed: {e}")
+        raise
+    try:
+        with timed("segment_cache_store"):
+            stored = cache.put(cache_key, path, meta={"tribe": tribe, "speaker": speaker})
+    except OSError as e:
+        # 快取寫入失敗不影響本次合成結果：下載檔搬進這次製作的工作區，製作結束時刪除。
+        # (內容相同的結果 Gradio 會下載到同一個路徑，可能已被另一個執行緒寫入快取並刪除)
+        print(f"Segment cache write failed: {e}")
+        return adopt_scratch(path) if os.path.exists(path) else cache.get(cache_key)
+    # 已複製進快取，Gradio 的下載檔不再需要
+    get_scratch().discard_download(path)
+    return stored
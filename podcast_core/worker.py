@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+
+from podcast_core.admission import client_context
+from podcast_core.jobs import get_job_queue
+from podcast_core.manifest import manifest_dir_for
+from podcast_core.metrics import start_metrics_server
+from podcast_core.profiles import get_output_profile
+from podcast_core.render import render_audiobook, render_bilingual_episode, render_indigenous_episode
+
+# ---------------------------------------------------------
+# 背景工作 worker：python -m podcast_core.worker
+# ---------------------------------------------------------
+POLL_INTERVAL = 1.0
+# 進度寫回 SQLite 的最短間隔，避免每句都寫一次資料庫
+PROGRESS_INTERVAL = 0.5
+
+
+def run_job(queue, job):
+    params = job['params']
+    profile = get_output_profile(params.get('profile'))
+    output_path = os.path.join(queue.output_dir, job['id'] + profile.extension)
+    bgm = None
+    if params.get('bgm_path'):
+        with open(params['bgm_path'], "rb") as f:
+            bgm = f.read()
+    last_write = [0.0]
+    zh_failed = []
+
+    def on_progress(done, total):
+        now = time.monotonic()
+        if done == total or now - last_write[0] >= PROGRESS_INTERVAL:
+            last_write[0] = now
+            queue.update_progress(job['id'], done / total, f"已完成 {done}/{total}")
+
+    def on_chinese(idx, zh_ok, eng):
+        if not zh_ok: zh_failed.append(idx + 1)
+
+    common = dict(bgm=bgm, bgm_volume=params.get('bgm_volume', 0.15), duck=params.get('duck', False),
+                  workers=params.get('workers', 4), on_progress=on_progress, profile=profile.name)
+    if job['owner']:
+        # 同一位使用者重送修改過的劇本時只合成改動的句子
+        common['manifest_dir'] = manifest_dir_for(job['owner'], "job", job['kind'])
+    if job['kind'] == 'audiobook':
+        result = render_audiobook(params['chunks'], params['tribe'], params['speaker'], output_path, **common)
+    elif job['kind'] == 'bilingual':
+        result = render_bilingual_episode(
+            params['dialogue'], output_path, zh_gender=params.get('zh_gender', '女聲'), gap_time=params.get('gap_time', 0.5),
+            azure_key=params.get('azure_key', ''), azure_region=params.get('azure_region', ''),
+            zh_batch=params.get('zh_batch', True), on_chinese=on_chinese, **common)
+    else:
+        result = render_indigenous_episode(params['dialogue'], output_path, **common)
+    if not result:
+        raise ValueError("沒有可合成的內容")
+    message = f"完成 ({result['duration']:.0f} 秒)"
+    if result['failed']:
+        message += f"，族語合成失敗已略過: #{', #'.join(map(str, result['failed']))}"
+    if zh_failed:
+        message += f"，中文合成失敗: #{', #'.join(map(str, zh_failed))}"
+    return output_path, message
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m podcast_core.worker", description="執行背景製作工作")
+    parser.add_argument("--once", action="store_true", help="佇列清空後就結束")
+    parser.add_argument("--metrics-port", type=int, default=int(os.environ.get("PODCAST_WORKER_METRICS_PORT", "0")),
+                        help="提供 /metrics 的 port (多個 worker 需各自指定；0 表示不啟動)")
+    args = parser.parse_args(argv)
+    start_metrics_server(args.metrics_port)
+    queue = get_job_queue()
+    queue.requeue_orphans()
+    while True:
+        job = queue.claim(os.getpid())
+        if job is None:
+            if args.once:
+                return 0
+            time.sleep(POLL_INTERVAL)
+            continue
+        try:
+            # 遠端請求的額度依送出工作的使用者輪流分配
+            with client_context(job['owner']):
+                output_path, message = run_job(queue, job)
+            queue.finish(job['id'], output_path, message)
+        except Exception as e:
+            traceback.print_exc()
+            queue.fail(job['id'], str(e))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
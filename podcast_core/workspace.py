@@ -0,0 +1,296 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from podcast_core.metrics import get_metrics
+from podcast_core.procs import pid_alive
+
+# ---------------------------------------------------------
+# 暫存工作區 (每次製作自動清理 + 全域容量上限 + LRU 淘汰)
+# ---------------------------------------------------------
+# 目錄配置 (同一台機器上的 Streamlit 與背景 worker 行程共用)：
+#   jobs/<pid>-<id>/   每次製作的工作區：中文音檔、Azure 批次切句等中間檔，製作結束 (成功或失敗) 整個刪除
+#   pinned/<owner>/    刻意保留的成品 (st.audio / 下載按鈕背後的 MP3)，每位使用者只留最近幾份，超過容量時依 LRU 淘汰
+#   downloads/         Gradio client 的下載目錄；結果寫入片段快取後就刪除
+#   loose/             不在製作流程中產生的暫存檔 (例如單句試聽)，超過 LOOSE_MAX_AGE 秒自動清掉
+# 製作流程中用 scratch_file() / scratch_dir() 取代 tempfile.mktemp / mkdtemp：
+# 目前的工作區放在 contextvars 中，scheduler 會帶進工作執行緒，所以合成函式不需要多傳參數。
+# 其他模組自己管理容量的目錄 (例如背景工作的成品) 可以用 track() 登記，只列入統計，淘汰由該模組負責。
+DEFAULT_SCRATCH_DIR = os.environ.get("PODCAST_SCRATCH_DIR", os.path.join(tempfile.gettempdir(), "podcast-scratch"))
+DEFAULT_SCRATCH_MAX_MB = int(os.environ.get("PODCAST_SCRATCH_MAX_MB", "1024"))
+PINNED_PER_OWNER = 3
+LOOSE_MAX_AGE = 3600
+AREAS = ("jobs", "pinned", "downloads", "loose")
+
+_current = ContextVar("scratch_workspace", default=None)
+
+
+def _tree_usage(path):
+    # 回傳 (位元組, 檔案數)；掃描途中被其他行程刪掉的檔案直接略過
+    total = files = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return 0, 0
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                size, count = _tree_usage(entry.path)
+                total += size
+                files += count
+            else:
+                st = entry.stat(follow_symlinks=False)
+                # 工作區中指向快取檔的硬連結不另外佔空間 (已算在快取的容量內)
+                total += st.st_size if st.st_nlink == 1 else 0
+                files += 1
+        except OSError:
+            continue
+    return total, files
+
+
+class JobWorkspace:
+    def __init__(self, path):
+        self.path = path
+
+    def file(self, suffix="", prefix="tmp"):
+        # 與 mkstemp 相同：建立一個空檔並回傳路徑 (工作區目錄權限為 0700，名稱不會被搶用)
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix=prefix, dir=self.path)
+        os.close(fd)
+        return path
+
+    def subdir(self, prefix="tmp"):
+        return tempfile.mkdtemp(prefix=prefix, dir=self.path)
+
+    def adopt(self, path):
+        # 把外部的暫存檔搬進工作區，製作結束時一併刪除
+        dst = os.path.join(self.path, f"{uuid.uuid4().hex[:8]}-{os.path.basename(path)}")
+        shutil.move(path, dst)
+        return dst
+
+    def link(self, path):
+        # 在工作區建立指向 path 的硬連結 (不同檔案系統時改為複製)；原檔之後被刪除也不影響這份
+        dst = os.path.join(self.path, f"{uuid.uuid4().hex[:8]}-{os.path.basename(path)}")
+        try:
+            os.link(path, dst)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            shutil.copyfile(path, dst)
+        return dst
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class ScratchSpace:
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.evicted_bytes = 0
+        self.evicted_files = 0
+        self.active_jobs = 0
+        self.tracked = {}
+        self._lock = threading.Lock()
+        for area in AREAS:
+            os.makedirs(os.path.join(root, area), exist_ok=True)
+
+    def area(self, name):
+        return os.path.join(self.root, name)
+
+    def track(self, name, path, max_bytes):
+        # 登記由其他模組自行清理的目錄：列入 stats() 與 /metrics，不算在本身的容量上限內
+        with self._lock:
+            self.tracked[name] = (path, max_bytes)
+
+    def tracked_usage(self):
+        with self._lock:
+            tracked = dict(self.tracked)
+        return {name: (*_tree_usage(path), max_bytes) for name, (path, max_bytes) in tracked.items()}
+
+    @contextmanager
+    def job(self):
+        # 一次製作的工作區；巢狀呼叫時沿用外層的工作區
+        if _current.get() is not None:
+            yield _current.get()
+            return
+        self.enforce_quota()
+        workspace = JobWorkspace(tempfile.mkdtemp(prefix=f"{os.getpid()}-", dir=self.area("jobs")))
+        token = _current.set(workspace)
+        with self._lock:
+            self.active_jobs += 1
+        try:
+            yield workspace
+        finally:
+            _current.reset(token)
+            workspace.close()
+            with self._lock:
+                self.active_jobs -= 1
+
+    def pin(self, suffix="", owner="shared"):
+        # 需要活過這次重跑的成品：放在 pinned/<owner>/，同一位使用者只保留最近 PINNED_PER_OWNER 份
+        folder = os.path.join(self.area("pinned"), "".join(c for c in str(owner) if c.isalnum() or c in "-_") or "shared")
+        os.makedirs(folder, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix="out-", dir=folder)
+        os.close(fd)
+        older = sorted((e for e in os.scandir(folder) if e.path != path), key=lambda e: e.stat().st_mtime, reverse=True)
+        for entry in older[PINNED_PER_OWNER - 1:]:
+            self._remove(entry.path)
+        self.enforce_quota(keep=path)
+        return path
+
+    def loose_file(self, suffix="", prefix="tmp"):
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix=prefix, dir=self.area("loose"))
+        os.close(fd)
+        return path
+
+    def discard_download(self, path):
+        # 刪除 Gradio 下載的檔案 (以及它所在的雜湊子目錄)；不在 downloads/ 底下的路徑一律不動
+        downloads = os.path.realpath(self.area("downloads"))
+        real = os.path.realpath(path)
+        if not real.startswith(downloads + os.sep):
+            return
+        self._remove(real, evicted=False)
+        parent = os.path.dirname(real)
+        if parent != downloads:
+            try:
+                os.rmdir(parent)
+            except OSError:
+                pass
+
+    def _remove(self, path, evicted=True):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return 0
+        if evicted:
+            with self._lock:
+                self.evicted_bytes += size
+                self.evicted_files += 1
+        return size
+
+    def _sweep(self):
+        # 已結束行程留下的工作區、過舊的零散暫存檔與下載檔
+        now = time.time()
+        for entry in os.scandir(self.area("jobs")):
+            pid = entry.name.split("-", 1)[0]
+            if pid.isdigit() and not pid_alive(int(pid)):
+                size, count = _tree_usage(entry.path)
+                shutil.rmtree(entry.path, ignore_errors=True)
+                with self._lock:
+                    self.evicted_bytes += size
+                    self.evicted_files += count
+        for area in ("loose", "downloads"):
+            for dirpath, dirnames, filenames in os.walk(self.area(area), topdown=False):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        if now - os.path.getmtime(path) > LOOSE_MAX_AGE:
+                            self._remove(path)
+                    except OSError:
+                        pass
+                if dirpath != self.area(area):
+                    try:
+                        os.rmdir(dirpath)
+                    except OSError:
+                        pass
+
+    def enforce_quota(self, keep=None):
+        # 超過容量時從最久沒用到的成品開始淘汰；進行中的工作區不會被刪除
+        self._sweep()
+        total = sum(self.usage()[area][0] for area in AREAS)
+        if total <= self.max_bytes:
+            return
+        pinned = []
+        for dirpath, _, filenames in os.walk(self.area("pinned")):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if path != keep:
+                    pinned.append((max(st.st_atime, st.st_mtime), st.st_size, path))
+        for _, size, path in sorted(pinned):
+            if total <= self.max_bytes:
+                break
+            total -= self._remove(path)
+        if total > self.max_bytes:
+            print(f"Scratch space over quota: {total / 2 ** 20:.1f} MB > {self.max_bytes / 2 ** 20:.0f} MB (active jobs)")
+
+    def usage(self):
+        return {area: _tree_usage(self.area(area)) for area in AREAS}
+
+    def stats(self):
+        usage = self.usage()
+        with self._lock:
+            evicted, active = self.evicted_bytes, self.active_jobs
+        return {
+            "bytes": sum(size for size, _ in usage.values()),
+            "files": sum(count for _, count in usage.values()),
+            "max_bytes": self.max_bytes,
+            "areas": usage,
+            "evicted_bytes": evicted,
+            "active_jobs": active,
+            "tracked": self.tracked_usage(),
+        }
+
+
+def _scratch_samples(scratch):
+    samples = []
+    for area, (size, count) in scratch.usage().items():
+        samples.append(("podcast_scratch_bytes", "gauge", {"area": area}, size))
+        samples.append(("podcast_scratch_files", "gauge", {"area": area}, count))
+    for name, (size, count, max_bytes) in scratch.tracked_usage().items():
+        samples.append(("podcast_scratch_bytes", "gauge", {"area": name}, size))
+        samples.append(("podcast_scratch_files", "gauge", {"area": name}, count))
+        samples.append(("podcast_scratch_area_max_bytes", "gauge", {"area": name}, max_bytes))
+    with scratch._lock:
+        samples.append(("podcast_scratch_max_bytes", "gauge", {}, scratch.max_bytes))
+        samples.append(("podcast_scratch_active_jobs", "gauge", {}, scratch.active_jobs))
+        samples.append(("podcast_scratch_evicted_bytes_total", "counter", {}, scratch.evicted_bytes))
+        samples.append(("podcast_scratch_evicted_files_total", "counter", {}, scratch.evicted_files))
+    return samples
+
+
+_scratch = None
+_scratch_lock = threading.Lock()
+
+
+def get_scratch():
+    # 行程層級的單例
+    global _scratch
+    with _scratch_lock:
+        if _scratch is None:
+            _scratch = ScratchSpace(DEFAULT_SCRATCH_DIR, DEFAULT_SCRATCH_MAX_MB * 1024 * 1024)
+            get_metrics().add_collector(lambda: _scratch_samples(_scratch))
+        return _scratch
+
+
+def scratch_file(suffix="", prefix="tmp"):
+    # 取代 tempfile.mktemp：在目前的製作工作區中建立暫存檔；不在製作流程中時放到 loose/
+    workspace = _current.get()
+    return workspace.file(suffix, prefix) if workspace else get_scratch().loose_file(suffix, prefix)
+
+
+def scratch_dir(prefix="tmp"):
+    workspace = _current.get()
+    return workspace.subdir(prefix) if workspace else tempfile.mkdtemp(prefix=prefix, dir=get_scratch().area("loose"))
+
+
+def link_scratch(path):
+    # 快取中的檔案隨時可能被其他執行緒的 LRU 淘汰刪掉：在目前的工作區留一個硬連結，製作結束時一併刪除
+    # (不在製作流程中時原樣回傳)；原檔已經不存在時丟出 FileNotFoundError
+    workspace = _current.get()
+    return workspace.link(path) if workspace else path
+
+
+def adopt_scratch(path):
+    # 把要在製作期間繼續使用的外部暫存檔搬進目前的工作區 (沒有工作區時原樣回傳)
+    workspace = _current.get()
+    return workspace.adopt(path) if workspace else path
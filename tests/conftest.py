@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# 測試一律使用暫存的快取 / 暫存 / 工作佇列目錄，不碰使用者的 ~/.cache；必須在 import podcast_core 之前設定
+_root = tempfile.mkdtemp(prefix="podcast-tests-")
+os.environ.setdefault("PODCAST_CACHE_DIR", os.path.join(_root, "cache"))
+os.environ.setdefault("PODCAST_SCRATCH_DIR", os.path.join(_root, "scratch"))
+os.environ.setdefault("PODCAST_JOBS_DIR", os.path.join(_root, "jobs"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,111 @@
+import threading
+import time
+
+from podcast_core.admission import BATCH, INTERACTIVE, Limiter, TokenBucket, client_context
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _request(limiter, owner, lane, order, name, hold=None):
+    # 背景執行緒送出一個請求：放行時記下名稱，有 hold 時佔住名額直到 hold 被設定
+    def run():
+        with client_context(owner, lane), limiter.slot():
+            order.append(name)
+            if hold is not None:
+                hold.wait(5)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _queue(limiter, owner, lane, order, name):
+    before = limiter.stats()["queued"][lane]
+    thread = _request(limiter, owner, lane, order, name)
+    _until(lambda: limiter.stats()["queued"][lane] == before + 1)
+    return thread
+
+
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+    assert bucket.try_take() == 0 and bucket.try_take() == 0
+    assert bucket.try_take() == 0.5
+    clock.now = 0.5
+    assert bucket.try_take() == 0
+    clock.now = 100
+    assert [bucket.try_take() for _ in range(3)] == [0, 0, 0.5]
+
+
+def test_interactive_first_then_users_take_turns():
+    limiter = Limiter("test", rate=0, burst=1, concurrency=1, per_user=0, reserve=0)
+    order, hold = [], threading.Event()
+    threads = [_request(limiter, "x", BATCH, order, "holder", hold)]
+    _until(lambda: order == ["holder"])
+    threads += [_queue(limiter, "a", BATCH, order, "a1"),
+                _queue(limiter, "a", BATCH, order, "a2"),
+                _queue(limiter, "a", BATCH, order, "a3"),
+                _queue(limiter, "b", BATCH, order, "b1"),
+                _queue(limiter, "c", INTERACTIVE, order, "c1")]
+    hold.set()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["holder", "c1", "a1", "b1", "a2", "a3"]
+    assert limiter.stats()["admitted"] == {BATCH: 5, INTERACTIVE: 1}
+
+
+def test_per_user_cap_yields_to_other_users():
+    limiter = Limiter("test", rate=0, burst=1, concurrency=2, per_user=1, reserve=0)
+    order, hold_a, hold_x = [], threading.Event(), threading.Event()
+    threads = [_request(limiter, "a", BATCH, order, "a1", hold_a),
+               _request(limiter, "x", BATCH, order, "x1", hold_x)]
+    _until(lambda: len(order) == 2)
+    threads += [_queue(limiter, "a", BATCH, order, "a2"),
+                _queue(limiter, "b", BATCH, order, "b1")]
+    # a 已經佔用一個名額：空出來的名額先給排在後面的 b
+    hold_x.set()
+    _until(lambda: len(order) == 4)
+    assert order[2:] == ["b1", "a2"]
+    hold_a.set()
+    for thread in threads:
+        thread.join(5)
+
+
+def test_per_user_cap_is_work_conserving():
+    # 沒有其他人排隊時，同一位使用者可以用滿所有名額
+    limiter = Limiter("test", rate=0, burst=1, concurrency=3, per_user=1, reserve=0)
+    order, hold = [], threading.Event()
+    threads = [_request(limiter, "a", BATCH, order, f"a{i}", hold) for i in range(3)]
+    _until(lambda: len(order) == 3)
+    assert limiter.stats()["active"] == 3
+    hold.set()
+    for thread in threads:
+        thread.join(5)
+
+
+def test_interactive_reserve_is_not_used_by_batch():
+    limiter = Limiter("test", rate=0, burst=1, concurrency=2, per_user=0, reserve=1)
+    order, hold = [], threading.Event()
+    threads = [_request(limiter, "a", BATCH, order, "a1", hold)]
+    _until(lambda: order == ["a1"])
+    threads.append(_queue(limiter, "a", BATCH, order, "a2"))
+    with client_context("b", INTERACTIVE), limiter.slot():
+        order.append("b1")
+    assert order == ["a1", "b1"]
+    hold.set()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["a1", "b1", "a2"]
+    assert limiter.stats()["active"] == 0
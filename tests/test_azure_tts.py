@@ -0,0 +1,84 @@
+import numpy as np
+
+from podcast_core.azure_tts import (AZURE_SAMPLE_RATE, BATCH_BREAK_MS, check_split, plan_batches, speech_weight,
+                                    split_batch_audio, synthesize_azure_batch)
+
+SR = AZURE_SAMPLE_RATE
+SECONDS_PER_CHAR = 0.2
+
+
+def tone(seconds):
+    t = np.arange(int(SR * seconds), dtype=np.float32) / SR
+    return (0.2 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def silence(ms):
+    return np.zeros(int(SR * ms / 1000), dtype=np.float32)
+
+
+def batch_audio(texts, breaks=None, pauses=None):
+    # 模擬 Azure 批次回傳：每句長度與字數成正比，句後接 <break>；pauses[i] 為第 i 句中間的停頓 (毫秒)
+    breaks = breaks or [BATCH_BREAK_MS] * len(texts)
+    pauses = pauses or {}
+    parts = []
+    for i, text in enumerate(texts):
+        seconds = speech_weight(text) * SECONDS_PER_CHAR
+        if i in pauses:
+            parts += [tone(seconds / 2), silence(pauses[i]), tone(seconds / 2)]
+        else:
+            parts.append(tone(seconds))
+        parts.append(silence(breaks[i]))
+    return np.concatenate(parts)
+
+
+def test_plan_batches_respects_line_and_char_limits():
+    items = [(i, "字" * 10) for i in range(7)]
+    assert [len(b) for b in plan_batches(items, max_lines=3, max_chars=1000)] == [3, 3, 1]
+    assert [len(b) for b in plan_batches(items, max_lines=100, max_chars=25)] == [2, 2, 2, 1]
+    assert [i for batch in plan_batches(items, max_lines=3) for i, _ in batch] == list(range(7))
+
+
+def test_speech_weight_ignores_punctuation():
+    assert speech_weight("你好，世界。") == 4
+    assert speech_weight("。！？ ") == 0
+
+
+def test_split_matches_line_lengths():
+    texts = ["今天天氣很好", "我們一起去山上", "謝謝"]
+    segments = split_batch_audio(batch_audio(texts), texts)
+    assert segments is not None
+    for text, segment in zip(texts, segments):
+        assert abs(len(segment) / SR - speech_weight(text) * SECONDS_PER_CHAR) < 0.3
+
+
+def test_split_ignores_pause_shorter_than_breaks():
+    # 句中有接近停頓長度的空白，但每個 break 都在：仍然切在 break 上
+    texts = ["今天天氣很好", "我們一起去山上走走看看", "謝謝大家"]
+    segments = split_batch_audio(batch_audio(texts, pauses={1: 1000}), texts)
+    assert segments is not None
+    assert abs(len(segments[1]) / SR - (speech_weight(texts[1]) * SECONDS_PER_CHAR + 1.0)) < 0.3
+
+
+def test_split_rejects_cut_inside_a_line():
+    # 第 2 句後的 break 被縮短 (或與只有標點的句子合併)，最長的靜音落在第 2 句中間：切點錯誤，應改用逐句合成
+    texts = ["今天天氣很好", "我們一起去山上走走看看", "謝謝大家"]
+    pcm = batch_audio(texts, breaks=[BATCH_BREAK_MS, 300, BATCH_BREAK_MS], pauses={1: 1000})
+    assert split_batch_audio(pcm, texts) is None
+
+
+def test_split_without_enough_silences_falls_back():
+    texts = ["今天天氣很好", "我們一起去山上"]
+    pcm = np.concatenate([tone(2.0), tone(2.0)])
+    assert split_batch_audio(pcm, texts) is None
+
+
+def test_check_split_tolerates_small_timing_differences():
+    texts = ["今天天氣很好", "我們"]
+    assert check_split([int(SR * 1.3), int(SR * 0.3)], texts)
+    assert not check_split([SR * 3, SR * 3], texts)
+    assert not check_split([SR, SR], ["今天", "。"])
+
+
+def test_punctuation_only_batch_is_not_sent():
+    # 只有標點的句子無法在批次中定位：不送出請求，直接交給呼叫端逐句合成
+    assert synthesize_azure_batch(["你好", "。"], "voice", "key", "region", "/nonexistent") is None
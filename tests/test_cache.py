@@ -0,0 +1,48 @@
+import os
+
+from podcast_core.cache import SegmentCache, make_cache_key
+from podcast_core.workspace import get_scratch
+
+
+def write(path, size):
+    with open(path, "wb") as f:
+        f.write(b"a" * size)
+    return path
+
+
+def test_cache_key_is_unambiguous():
+    assert make_cache_key("ab", "c") != make_cache_key("a", "bc")
+    assert make_cache_key("a", 1) == make_cache_key("a", "1")
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = SegmentCache(str(tmp_path / "c"), 2500)
+    src = write(str(tmp_path / "x.wav"), 1000)
+    cache.put("old", src)
+    cache.put("new", src)
+    assert cache.get("old")  # 讀取後 old 變成最近使用
+    cache.put("third", src)
+    assert cache.get("new") is None
+    assert cache.get("old") and cache.get("third")
+    assert cache.stats()["entries"] == 2
+
+
+def test_hits_survive_eviction_inside_a_job(tmp_path):
+    cache = SegmentCache(str(tmp_path / "c"), 1500)
+    src = write(str(tmp_path / "x.wav"), 1000)
+    with get_scratch().job():
+        stored = cache.put("k1", src)
+        hit = cache.get("k1")
+        cache.put("k2", src)  # 淘汰 k1
+        assert cache.get("k1") is None
+        assert os.path.exists(stored) and os.path.exists(hit)
+
+
+def test_missing_files_are_dropped_from_the_index(tmp_path):
+    cache = SegmentCache(str(tmp_path / "c"), 10_000)
+    src = write(str(tmp_path / "x.wav"), 100)
+    path = cache.put("k", src)
+    os.remove(path)
+    assert cache.get_any(["k"]) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,11 @@
+from podcast_core.cli import output_names
+
+
+def test_output_names_keep_plain_stems():
+    assert output_names(["ep1.xlsx", "data/ep2.csv"]) == ["ep1", "ep2"]
+
+
+def test_output_names_disambiguate_duplicate_stems():
+    paths = ["a/ep1.xlsx", "b/ep1.xlsx", "ep2.csv", "a/ep1.xlsx"]
+    assert output_names(paths) == ["a-ep1-1", "b-ep1", "ep2", "a-ep1-2"]
+    assert len(set(output_names(["x/ep.csv", "x/ep.xlsx"]))) == 2
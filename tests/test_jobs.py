@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import time
+
+from podcast_core.jobs import ORPHAN_GRACE, JobQueue
+
+
+def _finished_job(queue, owner, size=10, age=0):
+    job_id = queue.submit("audiobook", {"chunks": ["一"]}, owner=owner)
+    queue.claim(os.getpid())
+    path = os.path.join(queue.output_dir, f"{job_id}.mp3")
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    queue.finish(job_id, path)
+    if age:
+        with sqlite3.connect(os.path.join(queue.root, "jobs.sqlite3")) as conn:
+            conn.execute("UPDATE jobs SET finished = ? WHERE id = ?", (time.time() - age, job_id))
+    return job_id, path
+
+
+def _age(path, seconds):
+    when = time.time() - seconds
+    os.utime(path, (when, when))
+
+
+def test_prune_keeps_newest_jobs_per_owner(tmp_path):
+    queue = JobQueue(str(tmp_path))
+    jobs = [_finished_job(queue, "a", age=100 - i) for i in range(4)]
+    other = _finished_job(queue, "b")
+    assert queue.prune(keep_per_owner=2) == 2
+    assert [queue.get(job_id) is not None for job_id, _ in jobs] == [False, False, True, True]
+    assert [os.path.exists(path) for _, path in jobs] == [False, False, True, True]
+    assert queue.get(other[0]) is not None
+
+
+def test_prune_by_age_and_total_size(tmp_path):
+    queue = JobQueue(str(tmp_path))
+    stale = _finished_job(queue, "a", size=10, age=3600)
+    old = _finished_job(queue, "b", size=100, age=60)
+    new = _finished_job(queue, "c", size=100, age=30)
+    newest = _finished_job(queue, "d", size=100, age=10)
+    queue.max_bytes = 250
+    assert queue.prune(max_age=1800) == 2
+    assert queue.get(stale[0]) is None and queue.get(old[0]) is None
+    assert queue.get(new[0]) is not None and queue.get(newest[0]) is not None
+    assert not os.path.exists(old[1]) and os.path.exists(new[1])
+
+
+def test_prune_leaves_running_jobs_and_removes_stale_orphans(tmp_path):
+    queue = JobQueue(str(tmp_path))
+    queued = queue.submit("audiobook", {"chunks": ["一"]}, owner="a", bgm=b"bgm")
+    orphan_input = os.path.join(queue.input_dir, "deadbeef_bgm")
+    orphan_output = os.path.join(queue.output_dir, "deadbeef.mp3")
+    fresh_output = os.path.join(queue.output_dir, "cafebabe.mp3")
+    for path in (orphan_input, orphan_output, fresh_output):
+        with open(path, "wb") as f:
+            f.write(b"\0")
+    for path in (orphan_input, orphan_output, *(entry.path for entry in os.scandir(queue.input_dir))):
+        _age(path, ORPHAN_GRACE + 60)
+    assert queue.prune(keep_per_owner=0) == 0
+    assert queue.get(queued)["status"] == "queued"
+    assert os.listdir(queue.input_dir) == [f"{queued}_bgm"]
+    assert not os.path.exists(orphan_output)
+    # 剛寫入的成品可能屬於還沒寫進資料庫的工作，寬限期內保留
+    assert os.path.exists(fresh_output)
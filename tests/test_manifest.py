@@ -0,0 +1,112 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+import podcast_core.manifest as manifest
+from podcast_core.manifest import ManifestBusy, RenderManifest, prune_manifests
+
+SR = 16000
+
+
+def _pcm(value, n=160):
+    return np.full(n, value, dtype=np.float32)
+
+
+def _level(parts):
+    return [(round(float(pcm.mean()), 3), is_voice) for pcm, is_voice in parts]
+
+
+def test_records_are_reused_by_the_next_render(tmp_path):
+    with RenderManifest(str(tmp_path), SR) as m:
+        m.record("a", [(_pcm(0.5), True), (_pcm(0.0, 80), False)])
+        m.record("b", [(_pcm(-0.25), True)])
+    m = RenderManifest(str(tmp_path), SR)
+    try:
+        assert m.has("a") and m.has("b")
+        assert _level(m.read_parts("a")) == [(0.5, True), (0.0, False)]
+        assert _level(m.read_parts("b")) == [(-0.25, True)]
+    finally:
+        m.close()
+
+
+def test_successful_render_drops_unused_lines_failed_render_keeps_them(tmp_path):
+    with RenderManifest(str(tmp_path), SR) as m:
+        m.record("a", [(_pcm(0.5), True)])
+        m.record("b", [(_pcm(0.25), True)])
+    with pytest.raises(RuntimeError):
+        with RenderManifest(str(tmp_path), SR) as m:
+            m.record("c", [(_pcm(0.125), True)])
+            raise RuntimeError("合成失敗")
+    with RenderManifest(str(tmp_path), SR) as m:
+        assert m.has("a") and m.has("b") and m.has("c")
+        m.record("c", m.read_parts("c"))
+    with RenderManifest(str(tmp_path), SR) as m:
+        assert not m.has("a") and m.has("c")
+        assert _level(m.read_parts("c")) == [(0.125, True)]
+
+
+def test_sample_rate_change_invalidates(tmp_path):
+    with RenderManifest(str(tmp_path), SR) as m:
+        m.record("a", [(_pcm(0.5), True)])
+    m = RenderManifest(str(tmp_path), 22050)
+    try:
+        assert not m.has("a")
+    finally:
+        m.close()
+
+
+def test_recovers_progress_after_crash(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest, "FLUSH_EVERY", 2)
+    with RenderManifest(str(tmp_path), SR) as m:
+        m.record("old", [(_pcm(0.5), True)])
+    # 行程被終止：已落盤 (每 2 句) 的進度留在 .new 檔，沒有 commit
+    m = RenderManifest(str(tmp_path), SR)
+    m.begin()
+    for i in range(3):
+        m.record(f"new{i}", [(_pcm(0.1 * (i + 1)), True)])
+    m._new_track.close()
+    m.close()
+    m = RenderManifest(str(tmp_path), SR)
+    try:
+        assert m.has("old") and m.has("new0") and m.has("new1")
+        assert not m.has("new2")
+        assert _level(m.read_parts("new1")) == [(0.2, True)]
+        assert not os.path.exists(os.path.join(str(tmp_path), "manifest.json.new"))
+    finally:
+        m.close()
+
+
+def test_second_render_on_same_manifest_is_busy(tmp_path):
+    if manifest.fcntl is None:
+        pytest.skip("no file locking on this platform")
+    m = RenderManifest(str(tmp_path), SR)
+    try:
+        with pytest.raises(ManifestBusy):
+            RenderManifest(str(tmp_path), SR)
+    finally:
+        m.close()
+
+
+def _make_manifest(root, name, size, age):
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    data = os.path.join(path, "voice.pcm")
+    with open(data, "wb") as f:
+        f.write(b"\0" * size)
+    when = time.time() - age
+    os.utime(data, (when, when))
+    return path
+
+
+def test_prune_manifests_by_age_and_size(tmp_path):
+    root = str(tmp_path)
+    stale = _make_manifest(root, "stale", 10, 3600)
+    old = _make_manifest(root, "old", 100, 60)
+    new = _make_manifest(root, "new", 100, 10)
+    keep = _make_manifest(root, "keep", 100, 120)
+    prune_manifests(root, max_bytes=250, max_age=1800, keep=keep)
+    assert not os.path.exists(stale)
+    assert not os.path.exists(old)
+    assert os.path.exists(new) and os.path.exists(keep)
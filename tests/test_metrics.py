@@ -0,0 +1,24 @@
+from podcast_core.metrics import MetricsRegistry
+
+
+def test_label_values_are_escaped():
+    metrics = MetricsRegistry()
+    metrics.inc("podcast_test_total", endpoint='http://x/"a"\\b\nc')
+    assert 'podcast_test_total{endpoint="http://x/\\"a\\"\\\\b\\nc"} 1' in metrics.render_prometheus().splitlines()
+
+
+def test_samples_of_one_metric_are_grouped():
+    metrics = MetricsRegistry()
+    metrics.add_collector(lambda: [("a", "gauge", {"k": "1"}, 1), ("b", "gauge", {"k": "1"}, 2), ("a", "gauge", {"k": "2"}, 3)])
+    lines = [line for line in metrics.render_prometheus().splitlines() if line.startswith(("a", "b", "# TYPE a", "# TYPE b"))]
+    assert lines == ["# TYPE a gauge", 'a{k="1"} 1', 'a{k="2"} 3', "# TYPE b gauge", 'b{k="1"} 2']
+
+
+def test_stage_histogram_is_cumulative():
+    metrics = MetricsRegistry()
+    for seconds in (0.001, 0.2, 100):
+        metrics.observe("decode", seconds)
+    lines = metrics.render_prometheus().splitlines()
+    buckets = [int(line.rsplit(" ", 1)[1]) for line in lines if line.startswith("podcast_stage_seconds_bucket")]
+    assert buckets == sorted(buckets) and buckets[-1] == 3
+    assert 'podcast_stage_seconds_count{stage="decode"} 3' in lines
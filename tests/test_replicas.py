@@ -0,0 +1,79 @@
+import pytest
+
+from podcast_core.gradio_pool import PooledClient
+from podcast_core.replicas import ReplicaSet, parse_urls
+from podcast_core.resilience import CLOSED, OPEN, CircuitOpen
+
+
+def _replicas(*names):
+    # health_interval=0：不啟動健康檢查執行緒，也不連線
+    return ReplicaSet([f"http://{name}.test/" for name in names], health_interval=0)
+
+
+def test_parse_urls():
+    assert parse_urls(" http://a/, ,http://b/ ") == ["http://a/", "http://b/"]
+
+
+def test_routes_to_replica_with_fewest_outstanding():
+    replica_set = _replicas("least-a", "least-b", "least-c")
+    a, b, c = replica_set.replicas
+    with replica_set.route("阿美") as first, replica_set.route("阿美") as second, replica_set.route("阿美") as third:
+        assert [first, second, third] == [a, b, c]
+        with replica_set.route("阿美") as fourth:
+            assert fourth is a
+    assert [r.outstanding for r in replica_set.replicas] == [0, 0, 0]
+    assert a.requests == 2 and b.requests == 1
+
+
+def test_prefers_idle_client_for_same_tribe():
+    replica_set = _replicas("idle-a", "idle-b")
+    pooled = PooledClient(None)
+    pooled.ethnicity = "排灣"
+    replica_set.replicas[1].pool._idle.append(pooled)
+    assert replica_set._pick("排灣", []) is replica_set.replicas[1]
+    assert replica_set._pick("阿美", []) is replica_set.replicas[0]
+
+
+def test_recently_failed_and_unhealthy_replicas_go_last():
+    replica_set = _replicas("fail-a", "fail-b", "fail-c")
+    a, b, c = replica_set.replicas
+    with pytest.raises(OSError):
+        with replica_set.route("阿美") as replica:
+            assert replica is a
+            raise OSError("逾時")
+    assert a.failures == 1 and a.outstanding == 0
+    b.healthy = False
+    # 剛失敗過的複本排在進行中請求較多的複本之後
+    assert replica_set._pick("阿美", []) is c
+    assert replica_set._pick("阿美", []) is c
+    # 全部都不健康時仍照常分配
+    for replica in replica_set.replicas:
+        replica.healthy = False
+    assert replica_set._pick("阿美", []) is b
+
+
+def test_open_breakers_are_skipped_until_all_are_open():
+    replica_set = _replicas("open-a", "open-b")
+    a, b = replica_set.replicas
+    for _ in range(a.breaker.threshold):
+        a.breaker.on_failure()
+    replica_set.before_call()
+    with replica_set.route("阿美") as replica:
+        assert replica is b
+    for _ in range(b.breaker.threshold):
+        b.breaker.on_failure()
+    assert replica_set.state == OPEN and replica_set.opens == 2
+    with pytest.raises(CircuitOpen):
+        replica_set.before_call()
+    with pytest.raises(CircuitOpen):
+        with replica_set.route("阿美"):
+            pass
+    assert [r.outstanding for r in replica_set.replicas] == [0, 0]
+
+
+def test_state_is_closed_while_any_replica_is_closed():
+    replica_set = _replicas("state-a", "state-b")
+    assert replica_set.state == CLOSED
+    for _ in range(replica_set.replicas[0].breaker.threshold):
+        replica_set.replicas[0].breaker.on_failure()
+    assert replica_set.state == CLOSED
@@ -0,0 +1,118 @@
+import random
+
+import pytest
+
+from podcast_core.resilience import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, LatencyTracker,
+                                     LineFailure, ResilientEndpoint, backoff_delay, isolate)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_after_threshold_consecutive_failures():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", threshold=3, reset_timeout=30, clock=clock)
+    breaker.on_failure()
+    breaker.on_failure()
+    breaker.on_success()
+    assert breaker.failures == 0 and breaker.state == CLOSED
+    for _ in range(3):
+        breaker.before_call()
+        breaker.on_failure()
+    assert breaker.state == OPEN and breaker.opens == 1
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    clock.now = 10
+    assert breaker.retry_in() == 20
+
+
+def test_breaker_half_open_allows_single_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", threshold=1, reset_timeout=30, clock=clock)
+    breaker.on_failure()
+    clock.now = 30
+    assert breaker.retry_in() == 0
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.on_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_breaker_failed_probe_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", threshold=2, reset_timeout=30, clock=clock)
+    breaker.on_failure()
+    breaker.on_failure()
+    clock.now = 31
+    breaker.before_call()
+    breaker.on_failure()
+    assert breaker.state == OPEN and breaker.opens == 2
+    assert breaker.retry_in() == 30
+
+
+def test_backoff_delay_is_capped_full_jitter():
+    rng = random.Random(0)
+    delays = [backoff_delay(attempt, base=0.5, cap=2, rng=rng) for attempt in range(10)]
+    assert all(0 <= d <= min(2, 0.5 * 2 ** n) for n, d in enumerate(delays))
+
+
+def test_latency_quantile_needs_enough_samples():
+    tracker = LatencyTracker(window=4)
+    for seconds in (5, 1, 2, 3, 4):
+        tracker.observe(seconds)
+    assert tracker.quantile(0.5, min_samples=5) is None
+    assert tracker.quantile(0.5, min_samples=1) == 3
+    assert tracker.quantile(0.95, min_samples=1) == 4
+
+
+def _flaky(failures, result="ok"):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise OSError("連線失敗")
+        return result
+    return fn, calls
+
+
+def test_endpoint_retries_then_succeeds():
+    sleeps = []
+    endpoint = ResilientEndpoint("test", attempts=3, hedge=False,
+                                 breaker=CircuitBreaker("test", threshold=5), sleep=sleeps.append)
+    fn, calls = _flaky(2)
+    assert endpoint.call(fn) == "ok"
+    assert len(calls) == 3 and len(sleeps) == 2
+    assert endpoint.breaker.failures == 0
+
+
+def test_endpoint_stops_retrying_when_breaker_opens():
+    sleeps = []
+    endpoint = ResilientEndpoint("test", attempts=5, hedge=False,
+                                 breaker=CircuitBreaker("test", threshold=2), sleep=sleeps.append)
+    fn, calls = _flaky(10)
+    with pytest.raises(OSError):
+        endpoint.call(fn)
+    assert len(calls) == 2 and len(sleeps) == 1
+    with pytest.raises(CircuitOpen):
+        endpoint.call(fn)
+    assert len(calls) == 2
+
+
+def test_isolate_turns_errors_into_line_failures():
+    def synth(text):
+        if not text:
+            raise ValueError("空白")
+        return text.upper()
+    wrapped = isolate(synth)
+    assert wrapped("a") == "A"
+    failure = wrapped("")
+    assert isinstance(failure, LineFailure) and str(failure) == "空白"
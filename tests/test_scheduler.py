@@ -0,0 +1,45 @@
+import threading
+
+import pytest
+
+from podcast_core.scheduler import ReorderBuffer, iter_completed
+
+
+def test_iter_completed_returns_every_index():
+    results = dict(iter_completed(lambda x: x * x, range(50), max_workers=4))
+    assert results == {i: i * i for i in range(50)}
+    assert list(iter_completed(lambda x: x, [])) == []
+
+
+def test_iter_completed_limits_concurrency():
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def work(item):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        threading.Event().wait(0.005)
+        with lock:
+            active[0] -= 1
+        return item
+    assert len(list(iter_completed(work, range(20), max_workers=3))) == 20
+    assert peak[0] <= 3
+
+
+def test_iter_completed_raises_first_error():
+    def work(item):
+        if item == 3:
+            raise ValueError("第 3 句失敗")
+        return item
+    with pytest.raises(ValueError):
+        list(iter_completed(work, range(10), max_workers=2))
+
+
+def test_reorder_buffer_releases_in_script_order():
+    buffer = ReorderBuffer()
+    assert buffer.push(2, "c") == []
+    assert buffer.push(1, "b") == []
+    assert len(buffer) == 2
+    assert buffer.push(0, "a") == [(0, "a"), (1, "b"), (2, "c")]
+    assert buffer.push(3, "d") == [(3, "d")]
+    assert len(buffer) == 0
@@ -0,0 +1,37 @@
+import gc
+import io
+
+import pytest
+
+from podcast_core.script_io import ScriptLine, export_script, parse_script_file
+
+DIALOGUE = [ScriptLine('阿美', '阿美_秀姑巒_女聲1', "Nga'ay ho", '你好'),
+            ScriptLine('排灣', '排灣_南_女聲', 'masalu', '謝謝')]
+
+
+@pytest.mark.parametrize("fmt", ["xlsx", "csv", "jsonl", "parquet"])
+def test_export_then_import_round_trips(fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    lines = parse_script_file(f"script.{fmt}", export_script(DIALOGUE, fmt))
+    assert [line.to_dict() for line in lines] == [line.to_dict() for line in DIALOGUE]
+
+
+def test_txt_uses_default_voice():
+    lines = parse_script_file("script.txt", "Nga'ay ho | 你好\n\nmasalu\n".encode("utf-8"))
+    assert [(line['text'], line['zh']) for line in lines] == [("Nga'ay ho", "你好"), ("masalu", "")]
+
+
+@pytest.mark.parametrize("filename, data", [
+    ("script.jsonl", b'{"text": "ok"}\n{broken\n'),
+    ("script.txt", b"ok\n\xff\xfe bad utf-8\n"),
+    ("script.csv", b"text\nok\n\xff\xfe\n"),
+])
+def test_failed_parse_leaves_upload_open(filename, data):
+    # 解析失敗後，上傳的檔案物件仍可重新讀取 (TextIOWrapper 不能把它一起關掉)
+    upload = io.BytesIO(data)
+    with pytest.raises(Exception):
+        parse_script_file(filename, upload)
+    gc.collect()
+    assert not upload.closed
+    assert upload.getvalue() == data
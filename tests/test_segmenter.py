@@ -0,0 +1,59 @@
+import podcast_core.segmenter as segmenter
+from podcast_core.segmenter import char_budget, parse_speaker_budgets
+
+
+def test_parse_speaker_budgets():
+    assert parse_speaker_budgets("") == {}
+    assert parse_speaker_budgets("阿美_秀姑巒_女聲1=90, 排灣_南_女聲=100") == {"阿美_秀姑巒_女聲1": 90, "排灣_南_女聲": 100}
+    assert parse_speaker_budgets("壞掉,泰雅_四季_女聲=80") == {"泰雅_四季_女聲": 80}
+
+
+def test_char_budget_prefers_explicit_then_speaker(monkeypatch):
+    monkeypatch.setattr(segmenter, "SPEAKER_CHAR_BUDGETS", {"短": 40})
+    assert char_budget("短") == 40
+    assert char_budget("其他") == segmenter.DEFAULT_CHAR_BUDGET
+    assert char_budget("短", max_chars=10) == 10
+
+
+def test_pack_segments_fills_budget_in_order():
+    sentences = ["一二三四五.", " 六七八九十.", " 甲乙丙丁戊.", " 子丑寅卯辰."]
+    segments = list(segmenter.pack_segments(sentences, budget=13))
+    assert segments == ["一二三四五. 六七八九十.", "甲乙丙丁戊. 子丑寅卯辰."]
+    assert all(len(s) <= 13 for s in segments)
+
+
+def test_pack_segments_splits_long_sentence_at_clauses():
+    sentence = "第一個子句很長," * 4 + "結束."
+    segments = list(segmenter.pack_segments([sentence], budget=20))
+    assert all(len(s) <= 20 for s in segments)
+    assert "".join(segments) == sentence
+    assert all(s.endswith((",", ".")) for s in segments)
+
+
+def test_pack_segments_hard_cuts_text_without_boundaries():
+    segments = list(segmenter.pack_segments(["甲" * 25], budget=10))
+    assert segments == ["甲" * 10, "甲" * 10, "甲" * 5]
+
+
+def test_pack_segments_merges_small_tail():
+    # 最後一段只有 4 個字，併回後 23 字仍在 TAIL_SLACK 範圍內
+    head = "一二三四五六七八九十一二三四五六七"
+    segments = list(segmenter.pack_segments([head + ".", " 好好好."], budget=20))
+    assert segments == [head + ". 好好好."]
+    # 併回會超出預算太多時保留獨立的一段
+    segments = list(segmenter.pack_segments([head + "八九.", " 好好好."], budget=20))
+    assert segments == [head + "八九.", "好好好."]
+
+
+def test_iter_segments_joins_sentences_across_blocks():
+    blocks = ["Hello world. This sentence", "continues here.", "", "Last one!"]
+    segments = list(segmenter.iter_segments(blocks, budget=1000))
+    assert segments == ["Hello world. This sentence continues here. Last one!"]
+    assert list(segmenter.iter_sentences(blocks)) == ["Hello world.", " This sentence continues here.", " Last one!"]
+    assert segmenter.split_long_text("Nga'ay ho. Kapah.", 10) == ["Nga'ay ho.", "Kapah."]
+
+
+def test_iter_text_file_matches_split_long_text():
+    lines = ["Nga'ay ho kiso. Maan ko demak iso anini?", "Kapah kako, aray."] * 50
+    data = "\n".join(lines).encode("utf-8")
+    assert list(segmenter.iter_text_file(data, 60)) == segmenter.split_long_text(" ".join(lines), 60)